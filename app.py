@@ -1,8 +1,18 @@
 # app.py
 import streamlit as st
+import numpy as np
+import pandas as pd
+import json
 import os
-from orchestrator import run_analysis
+import queue
+import threading
+import time
+from orchestrator import Orchestrator
 from config import Config
+from job_queue import JobQueue, QUEUED, RUNNING, DONE
+from canonical import canonical_key, entities
+from records import Level, UseCaseTable
+from scheduler import INTERACTIVE, priority
 
 # Page configuration
 st.set_page_config(
@@ -12,6 +22,167 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+class ResultCache:
+    """Completed analyses by canonical input, expiring after a TTL"""
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def get(self, company_or_industry):
+        key = canonical_key(company_or_industry)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, use_cases = entry
+            if time.time() - stored_at > self.ttl:
+                del self._entries[key]
+                return None
+            return use_cases
+
+    def set(self, company_or_industry, use_cases):
+        # Empty results are not cached so a failed run can be retried right away
+        if not use_cases:
+            return
+        with self._lock:
+            self._entries[canonical_key(company_or_industry)] = (time.time(), use_cases)
+
+@st.cache_resource
+def get_orchestrator():
+    """Long-lived agents and API clients shared by every session of this process"""
+    return Orchestrator()
+
+@st.cache_resource
+def get_job_queue():
+    return JobQueue()
+
+@st.cache_resource
+def get_result_cache():
+    return ResultCache(Config.APP_RESULT_TTL)
+
+# Columns of the results grid
+RESULT_COLUMNS = {
+    "company": "Company",
+    "rank": "#",
+    "title": "Use Case",
+    "impact": "Impact",
+    "complexity": "Complexity",
+    "core_score": "Core Score",
+    "pareto_layer": "Pareto Layer",
+    "datasets": "Resources",
+}
+
+# Pipeline stages in the order they are shown while an analysis runs
+PIPELINE_STAGES = [
+    ("research", "🌐 Research"),
+    ("use_cases", "💡 Use cases"),
+    ("datasets", "🔗 Datasets"),
+    ("prioritization", "📊 Prioritization"),
+    ("report", "📝 Report"),
+]
+
+def new_progress():
+    return {"stages": {}, "use_cases": {}, "datasets": {}}
+
+def apply_event(progress, event):
+    """Folds one orchestrator progress event into the progress state"""
+    if event["type"] == "stage":
+        progress["stages"][event["stage"]] = event["status"]
+    elif event["type"] == "use_case":
+        progress["use_cases"][event["index"]] = event["use_case"]
+    elif event["type"] == "datasets" and event.get("index") is not None:
+        progress["datasets"][event["index"]] = event["datasets"]
+
+def render_progress(progress):
+    """Shows stage progress and every use case received so far"""
+    stages = progress["stages"]
+    finished = sum(1 for stage, _ in PIPELINE_STAGES if stages.get(stage) == "finished")
+    icons = {"started": "🔄", "finished": "✅"}
+    st.progress(
+        finished / len(PIPELINE_STAGES),
+        text=" · ".join(f"{label} {icons.get(stages.get(stage), '⏳')}" for stage, label in PIPELINE_STAGES)
+    )
+
+    for index in sorted(progress["use_cases"]):
+        uc = progress["use_cases"][index]
+        st.markdown(
+            f"**{index+1}. {uc.get('title', 'Untitled Use Case')}** — "
+            f"Impact: {uc.get('impact', 'N/A')} | Complexity: {uc.get('complexity', 'N/A')}"
+        )
+        st.caption(uc.get('description', ''))
+        datasets = progress["datasets"].get(index)
+        if datasets is None:
+            st.caption("🔄 Searching for relevant resources...")
+        elif datasets:
+            for dataset in datasets:
+                st.markdown(f"- [{dataset.get('title', 'Link')}]({dataset.get('url', '#')}) ({dataset.get('notes', '')})")
+        else:
+            st.caption("No relevant resources found for this use case")
+
+def run_inline(company):
+    """
+    Runs the analysis in a background thread and redraws the partial
+    results in this script run as progress events arrive
+    """
+    events = queue.Queue()
+    outcome = {}
+
+    def work():
+        try:
+            with priority(INTERACTIVE):
+                outcome["use_cases"] = get_orchestrator().run_analysis(company, on_event=events.put)
+        except Exception as e:
+            outcome["error"] = e
+        finally:
+            events.put(None)
+
+    threading.Thread(target=work, name="inline-analysis", daemon=True).start()
+
+    progress = new_progress()
+    placeholder = st.empty()
+    finished = False
+    while not finished:
+        batch = [events.get()]
+        # Redraw once per burst of events rather than once per event
+        while not events.empty():
+            batch.append(events.get_nowait())
+        for event in batch:
+            if event is None:
+                finished = True
+            else:
+                apply_event(progress, event)
+        with placeholder.container():
+            render_progress(progress)
+    placeholder.empty()
+
+    if "error" in outcome:
+        raise outcome["error"]
+    return outcome["use_cases"]
+
+def set_results(company, prioritized_usecases, table=None):
+    """Keeps the results, their table and the rendered report in the session so reruns only redraw them"""
+    st.session_state['prioritized_usecases'] = prioritized_usecases
+    st.session_state['job_company'] = company
+    st.session_state['results_table'] = table or UseCaseTable(
+        prioritized_usecases, [company] * len(prioritized_usecases)
+    )
+    st.session_state['markdown_report'] = generate_markdown_report(prioritized_usecases)
+    for key in ('results_page', 'results_query'):
+        st.session_state.pop(key, None)
+
+def load_batch_results(uploaded):
+    """Shows the results of a batch run (its per-company JSONL file) in the results view"""
+    results = []
+    for line in uploaded.getvalue().decode('utf-8').splitlines():
+        if line.strip():
+            result = json.loads(line)
+            if result.get("status") != "error":
+                results.append(result)
+    table = UseCaseTable.from_results(results)
+    set_results(f"{len(results)} companies", table.records, table)
+
 def main():
     """Main Streamlit application"""
     
@@ -40,6 +211,20 @@ def main():
         3. Wait for the analysis to complete
         4. Review the prioritized use cases
         """)
+        
+        st.markdown("---")
+        uploaded = st.file_uploader(
+            "📂 Load batch results",
+            type=["jsonl"],
+            help="Per-company results file written by batch.py"
+        )
+        # Loaded once per file, not on every rerun
+        if uploaded is not None and st.session_state.get('batch_file') != (uploaded.name, uploaded.size):
+            try:
+                load_batch_results(uploaded)
+                st.session_state['batch_file'] = (uploaded.name, uploaded.size)
+            except (ValueError, KeyError) as e:
+                st.error(f"❌ Could not read batch results: {e}")
     
     # Main content area
     col1, col2 = st.columns([2, 1])
@@ -51,31 +236,53 @@ def main():
             placeholder="e.g., Tesla, Healthcare, Fintech",
             help="Enter the name of a company or industry you want to analyze for AI use cases"
         )
+        suggestion = entities.suggest(company) if company else None
+        if suggestion is not None:
+            st.caption(f"💡 Did you mean **{suggestion.name}**? It was analyzed before; enter it to reuse its results.")
         
         if st.button("🚀 Generate Use Cases", type="primary", use_container_width=True):
+            cached = get_result_cache().get(company) if company else None
             if not company:
                 st.warning("⚠️ Please enter a company name or industry.")
+            elif cached is not None:
+                # Same canonical input analyzed recently, reuse it
+                set_results(company, cached)
+            elif Config.USE_JOB_QUEUE:
+                # Hand the analysis to the worker pool and poll for the result
+                for key in ('prioritized_usecases', 'markdown_report'):
+                    st.session_state.pop(key, None)
+                st.session_state['job_id'] = get_job_queue().submit(company)
+                st.session_state['job_company'] = company
+                st.session_state['job_progress'] = new_progress()
+                st.session_state['job_event_seq'] = 0
             else:
-                with st.spinner('🔄 Running analysis... This may take a few minutes.'):
-                    try:
-                        # Run the analysis
-                        prioritized_usecases = run_analysis(company)
-                        
-                        if prioritized_usecases:
-                            st.success(f"✅ Analysis complete! Found {len(prioritized_usecases)} use cases for {company}")
-                            
-                            # Display results
-                            display_results(prioritized_usecases)
-                        else:
-                            st.warning("⚠️ Could not generate use cases. Please check the logs for errors.")
-                            
-                    except Exception as e:
-                        st.error(f"❌ Error during analysis: {str(e)}")
-                        st.info("Please check your API keys and try again.")
+                try:
+                    # Run the analysis, showing partial results as they arrive
+                    prioritized_usecases = run_inline(company)
+                    get_result_cache().set(company, prioritized_usecases)
+                    set_results(company, prioritized_usecases)
+                except Exception as e:
+                    st.error(f"❌ Error during analysis: {str(e)}")
+                    st.info("Please check your API keys and try again.")
+
+        if st.session_state.get('job_id'):
+            poll_job()
+
+        if 'prioritized_usecases' in st.session_state:
+            prioritized_usecases = st.session_state['prioritized_usecases']
+            analyzed = st.session_state.get('job_company', company)
+            if prioritized_usecases:
+                st.success(f"✅ Analysis complete! Found {len(prioritized_usecases)} use cases for {analyzed}")
+                
+                # Display results
+                display_results(prioritized_usecases)
+            else:
+                st.warning("⚠️ Could not generate use cases. Please check the logs for errors.")
     
     with col2:
         st.header("📊 Quick Stats")
-        if 'prioritized_usecases' in locals():
+        if 'prioritized_usecases' in st.session_state:
+            prioritized_usecases = st.session_state['prioritized_usecases']
             st.metric("Use Cases Generated", len(prioritized_usecases))
             if prioritized_usecases:
                 high_impact = len([uc for uc in prioritized_usecases if uc.get('impact', '').lower() == 'high'])
@@ -83,46 +290,131 @@ def main():
         else:
             st.info("Run an analysis to see statistics")
 
+def poll_job():
+    """Shows the status of the submitted job and reruns the script until it finishes"""
+    job_id = st.session_state['job_id']
+    job_queue = get_job_queue()
+    job = job_queue.get(job_id)
+
+    progress = st.session_state.setdefault('job_progress', new_progress())
+    for seq, event in job_queue.events(job_id, st.session_state.get('job_event_seq', 0)):
+        apply_event(progress, event)
+        st.session_state['job_event_seq'] = seq
+
+    if job is None:
+        st.error("❌ The submitted job could not be found.")
+        del st.session_state['job_id']
+    elif job['status'] in (QUEUED, RUNNING):
+        waiting = time.time() - job['created_at']
+        if job['status'] == QUEUED:
+            st.info(f"⏳ Waiting for a worker... ({waiting:.0f}s)")
+        else:
+            st.info(f"🔄 Running analysis for {job['company']}... ({waiting:.0f}s)")
+            render_progress(progress)
+        time.sleep(Config.JOB_POLL_INTERVAL)
+        st.rerun()
+    elif job['status'] == DONE:
+        get_result_cache().set(job['company'], job['result'])
+        set_results(st.session_state.get('job_company', job['company']), job['result'] or [])
+        del st.session_state['job_id']
+    else:
+        st.error(f"❌ Error during analysis: {job['error']}")
+        st.info("Please check your API keys and try again.")
+        del st.session_state['job_id']
+
 def display_results(prioritized_usecases):
     """Display the analysis results in a formatted way"""
     
     st.markdown("---")
     st.header("📋 Prioritized Use Cases")
     
-    for i, uc in enumerate(prioritized_usecases):
-        with st.expander(f"#{i+1} {uc.get('title', 'Untitled Use Case')} (Score: {uc.get('core_score', 'N/A'):.2f})"):
-            
-            # Basic information
-            col1, col2 = st.columns(2)
-            
-            with col1:
-                st.markdown(f"**📝 Description:** {uc.get('description', 'N/A')}")
-                st.markdown(f"**�� Business Impact:** {uc.get('impact', 'N/A')}")
-            
-            with col2:
-                st.markdown(f"**⚙️ Complexity:** {uc.get('complexity', 'N/A')}")
-                st.markdown(f"**🎯 Core Score:** {uc.get('core_score', 'N/A'):.2f}")
-            
-            # Data sources
-            st.markdown(f"**📊 Required Data Sources:** {uc.get('data sources', 'N/A')}")
-            
-            # Relevant resources
-            if uc.get('datasets'):
-                st.markdown("**🔗 Relevant Resources:**")
-                for dataset in uc['datasets']:
-                    title = dataset.get('title', 'Link')
-                    url = dataset.get('url', '#')
-                    notes = dataset.get('notes', '')
-                    st.markdown(f"- [{title}]({url}) ({notes})")
-            else:
-                st.info("No relevant resources found for this use case")
+    table = st.session_state.get('results_table')
+    if table is None:
+        table = UseCaseTable(prioritized_usecases, [st.session_state.get('job_company', '')] * len(prioritized_usecases))
+
+    # Filtering, sorting and paging run on the table's columns; only the
+    # rows of the current page are sent to the browser
+    levels = [Level.HIGH, Level.MEDIUM, Level.LOW]
+    companies = table.companies()
+    filter_cols = st.columns(4)
+    with filter_cols[0]:
+        selected_companies = st.multiselect("Company", companies, key='results_companies') if len(companies) > 1 else []
+    with filter_cols[1]:
+        impacts = st.multiselect("Impact", levels, format_func=lambda level: level.label, key='results_impacts')
+    with filter_cols[2]:
+        complexities = st.multiselect("Complexity", levels, format_func=lambda level: level.label, key='results_complexities')
+    with filter_cols[3]:
+        min_score = None
+        scores = table.columns["core_score"]
+        if np.isfinite(scores).any() and np.nanmin(scores) < np.nanmax(scores):
+            lowest, highest = float(np.nanmin(scores)), float(np.nanmax(scores))
+            threshold = st.slider("Min. core score", lowest, highest, lowest, step=0.05, key='results_min_score')
+            # At the far left the filter is off, so unscored rows stay visible
+            min_score = threshold if threshold > lowest else None
+
+    sort_cols = st.columns([2, 1, 1, 1])
+    with sort_cols[0]:
+        sort_by = st.selectbox(
+            "Sort by", UseCaseTable.SORT_KEYS,
+            format_func=lambda key: RESULT_COLUMNS.get(key, key), key='results_sort'
+        )
+    with sort_cols[1]:
+        descending = st.toggle("Descending", value=sort_by != "company", key='results_descending')
+    with sort_cols[2]:
+        page_size = st.selectbox("Rows per page", (25, 50, 100), key='results_page_size')
+
+    query = dict(
+        companies=selected_companies or None,
+        impacts=impacts or None,
+        complexities=complexities or None,
+        min_score=min_score,
+        sort_by=sort_by,
+        descending=descending,
+        page_size=page_size,
+    )
+    # Back to the first page whenever the filters or the order change
+    if st.session_state.get('results_query') != query:
+        st.session_state['results_query'] = query
+        st.session_state['results_page'] = 1
+    _, total = table.query(page_size=page_size, **{k: v for k, v in query.items() if k != 'page_size'})
+    pages = max(1, -(-total // page_size))
+    with sort_cols[3]:
+        page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, key='results_page')
+    rows, total = table.query(page=page - 1, **query)
+
+    st.caption(f"Showing {len(rows)} of {total} use cases" + (f" ({len(table)} in total)" if total != len(table) else ""))
+    st.dataframe(
+        pd.DataFrame([table.row(i) for i in rows.tolist()], columns=list(RESULT_COLUMNS)),
+        column_config={
+            key: st.column_config.NumberColumn(label, format="%.2f") if key == "core_score"
+            else st.column_config.Column(label)
+            for key, label in RESULT_COLUMNS.items()
+        },
+        hide_index=True,
+        use_container_width=True
+    )
+
+    # Only the selected use case's details are rendered
+    selected = st.selectbox(
+        "🔎 Details",
+        rows.tolist(),
+        index=None,
+        placeholder="Select a use case on this page",
+        format_func=lambda i: f"#{table.columns['rank'][i]} {table.records[i].title or 'Untitled Use Case'}"
+        + (f" ({table.columns['company'][i]})" if len(companies) > 1 else ""),
+        key='results_selected'
+    )
+    if selected is not None:
+        render_use_case(table.records[selected])
     
     # Download button for the markdown report
     st.markdown("---")
     st.markdown("### 📥 Download Report")
     
-    # Generate markdown content for download
-    markdown_content = generate_markdown_report(prioritized_usecases)
+    # Rendered once when the results arrived, reruns reuse it
+    markdown_content = st.session_state.get('markdown_report')
+    if markdown_content is None:
+        markdown_content = generate_markdown_report(prioritized_usecases)
     
     st.download_button(
         label="📄 Download Markdown Report",
@@ -131,6 +423,37 @@ def display_results(prioritized_usecases):
         mime="text/markdown"
     )
 
+def render_use_case(uc):
+    """Detail view of one use case"""
+    st.subheader(uc.get('title', 'Untitled Use Case'))
+    
+    # Basic information
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        st.markdown(f"**📝 Description:** {uc.get('description', 'N/A')}")
+        st.markdown(f"**📈 Business Impact:** {uc.get('impact', 'N/A')}")
+    
+    with col2:
+        st.markdown(f"**⚙️ Complexity:** {uc.get('complexity', 'N/A')}")
+        st.markdown(f"**🎯 Core Score:** {uc.get('core_score', 'N/A'):.2f}")
+        if uc.get('pareto_layer'):
+            st.markdown(f"**🏔️ Pareto Layer:** {uc['pareto_layer']}")
+    
+    # Data sources
+    st.markdown(f"**📊 Required Data Sources:** {uc.get('data sources', 'N/A')}")
+    
+    # Relevant resources
+    if uc.get('datasets'):
+        st.markdown("**🔗 Relevant Resources:**")
+        for dataset in uc['datasets']:
+            title = dataset.get('title', 'Link')
+            url = dataset.get('url', '#')
+            notes = dataset.get('notes', '')
+            st.markdown(f"- [{title}]({url}) ({notes})")
+    else:
+        st.info("No relevant resources found for this use case")
+
 def generate_markdown_report(use_cases):
     """Generate markdown content for download"""
     markdown_output = "# Prioritized AI/GenAI Use Case Proposal\n\n"
@@ -141,6 +464,8 @@ def generate_markdown_report(use_cases):
         markdown_output += f"**Required Data Sources:** {uc.get('data sources', 'N/A')}\n\n"
         markdown_output += f"**Expected Business Impact:** {uc.get('impact', 'N/A')} | **Estimated Complexity:** {uc.get('complexity', 'N/A')}\n\n"
         markdown_output += f"**Core Score:** {uc.get('core_score', 'N/A'):.2f}\n\n"
+        if uc.get('pareto_layer'):
+            markdown_output += f"**Pareto Layer:** {uc['pareto_layer']}\n\n"
 
         if uc.get('datasets'):
             markdown_output += "**Relevant Resources:**\n"
@@ -0,0 +1,91 @@
+# batch.py
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from config import Config
+from orchestrator import run_analysis_many
+from records import to_dicts
+from scheduler import BATCH, set_default_priority
+from tracing import start_metrics_server
+
+def read_companies(path, column=None):
+    """
+    Lazily reads company or industry names from a CSV or plain text file
+
+    Args:
+        path (str): CSV file (with a header row) or text file with one name per line
+        column (str): CSV column holding the names, defaults to the first column
+
+    Yields:
+        str: Company or industry name
+    """
+    with open(path, newline='', encoding='utf-8') as f:
+        if not path.lower().endswith(".csv"):
+            for line in f:
+                if line.strip():
+                    yield line.strip()
+            return
+
+        reader = csv.DictReader(f)
+        if column is None:
+            column = reader.fieldnames[0]
+        elif column not in reader.fieldnames:
+            raise ValueError(f"Column '{column}' not found in {path}")
+
+        for row in reader:
+            if row.get(column):
+                yield row[column]
+
+def main(argv=None):
+    """Command line entry point for batch analysis"""
+    parser = argparse.ArgumentParser(description="Run the use case analysis for many companies")
+    parser.add_argument("input", help="CSV file with a header row, or a text file with one name per line")
+    parser.add_argument("--column", help="CSV column with the company names (default: first column)")
+    parser.add_argument("--workers", type=int, default=Config.BATCH_MAX_WORKERS, help="Pool size")
+    parser.add_argument("--processes", action="store_true", default=Config.BATCH_USE_PROCESSES,
+                        help="Use a process pool instead of a thread pool")
+    parser.add_argument("--fresh", action="store_true",
+                        help="Ignore checkpoints from earlier runs and redo every stage")
+    parser.add_argument("--results", help="JSONL file for per-company results")
+    parser.add_argument("--summary", help="JSON file for the run summary")
+    parser.add_argument("--metrics-port", type=int, help="Serve Prometheus metrics on this port while running")
+    args = parser.parse_args(argv)
+
+    Config.validate_keys()
+    set_default_priority(BATCH)
+    if args.metrics_port:
+        start_metrics_server(args.metrics_port)
+
+    stamp = time.strftime('%Y%m%d_%H%M%S')
+    results_path = args.results or os.path.join(Config.OUTPUT_DIR, f"batch_results_{stamp}.jsonl")
+    summary_path = args.summary or os.path.join(Config.OUTPUT_DIR, f"batch_summary_{stamp}.json")
+    os.makedirs(os.path.dirname(results_path) or ".", exist_ok=True)
+
+    completed = 0
+    with open(results_path, 'w', encoding='utf-8') as out:
+        results = run_analysis_many(
+            read_companies(args.input, args.column),
+            max_workers=args.workers,
+            use_processes=args.processes,
+            summary_path=summary_path,
+            resume=not args.fresh
+        )
+        for result in results:
+            completed += 1
+            out.write(json.dumps(dict(result, use_cases=to_dicts(result["use_cases"]))) + "\n")
+            out.flush()
+
+            if result["status"] == "error":
+                print(f"[{completed}] {result['company']}: error - {result['error']}")
+            else:
+                print(f"[{completed}] {result['company']}: {len(result['use_cases'])} use cases "
+                      f"in {result['elapsed']:.1f}s")
+
+    print(f"Per-company results saved to {results_path}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,272 @@
+# benchmark.py
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from config import Config
+from records import UseCase
+
+# Input sizes per scale; "full" reaches megabyte pages and 100k use cases
+SCALES = {
+    "quick": {"llm_blocks": 200, "html_bytes": 100_000, "use_cases": 1_000},
+    "default": {"llm_blocks": 2_000, "html_bytes": 1_000_000, "use_cases": 10_000},
+    "full": {"llm_blocks": 20_000, "html_bytes": 5_000_000, "use_cases": 100_000},
+}
+
+WORDS = (
+    "customer churn prediction demand forecasting inventory supply chain fraud "
+    "detection recommendation engine pricing optimization sentiment analysis "
+    "document summarization chatbot support tickets maintenance sensor anomaly "
+    "retail banking insurance claims energy grid logistics routing marketing "
+    "segmentation personalization vision inspection quality manufacturing"
+).split()
+
+LEVELS = ["High", "Medium", "Low", "Medium-High", "low to medium"]
+
+
+def _sentence(rng, n):
+    return " ".join(rng.choice(WORDS) for _ in range(n))
+
+
+def synthetic_llm_output(n_blocks, seed=0):
+    """LLM completion in the format UseCaseAgent prompts for, with some chatter around it"""
+    rng = random.Random(seed)
+    parts = ["Here are the proposed use cases:\n"]
+    for i in range(n_blocks):
+        parts.append(
+            f"TITLE: {_sentence(rng, 5).title()} {i}\n"
+            f"DESCRIPTION: {_sentence(rng, 40)}\n"
+            f"DATA SOURCES: {_sentence(rng, 6)}\n"
+            f"BUSINESS IMPACT: {rng.choice(LEVELS)}\n"
+            f"COMPLEXITY: {rng.choice(LEVELS)}\n"
+        )
+    return "\n---\n".join(parts) + "\n---\nLet me know if you need more detail."
+
+
+def synthetic_html(target_bytes, seed=0):
+    """News-like page of roughly target_bytes, with markup and scripts between paragraphs"""
+    rng = random.Random(seed)
+    parts = ["<html><head><title>Synthetic</title><script>var x = 1;</script></head><body>"]
+    size = len(parts[0])
+    while size < target_bytes:
+        chunk = (
+            f"<div class=\"section\"><h2>{_sentence(rng, 4)}</h2>"
+            f"<p>{_sentence(rng, 30)} <a href=\"/x\">{_sentence(rng, 2)}</a> <b>{_sentence(rng, 3)}</b>\n"
+            f"   {_sentence(rng, 20)}</p>"
+            f"<ul><li>{_sentence(rng, 5)}</li><li>{_sentence(rng, 5)}</li></ul>"
+            f"<script>track('{rng.random()}');</script></div>\n"
+        )
+        parts.append(chunk)
+        size += len(chunk)
+    parts.append("</body></html>")
+    return "".join(parts)
+
+
+def synthetic_use_cases(n, seed=0):
+    """Parsed use cases as the pipeline produces them, a third of them with datasets"""
+    rng = random.Random(seed)
+    use_cases = []
+    for i in range(n):
+        uc = {
+            "title": f"{_sentence(rng, 5).title()} {i}",
+            "description": _sentence(rng, 40),
+            "data sources": _sentence(rng, 6),
+            "impact": rng.choice(LEVELS),
+            "complexity": rng.choice(LEVELS),
+            "core_score": 0.0,
+        }
+        if i % 3 == 0:
+            uc["datasets"] = [
+                {"title": _sentence(rng, 3), "url": f"https://example.com/d/{i}/{j}", "provider": "kaggle",
+                 "downloads": rng.randint(0, 100_000), "views": rng.randint(0, 1_000_000)}
+                for j in range(3)
+            ]
+        use_cases.append(UseCase.from_dict(uc))
+    return use_cases
+
+
+def measure(func, repeats):
+    """Runs func once to warm up, then repeats times; returns the timings in seconds"""
+    func()
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def build_cases(scale):
+    """
+    Builds the benchmark cases for a scale
+
+    Returns:
+        list of tuple: (name, items, bytes, func) where items and bytes size
+            the input, for per-item and throughput figures
+    """
+    from agents.usecase_agent import parse_use_cases
+    from agents.dataset_agent import extract_search_keywords
+    from agents.search_agent import extract_text
+    from agents.prioritizer import Prioritizer
+    from agents.writer import Writer
+
+    sizes = SCALES[scale]
+    llm_output = synthetic_llm_output(sizes["llm_blocks"])
+    html = synthetic_html(sizes["html_bytes"])
+    use_cases = synthetic_use_cases(sizes["use_cases"])
+    prioritizer = Prioritizer()
+    writer = Writer()
+
+    # A format drift would otherwise time a parser that finds nothing
+    parsed = len(parse_use_cases(llm_output))
+    if parsed != sizes["llm_blocks"]:
+        raise AssertionError(
+            f"parse_use_cases found {parsed} of {sizes['llm_blocks']} synthetic use cases; "
+            "synthetic_llm_output no longer matches the parsed format"
+        )
+
+    cases = [
+        ("usecase.parse_use_cases", sizes["llm_blocks"], len(llm_output.encode('utf-8')),
+         lambda: parse_use_cases(llm_output)),
+        ("dataset.extract_search_keywords", len(use_cases), None,
+         lambda: [extract_search_keywords(uc) for uc in use_cases]),
+        ("search.extract_text", 1, len(html.encode('utf-8')),
+         lambda: extract_text(html)),
+        ("prioritizer.rank_use_cases", len(use_cases), None,
+         lambda: prioritizer.rank_use_cases(use_cases, mode="score")),
+        ("prioritizer.rank_use_cases[pareto]", len(use_cases), None,
+         lambda: prioritizer.rank_use_cases(use_cases, mode="pareto")),
+        ("writer.render_markdown_report", len(use_cases), None,
+         lambda: writer.render_markdown_report(use_cases)),
+    ]
+
+    try:
+        # Importing the app module needs Streamlit, which is optional here
+        from app import generate_markdown_report
+        cases.append(("app.generate_markdown_report", len(use_cases), None,
+                      lambda: generate_markdown_report(use_cases)))
+    except ImportError as e:
+        print(f"Skipping app.generate_markdown_report: {e}")
+
+    return cases
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(scale="default", repeats=5, only=None):
+    """
+    Runs the benchmark cases and collects their results
+
+    Args:
+        scale (str): Key of SCALES
+        repeats (int): Timed runs per case
+        only (list): Substrings of case names to run, all cases if None
+
+    Returns:
+        dict: Environment and per-case results, JSON-serializable
+    """
+    results = []
+    for name, items, size, func in build_cases(scale):
+        if only and not any(o in name for o in only):
+            continue
+        timings = measure(func, repeats)
+        best = min(timings)
+        result = {
+            "name": name,
+            "items": items,
+            "bytes": size,
+            "repeats": repeats,
+            "min": best,
+            "median": statistics.median(timings),
+            "mean": statistics.mean(timings),
+            "stdev": statistics.stdev(timings) if len(timings) > 1 else 0.0,
+            "per_item_us": best / items * 1e6 if items else None,
+            "mb_per_s": size / best / 1e6 if size and best else None,
+        }
+        results.append(result)
+        print(f"{name:36} {best * 1000:10.2f} ms  ({items} items)")
+
+    return {
+        "created_at": datetime.datetime.now().isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "scale": scale,
+        "sizes": SCALES[scale],
+        "results": results,
+    }
+
+
+def compare(current, baseline, threshold=0.10):
+    """
+    Compares two runs case by case on their best times
+
+    Returns:
+        list of str: Names of cases more than threshold slower than the baseline
+    """
+    if current["sizes"] != baseline.get("sizes"):
+        print("Warning: baseline was recorded with different input sizes")
+
+    previous = {r["name"]: r for r in baseline.get("results", [])}
+    regressions = []
+    for result in current["results"]:
+        before = previous.get(result["name"])
+        if before is None:
+            continue
+        ratio = result["min"] / before["min"] if before["min"] else float("inf")
+        flag = ""
+        if ratio > 1 + threshold:
+            flag = "  REGRESSION"
+            regressions.append(result["name"])
+        print(f"{result['name']:36} {before['min'] * 1000:10.2f} -> {result['min'] * 1000:10.2f} ms  x{ratio:.2f}{flag}")
+    return regressions
+
+
+def main(argv=None):
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description="Benchmark the CPU-bound hot paths on synthetic inputs")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="default", help="Input sizes")
+    parser.add_argument("--repeats", type=int, default=5, help="Timed runs per case")
+    parser.add_argument("--only", action="append", help="Run only cases whose name contains this (repeatable)")
+    parser.add_argument("--output", help="Results JSON path (default: outputs/benchmarks/<timestamp>.json)")
+    parser.add_argument("--compare", help="Baseline results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Slowdown ratio reported as a regression")
+    args = parser.parse_args(argv)
+
+    report = run_benchmarks(args.scale, args.repeats, args.only)
+
+    output = args.output or os.path.join(
+        Config.OUTPUT_DIR, "benchmarks", f"{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}_{args.scale}.json"
+    )
+    directory = os.path.dirname(output)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results saved to {output}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if compare(report, baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
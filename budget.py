@@ -0,0 +1,73 @@
+# budget.py
+import threading
+import time
+from config import Config
+
+class LatencyBudget:
+    """
+    End-to-end time budget for one analysis, split across pipeline stages
+
+    Each stage gets a deadline at its cumulative share of the budget, so time
+    left over by a fast stage rolls over to the next one. Agents ask how much
+    time their stage has left and record a degradation whenever they cut work
+    to stay inside it.
+    """
+
+    def __init__(self, total_seconds, shares=None):
+        """
+        Args:
+            total_seconds (float): Budget for the whole run, None for no limit
+            shares (dict): Stage name -> fraction of the budget, in stage order
+        """
+        self.total = total_seconds
+        self.started = time.monotonic()
+        self.shares = shares or Config.BUDGET_STAGE_SHARES
+        self._lock = threading.Lock()
+        self._degradations = []
+
+        self._deadlines = {}
+        cumulative = 0.0
+        for stage, share in self.shares.items():
+            cumulative += share
+            self._deadlines[stage] = cumulative
+
+    @property
+    def limited(self):
+        return self.total is not None
+
+    def remaining(self):
+        """Seconds left for the whole run"""
+        if not self.limited:
+            return float("inf")
+        return self.total - (time.monotonic() - self.started)
+
+    def stage_remaining(self, stage):
+        """Seconds left until the stage's deadline"""
+        if not self.limited:
+            return float("inf")
+        share = self._deadlines.get(stage, 1.0)
+        return self.total * min(share, 1.0) - (time.monotonic() - self.started)
+
+    def timeout(self, stage, default):
+        """Caps a per-request timeout to the time the stage has left, with a small floor"""
+        return max(1.0, min(default, self.stage_remaining(stage)))
+
+    def degrade(self, stage, reason):
+        """Records that a stage cut work to stay within the budget"""
+        print(f"Time budget: {stage} degraded - {reason}")
+        with self._lock:
+            self._degradations.append({"stage": stage, "reason": reason})
+
+    def stage_degraded(self, stage):
+        with self._lock:
+            return any(d["stage"] == stage for d in self._degradations)
+
+    @property
+    def degraded(self):
+        with self._lock:
+            return bool(self._degradations)
+
+    @property
+    def degradations(self):
+        with self._lock:
+            return list(self._degradations)
@@ -0,0 +1,353 @@
+# cache.py
+import hashlib
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from contextlib import closing, contextmanager
+from config import Config
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+);
+CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed_at);
+CREATE INDEX IF NOT EXISTS entries_namespace_created ON entries (namespace, created_at);
+CREATE TABLE IF NOT EXISTS leases (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    owner TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+);
+"""
+
+# A hit refreshes the entry's LRU position at most this often, so reads
+# rarely need the write lock
+TOUCH_INTERVAL = 60
+
+# Seconds between checks for the result of a computation another worker holds the lease for
+LEASE_POLL_INTERVAL = 0.2
+
+# Eviction frees space down to this fraction of CACHE_MAX_BYTES, so it does
+# not run again on the next write
+EVICT_TARGET = 0.9
+
+class CacheStore:
+    """
+    Cache entries of every namespace in one SQLite database in WAL mode
+
+    The database is shared by all processes on the host, so an entry stored
+    by one Streamlit or worker process is a hit in every other one and
+    survives restarts. Each call opens its own short-lived connection, like
+    JobQueue. When the stored values outgrow max_bytes, expired entries and
+    then the least recently used ones are deleted.
+    """
+
+    def __init__(self, db_path=None, max_bytes=None, lease_timeout=None):
+        """
+        Args:
+            db_path (str): SQLite database file
+            max_bytes (int): Size of the stored values above which entries are evicted
+            lease_timeout (float): Seconds after which the lease of a worker
+                that died while computing an entry is taken over
+        """
+        self.db_path = db_path or Config.CACHE_DB_PATH
+        self.max_bytes = max_bytes or Config.CACHE_MAX_BYTES
+        self.lease_timeout = lease_timeout or Config.CACHE_LEASE_TIMEOUT
+        self.ttls = dict(Config.CACHE_TTLS)
+        self._lock = threading.Lock()
+        self._written = 0
+        self._owner_prefix = f"{socket.gethostname()}:{os.getpid()}"
+
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        # Autocommit mode; multi-statement updates use explicit transactions
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA busy_timeout=30000")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _owner(self):
+        return f"{self._owner_prefix}:{threading.get_ident()}"
+
+    def get(self, namespace, key, ttl=None):
+        """
+        Returns:
+            bytes: The stored value, or None if missing or older than ttl seconds
+        """
+        now = time.time()
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT value, created_at, accessed_at FROM entries WHERE namespace = ? AND key = ?",
+                (namespace, key)
+            ).fetchone()
+            if row is None:
+                return None
+            value, created_at, accessed_at = row
+            if ttl is not None and now - created_at > ttl:
+                return None
+            if now - accessed_at > TOUCH_INTERVAL:
+                conn.execute(
+                    "UPDATE entries SET accessed_at = ? WHERE namespace = ? AND key = ?",
+                    (now, namespace, key)
+                )
+        return value
+
+    def set(self, namespace, key, value):
+        """Stores a value, replacing any previous one"""
+        now = time.time()
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (namespace, key, value, size, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (namespace, key, value, len(value), now, now)
+            )
+        with self._lock:
+            self._written += len(value)
+            due = self._written > self.max_bytes * (1 - EVICT_TARGET)
+            if due:
+                self._written = 0
+        if due:
+            self.evict()
+
+    def acquire(self, namespace, key):
+        """
+        Takes the lease for computing an entry
+
+        Returns:
+            bool: False while another worker holds an unexpired lease for it
+        """
+        now = time.time()
+        owner = self._owner()
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT owner, expires_at FROM leases WHERE namespace = ? AND key = ?",
+                    (namespace, key)
+                ).fetchone()
+                if row is not None and row[0] != owner and row[1] > now:
+                    conn.execute("ROLLBACK")
+                    return False
+                conn.execute(
+                    "INSERT OR REPLACE INTO leases (namespace, key, owner, expires_at) VALUES (?, ?, ?, ?)",
+                    (namespace, key, owner, now + self.lease_timeout)
+                )
+                conn.execute("COMMIT")
+                return True
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def release(self, namespace, key):
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "DELETE FROM leases WHERE namespace = ? AND key = ? AND owner = ?",
+                (namespace, key, self._owner())
+            )
+
+    def evict(self):
+        """
+        Deletes expired entries and, while the stored values exceed
+        max_bytes, the least recently used ones
+
+        Returns:
+            int: Number of entries deleted
+        """
+        now = time.time()
+        deleted = 0
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                for namespace, ttl in self.ttls.items():
+                    if ttl is not None:
+                        deleted += conn.execute(
+                            "DELETE FROM entries WHERE namespace = ? AND created_at < ?",
+                            (namespace, now - ttl)
+                        ).rowcount
+                conn.execute("DELETE FROM leases WHERE expires_at < ?", (now,))
+
+                total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+                if total > self.max_bytes:
+                    excess = total - int(self.max_bytes * EVICT_TARGET)
+                    victims = []
+                    for namespace, key, size in conn.execute(
+                        "SELECT namespace, key, size FROM entries ORDER BY accessed_at"
+                    ):
+                        victims.append((namespace, key))
+                        excess -= size
+                        if excess <= 0:
+                            break
+                    conn.executemany("DELETE FROM entries WHERE namespace = ? AND key = ?", victims)
+                    deleted += len(victims)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return deleted
+
+    def stats(self):
+        """
+        Returns:
+            dict: Namespace -> {'entries', 'bytes'}
+        """
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT namespace, COUNT(*), COALESCE(SUM(size), 0) FROM entries GROUP BY namespace"
+            ).fetchall()
+        return {namespace: {"entries": count, "bytes": size} for namespace, count, size in rows}
+
+class Cache:
+    """
+    Persistent JSON cache for one namespace, e.g. "summaries"
+
+    Entries live in the shared CacheStore and expire after the namespace's
+    TTL from Config.CACHE_TTLS (never, if it has none). With
+    Config.ENABLE_CACHE off every lookup misses and nothing is stored.
+    Errors of the store are logged and treated as misses.
+    """
+
+    def __init__(self, namespace, ttl=None, store=None):
+        self.namespace = namespace
+        self.ttl = ttl if ttl is not None else Config.CACHE_TTLS.get(namespace)
+        self.store = store or shared_store()
+        if self.ttl is not None:
+            self.store.ttls.setdefault(namespace, self.ttl)
+
+    @staticmethod
+    def _key(key):
+        return hashlib.sha256(key.encode('utf-8')).hexdigest()[:32]
+
+    def get(self, key):
+        """
+        Returns:
+            The cached value, or None if missing or expired
+        """
+        if not Config.ENABLE_CACHE:
+            return None
+        try:
+            value = self.store.get(self.namespace, self._key(key), self.ttl)
+            return json.loads(value) if value is not None else None
+        except (sqlite3.Error, ValueError) as e:
+            print(f"Error reading {self.namespace} cache entry: {e}")
+            return None
+
+    def set(self, key, value):
+        """Stores a JSON-serializable value"""
+        if not Config.ENABLE_CACHE:
+            return
+        try:
+            encoded = json.dumps(value, ensure_ascii=False).encode('utf-8')
+            self.store.set(self.namespace, self._key(key), encoded)
+        except (sqlite3.Error, TypeError, ValueError) as e:
+            print(f"Error writing {self.namespace} cache entry: {e}")
+
+    @contextmanager
+    def lease(self, key):
+        """
+        Looks an entry up, holding the lease for computing it on a miss
+
+        Only one worker across all processes holds the lease of an entry;
+        the others wait until it is stored instead of repeating the work.
+        The holder computes the value in the block and set()s it, or leaves
+        it unset, e.g. for an error, and the next worker computes it.
+        Prefer get_or_compute(); this is for values produced piecewise, such
+        as a streamed completion.
+
+        Yields:
+            The cached value, or None if the block should compute it
+        """
+        value = self.get(key)
+        if value is not None or not Config.ENABLE_CACHE:
+            yield value
+            return
+
+        digest = self._key(key)
+        leased = False
+        try:
+            while not self.store.acquire(self.namespace, digest):
+                # Another worker is computing this entry
+                time.sleep(LEASE_POLL_INTERVAL)
+                value = self.get(key)
+                if value is not None:
+                    break
+            else:
+                leased = True
+        except sqlite3.Error as e:
+            print(f"Error locking {self.namespace} cache entry: {e}")
+        if not leased:
+            yield value
+            return
+
+        try:
+            # Stored by another worker between the miss and the lease
+            yield self.get(key)
+        finally:
+            try:
+                self.store.release(self.namespace, digest)
+            except sqlite3.Error as e:
+                print(f"Error unlocking {self.namespace} cache entry: {e}")
+
+    def get_or_compute(self, key, compute, cacheable=None, refresh=False):
+        """
+        Returns the cached value, computing and storing it on a miss
+
+        Only one worker across all processes computes a missing entry, see
+        lease(). None results are not cached.
+
+        Args:
+            key (str): Entry key
+            compute (callable): Produces the value on a miss
+            cacheable (callable): Value -> False for results that must not be
+                stored, such as errors or empty results
+            refresh (bool): Compute even on a hit; the result replaces the entry
+
+        Returns:
+            tuple: (value, hit)
+        """
+        def store(value):
+            if value is not None and (cacheable is None or cacheable(value)):
+                self.set(key, value)
+            return value, False
+
+        if refresh:
+            return store(compute())
+        with self.lease(key) as value:
+            if value is not None:
+                return value, True
+            return store(compute())
+
+_store = None
+_caches = {}
+_caches_lock = threading.Lock()
+
+def shared_store():
+    """Returns the process-wide handle of the cache database"""
+    global _store
+    with _caches_lock:
+        if _store is None:
+            _store = CacheStore()
+        return _store
+
+def cache_for(namespace):
+    """Returns the process-wide cache of a namespace"""
+    store = shared_store()
+    with _caches_lock:
+        if namespace not in _caches:
+            _caches[namespace] = Cache(namespace, store=store)
+        return _caches[namespace]
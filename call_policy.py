@@ -0,0 +1,295 @@
+# call_policy.py
+import collections
+import contextvars
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from config import Config
+from scheduler import scheduler
+from tracing import tracer
+
+# HTTP statuses worth retrying: the server may not have processed the request
+# (429) or failed in a way that may not repeat (408, 5xx)
+SAFE_RETRY_STATUSES = (429,)
+IDEMPOTENT_RETRY_STATUSES = (408, 425, 500, 502, 503, 504)
+
+# Exception class names, matched anywhere in the MRO so the optional client
+# libraries need not be imported here. Errors before the connection was made
+# are safe to retry for any call; errors after the request was sent only for
+# idempotent calls.
+SAFE_RETRY_ERRORS = {
+    "ConnectTimeout", "ConnectTimeoutError", "NewConnectionError", "ConnectionRefusedError",
+}
+IDEMPOTENT_RETRY_ERRORS = {
+    "Timeout", "ReadTimeout", "TimeoutError", "ConnectionError", "ConnectionResetError",
+    "ChunkedEncodingError", "RemoteDisconnected", "APIConnectionError", "APITimeoutError",
+}
+
+class TransientHTTPError(Exception):
+    """Raised by callers for a response with a retryable HTTP status"""
+
+    def __init__(self, status_code, response=None):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.response = response
+
+def _status_of(error):
+    for attribute in ("status_code", "status"):
+        value = getattr(error, attribute, None)
+        if isinstance(value, int):
+            return value
+    return getattr(getattr(error, "response", None), "status_code", None)
+
+def _retry_after(error):
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("Retry-After") or headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+def is_retryable(error, idempotent):
+    """
+    Decides whether a failed call may be attempted again
+
+    Args:
+        error (Exception): The error the attempt raised
+        idempotent (bool): Whether repeating a request that reached the server is harmless
+
+    Returns:
+        bool: True if the call should be retried
+    """
+    status = _status_of(error)
+    if status is not None:
+        return status in SAFE_RETRY_STATUSES or (idempotent and status in IDEMPOTENT_RETRY_STATUSES)
+
+    names = {cls.__name__ for cls in type(error).__mro__}
+    if names & SAFE_RETRY_ERRORS:
+        return True
+    return idempotent and bool(names & IDEMPOTENT_RETRY_ERRORS)
+
+class RetryBudget:
+    """
+    Token bucket that caps retries to a fraction of the calls made
+
+    Every call deposits `ratio` tokens and every retry withdraws one, so an
+    outage turns into at most ratio extra load instead of max_attempts times.
+    """
+
+    def __init__(self, ratio, max_tokens=10.0):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self._tokens = max_tokens
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def withdraw(self):
+        with self._lock:
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+# Threads running hedged attempts, shared by all policies
+_hedge_executor = None
+_hedge_executor_lock = threading.Lock()
+
+def _executor():
+    global _hedge_executor
+    with _hedge_executor_lock:
+        if _hedge_executor is None:
+            _hedge_executor = ThreadPoolExecutor(
+                max_workers=Config.HEDGE_MAX_WORKERS, thread_name_prefix="hedge"
+            )
+        return _hedge_executor
+
+class CallPolicy:
+    """
+    Retries, backoff and hedging for the outbound calls to one provider
+
+    Every attempt waits for a slot of the provider in the request scheduler,
+    so the provider's concurrency and quota limits are shared by priority.
+    Failed attempts are retried with exponential backoff and full jitter while
+    the provider's retry budget allows. Non-idempotent calls are only retried
+    when the error shows the request never reached the server. Idempotent
+    calls can also be hedged: once an attempt is slower than the provider's
+    recent latency percentile, a duplicate is sent and the first response wins.
+    """
+
+    def __init__(self, provider, max_attempts=3, base_delay=0.5, max_delay=8.0,
+                 retry_ratio=0.2, idempotent=True, hedge_quantile=None, hedge_min_samples=20):
+        """
+        Args:
+            provider (str): Provider name, used in logs and span attributes
+            max_attempts (int): Attempts per call including the first one
+            base_delay (float): Backoff before the first retry, doubled for each further one
+            max_delay (float): Upper bound of a single backoff
+            retry_ratio (float): Retries allowed per call on average, see RetryBudget
+            idempotent (bool): Repeating a request that reached the server is harmless
+            hedge_quantile (float): Latency percentile (e.g. 0.95) after which a
+                duplicate request is sent, None to never hedge
+            hedge_min_samples (int): Successful calls observed before hedging starts
+        """
+        self.provider = provider
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.idempotent = idempotent
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_samples = hedge_min_samples
+        self.retry_budget = RetryBudget(retry_ratio)
+        self._latencies = collections.deque(maxlen=200)
+        self._lock = threading.Lock()
+
+    def hedge_threshold(self):
+        """Seconds after which an attempt is hedged, or None if hedging is off"""
+        if self.hedge_quantile is None or not self.idempotent:
+            return None
+        with self._lock:
+            if len(self._latencies) < self.hedge_min_samples:
+                return None
+            ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, int(self.hedge_quantile * len(ordered)))]
+
+    def _record_latency(self, elapsed):
+        with self._lock:
+            self._latencies.append(elapsed)
+
+    def _backoff(self, retry, error):
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** retry))
+        retry_after = _retry_after(error)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+    def call(self, func, idempotent=None, budget=None, stage=None, held=False):
+        """
+        Calls func() under the policy
+
+        Args:
+            func (callable): Makes one attempt; raises on failure
+            idempotent (bool): Overrides the provider default for this call
+            budget (LatencyBudget): Optional time budget; no retry is started
+                if its backoff would run past the stage's deadline
+            stage (str): Budget stage the call belongs to
+            held (bool): The caller holds a scheduler slot of the provider
+                (see RequestScheduler.slot()), e.g. for the whole time a
+                stream opened by func is read; attempts run in it and are
+                not hedged
+
+        Returns:
+            The result of the first successful attempt
+
+        Raises:
+            Exception: The last error once retries are exhausted or not allowed
+        """
+        if idempotent is None:
+            idempotent = self.idempotent
+        span = tracer.current_span()
+        self.retry_budget.deposit()
+
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                result = self._timed(func) if held else self._attempt(func, idempotent, span)
+            except Exception as e:
+                if attempt >= self.max_attempts or not is_retryable(e, idempotent):
+                    raise
+                delay = self._backoff(attempt - 1, e)
+                if delay > self.max_delay:
+                    print(f"{self.provider}: not retrying, asked to wait {delay:.0f}s")
+                    raise
+                if budget and budget.limited and budget.stage_remaining(stage) <= delay:
+                    raise
+                if not self.retry_budget.withdraw():
+                    print(f"{self.provider}: retry budget exhausted, giving up after {attempt} attempts")
+                    raise
+                print(f"{self.provider}: retrying in {delay:.1f}s after {type(e).__name__}: {e} "
+                      f"(attempt {attempt + 1}/{self.max_attempts})")
+                span.incr("retries")
+                time.sleep(delay)
+                continue
+
+            return result
+
+    def _timed(self, func):
+        """Makes one attempt and records its latency if it succeeds"""
+        _count_call(self.provider)
+        started = time.perf_counter()
+        result = func()
+        self._record_latency(time.perf_counter() - started)
+        return result
+
+    def _send(self, func, admitted=False):
+        """Makes one attempt in a scheduler slot of the provider"""
+        if not admitted:
+            scheduler.acquire(self.provider)
+        try:
+            # Time spent queued for the slot does not count towards hedging
+            return self._timed(func)
+        finally:
+            scheduler.release(self.provider)
+
+    def _attempt(self, func, idempotent, span):
+        threshold = self.hedge_threshold() if idempotent else None
+        if threshold is None:
+            return self._send(func)
+
+        # Queue for the slot in this thread, so waiting calls do not hold hedge threads
+        scheduler.acquire(self.provider)
+        executor = _executor()
+        primary = executor.submit(contextvars.copy_context().run, self._send, func, True)
+        done, _ = wait([primary], timeout=threshold)
+        if done:
+            return primary.result()
+
+        # Slower than usual: race a duplicate against the original request,
+        # if the provider has a slot free for it right away
+        if not scheduler.acquire(self.provider, block=False):
+            return primary.result()
+        span.incr("hedges")
+        hedge = executor.submit(contextvars.copy_context().run, self._send, func, True)
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                error = future.exception()
+        raise error
+
+_policies = {}
+_policies_lock = threading.Lock()
+
+# Attempts sent per provider by this process, including retries and hedges
+_call_counts = collections.Counter()
+_call_counts_lock = threading.Lock()
+
+def _count_call(provider):
+    with _call_counts_lock:
+        _call_counts[provider] += 1
+
+def call_counts():
+    """Returns the number of requests sent per provider by this process"""
+    with _call_counts_lock:
+        return dict(_call_counts)
+
+def policy_for(provider):
+    """
+    Returns the process-wide policy of a provider
+
+    Settings come from Config.DEFAULT_CALL_POLICY overridden by the
+    provider's entry in Config.CALL_POLICIES.
+    """
+    with _policies_lock:
+        policy = _policies.get(provider)
+        if policy is None:
+            settings = dict(Config.DEFAULT_CALL_POLICY)
+            settings.update(Config.CALL_POLICIES.get(provider, {}))
+            policy = _policies[provider] = CallPolicy(provider, **settings)
+        return policy
@@ -0,0 +1,218 @@
+# canonical.py
+import collections
+import difflib
+import json
+import os
+import re
+import threading
+import unicodedata
+from config import Config
+
+# Legal-form words dropped from the end of a name ("Tesla, Inc." -> "tesla")
+LEGAL_SUFFIXES = {
+    "inc", "incorporated", "corp", "corporation", "co", "ltd", "limited", "llc",
+    "plc", "ag", "sa", "se", "nv", "bv", "gmbh", "lp", "llp", "pty", "oy", "ab", "spa",
+}
+
+# Names shorter than this are only matched exactly, never fuzzily
+MIN_FUZZY_LENGTH = 5
+
+# Known entities sharing the most trigrams that are compared in full
+FUZZY_CANDIDATES = 10
+
+Entity = collections.namedtuple("Entity", ["key", "name"])
+Entity.__doc__ = "A canonical analysis input: key identifies it, name is what agents search for"
+
+def _tokens(name):
+    # Keeps letters and digits, so "Tesla, Inc." and "tesla inc" tokenize alike
+    text = unicodedata.normalize("NFKC", name).replace("&", " and ")
+    return re.findall(r"[^\W_]+", text)
+
+def _strip_suffixes(tokens):
+    tokens = list(tokens)
+    while len(tokens) > 1 and tokens[-1].casefold() in LEGAL_SUFFIXES:
+        tokens.pop()
+    if len(tokens) > 1 and tokens[0].casefold() == "the":
+        tokens.pop(0)
+    return tokens
+
+def normalize_name(name):
+    """
+    Normalizes a company or industry name into a lookup key
+
+    Case, punctuation, a leading "the" and trailing legal forms are ignored.
+    """
+    return " ".join(t.casefold() for t in _strip_suffixes(_tokens(name)))
+
+def display_name(name):
+    """The name with legal forms and punctuation removed, keeping its case"""
+    return " ".join(_strip_suffixes(_tokens(name))) or name.strip()
+
+def _compact(key):
+    # "health care" and "healthcare" are the same name
+    return key.replace(" ", "")
+
+def _trigrams(key):
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class EntityIndex:
+    """
+    Maps spellings of the same company or industry to one canonical entity
+
+    A name is resolved by its normalized key, then through the alias table
+    (tickers and former names), then against entities analyzed before,
+    also ignoring spaces ("Health care" is "Healthcare"). Anything else is a
+    new entity: a similar known name is never substituted, since "Baking"
+    is not "Banking", but suggest() offers it. Known entities are kept in a
+    JSON file, so every process on the host resolves names the same way.
+
+    Suggestions look up candidates sharing trigrams in an inverted index
+    and score only the best of them with difflib, so they stay fast with
+    many known entities.
+    """
+
+    def __init__(self, path=None, aliases=None, threshold=None):
+        """
+        Args:
+            path (str): JSON file of known entities, defaults to Config.ENTITY_INDEX_PATH
+            aliases (dict): Alias -> canonical name, defaults to Config.ENTITY_ALIASES
+                merged with the JSON file at Config.ENTITY_ALIASES_PATH
+            threshold (float): Minimum difflib similarity ratio for a suggestion
+        """
+        self.path = path or Config.ENTITY_INDEX_PATH
+        self.threshold = threshold if threshold is not None else Config.FUZZY_MATCH_THRESHOLD
+        self._lock = threading.Lock()
+        self._aliases = {}
+        for alias, name in (aliases if aliases is not None else self._configured_aliases()).items():
+            self._aliases[normalize_name(alias)] = Entity(normalize_name(name), name)
+        self._known = {}
+        self._compact = {}
+        self._grams = collections.defaultdict(set)
+        self._loaded_mtime = None
+        for entity in self._aliases.values():
+            self._add(entity)
+
+    @staticmethod
+    def _configured_aliases():
+        aliases = dict(Config.ENTITY_ALIASES)
+        if Config.ENTITY_ALIASES_PATH:
+            try:
+                with open(Config.ENTITY_ALIASES_PATH, 'r', encoding='utf-8') as f:
+                    aliases.update(json.load(f))
+            except (IOError, ValueError) as e:
+                print(f"Error loading entity aliases from {Config.ENTITY_ALIASES_PATH}: {e}")
+        return aliases
+
+    def _add(self, entity):
+        if entity.key in self._known:
+            return
+        self._known[entity.key] = entity
+        self._compact.setdefault(_compact(entity.key), entity.key)
+        for gram in _trigrams(entity.key):
+            self._grams[gram].add(entity.key)
+
+    def _refresh(self):
+        # Pick up entities other processes have added since the last read
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return
+        if mtime == self._loaded_mtime:
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+        except (IOError, ValueError) as e:
+            print(f"Ignoring unreadable entity index {self.path}: {e}")
+            return
+        for key, name in saved.items():
+            self._add(Entity(key, name))
+        self._loaded_mtime = mtime
+
+    def _fuzzy_match(self, key):
+        shared = collections.Counter()
+        for gram in _trigrams(key):
+            for candidate in self._grams.get(gram, ()):
+                shared[candidate] += 1
+
+        best, best_score = None, 0.0
+        for candidate, _ in shared.most_common(FUZZY_CANDIDATES):
+            if len(candidate) < MIN_FUZZY_LENGTH:
+                continue
+            score = difflib.SequenceMatcher(None, key, candidate).ratio()
+            if score > best_score:
+                best, best_score = candidate, score
+        if best_score >= self.threshold:
+            return self._known[best]
+        return None
+
+    def resolve(self, name):
+        """
+        Returns the canonical entity for a company or industry name
+
+        Args:
+            name (str): Name as entered, e.g. "Tesla, Inc." or "TSLA"
+
+        Returns:
+            Entity: (key, name); a new entity if nothing known matches
+        """
+        key = normalize_name(name)
+        if not key:
+            return Entity(name.strip().casefold(), name.strip())
+
+        with self._lock:
+            match = self._exact_match(key)
+        return match or Entity(key, display_name(name))
+
+    def _exact_match(self, key):
+        if key in self._aliases:
+            return self._aliases[key]
+        self._refresh()
+        if key in self._known:
+            return self._known[key]
+        compact = self._compact.get(_compact(key))
+        return self._known[compact] if compact is not None else None
+
+    def suggest(self, name):
+        """
+        Returns a known entity spelled similarly to a name that resolves to
+        a new entity, e.g. to ask "did you mean ...?"; never used in its place
+
+        Returns:
+            Entity: The most similar known entity above the threshold, or None
+        """
+        key = normalize_name(name)
+        if len(key) < MIN_FUZZY_LENGTH:
+            return None
+        with self._lock:
+            if self._exact_match(key) is not None:
+                return None
+            return self._fuzzy_match(key)
+
+    def remember(self, entity):
+        """Adds an analyzed entity to the index shared by all processes"""
+        with self._lock:
+            self._refresh()
+            if entity.key in self._known:
+                return
+            self._add(entity)
+            saved = {e.key: e.name for e in self._known.values() if e not in self._aliases.values()}
+            try:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(saved, f, ensure_ascii=False, indent=2)
+                os.replace(tmp_path, self.path)
+                self._loaded_mtime = os.path.getmtime(self.path)
+            except IOError as e:
+                print(f"Error saving entity index {self.path}: {e}")
+
+def canonical_key(name):
+    """Key under which results for a name are shared, e.g. for caches and job dedup"""
+    return entities.resolve(name).key
+
+# Process-wide index used by the orchestrator, the job queue and the app
+entities = EntityIndex()
@@ -0,0 +1,127 @@
+# checkpoints.py
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from config import Config
+
+def input_hash(*parts):
+    """
+    Hashes the inputs a stage depends on
+
+    Args:
+        *parts: JSON-serializable values (settings, upstream outputs, ...)
+
+    Returns:
+        str: Short hex digest used in checkpoint file names
+    """
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+def make_run_id(company_or_industry):
+    """Derives the default run ID from the analysis input"""
+    return re.sub(r'[^a-z0-9_.-]', '', company_or_industry.strip().replace(' ', '_').lower()) or "run"
+
+class CheckpointStore:
+    """
+    Persists stage outputs as JSON files keyed by run ID and input hash
+
+    Layout: <CHECKPOINT_DIR>/<run_id>/<stage>-<input_hash>.json for whole-stage
+    outputs, and <stage>-<input_hash>.jsonl for per-item outputs that are
+    appended as each item completes.
+
+    Checkpoints older than the TTL are not loaded, so a later analysis of the
+    same input resumes an interrupted run but refreshes a finished one.
+    """
+
+    def __init__(self, run_id, root=None, ttl=None):
+        """
+        Args:
+            run_id (str): Checkpoint namespace
+            root (str): Defaults to Config.CHECKPOINT_DIR
+            ttl (float): Seconds a checkpoint is reused, defaults to
+                Config.CHECKPOINT_TTL; 0 to reuse it forever
+        """
+        self.run_id = run_id
+        self.root = root or Config.CHECKPOINT_DIR
+        self.directory = os.path.join(self.root, run_id)
+        self.ttl = Config.CHECKPOINT_TTL if ttl is None else ttl
+        self._lock = threading.Lock()
+
+    def _expired(self, saved_at):
+        return bool(self.ttl) and time.time() - saved_at > self.ttl
+
+    def _path(self, stage, stage_hash, extension):
+        return os.path.join(self.directory, f"{stage}-{stage_hash}.{extension}")
+
+    def load(self, stage, stage_hash):
+        """
+        Loads a whole-stage checkpoint
+
+        Returns:
+            The saved value, or None if there is no usable checkpoint
+        """
+        path = self._path(stage, stage_hash, "json")
+        if not os.path.exists(path):
+            return None
+        try:
+            if self._expired(os.path.getmtime(path)):
+                return None
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (IOError, ValueError) as e:
+            print(f"Ignoring unreadable checkpoint {path}: {e}")
+            return None
+
+    def save(self, stage, stage_hash, value):
+        """Atomically writes a whole-stage checkpoint"""
+        path = self._path(stage, stage_hash, "json")
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(value, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except IOError as e:
+            print(f"Error saving checkpoint {path}: {e}")
+
+    def load_items(self, stage, stage_hash):
+        """
+        Loads the per-item checkpoints of a stage
+
+        Returns:
+            dict: Item key -> saved value, without expired items
+        """
+        path = self._path(stage, stage_hash, "jsonl")
+        items = {}
+        if not os.path.exists(path):
+            return items
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # A torn last line from an interrupted run
+                        continue
+                    # Appending keeps the file's mtime fresh, so items carry their own time
+                    if self._expired(record.get("saved_at", 0)):
+                        continue
+                    items[record["key"]] = record["value"]
+        except IOError as e:
+            print(f"Ignoring unreadable checkpoint {path}: {e}")
+        return items
+
+    def save_item(self, stage, stage_hash, key, value):
+        """Appends one completed item to the stage's per-item checkpoint"""
+        path = self._path(stage, stage_hash, "jsonl")
+        line = json.dumps({"key": key, "value": value, "saved_at": time.time()}, ensure_ascii=False) + "\n"
+        try:
+            with self._lock:
+                os.makedirs(self.directory, exist_ok=True)
+                with open(path, 'a', encoding='utf-8') as f:
+                    f.write(line)
+        except IOError as e:
+            print(f"Error saving checkpoint {path}: {e}")
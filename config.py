@@ -25,9 +25,202 @@ class Config:
     RANDOM_SLEEP_MIN = 2
     RANDOM_SLEEP_MAX = 5
     
+    # Research scraping (see SearchAgent.search_and_scrape): extra candidates
+    # fetched concurrently beyond MAX_SEARCH_RESULTS, the shortest page text
+    # that counts as a document, the total text after which scraping stops
+    # (0 for no limit) and the most SerpApi result pages requested
+    SEARCH_OVERFETCH = int(os.getenv("SEARCH_OVERFETCH", "2"))
+    SCRAPE_WORKERS = int(os.getenv("SCRAPE_WORKERS", "4"))
+    SEARCH_MIN_DOC_CHARS = 200
+    RESEARCH_TARGET_CHARS = int(os.getenv("RESEARCH_TARGET_CHARS", "60000"))
+    SEARCH_MAX_PAGES = 3
+    
+    # Use case ranking: "score" sorts by the weighted core score, "pareto" by
+    # Pareto layers over impact, complexity and data availability
+    RANKING_MODE = os.getenv("RANKING_MODE", "score")
+    
+    # Scraped text kept in memory per run before further pages spill to disk
+    MAX_RESIDENT_DOC_BYTES = int(os.getenv("MAX_RESIDENT_DOC_BYTES", str(2 * 1024 * 1024)))
+    DOC_SPILL_DIR = os.getenv("DOC_SPILL_DIR") or None
+    
+    # Retries, backoff and hedging of outbound calls per provider (see call_policy.py).
+    # Non-idempotent calls are only retried if the request never reached the server;
+    # hedge_quantile sends a duplicate request once a call is slower than that
+    # percentile of recent calls (None disables hedging)
+    DEFAULT_CALL_POLICY = {
+        "max_attempts": 3,
+        "base_delay": 0.5,
+        "max_delay": 8.0,
+        "retry_ratio": 0.2,
+        "idempotent": True,
+        "hedge_quantile": None,
+    }
+    CALL_POLICIES = {
+        "serpapi": {"max_attempts": 3},  # Billed per search, never hedged
+        "web": {"max_attempts": 2, "hedge_quantile": 0.95},
+        "openai": {"max_attempts": 3, "base_delay": 1.0, "max_delay": 20.0, "idempotent": False},
+        "kaggle": {"hedge_quantile": 0.95},
+        "huggingface": {"hedge_quantile": 0.95},
+        "github": {"hedge_quantile": 0.95},
+    }
+    HEDGE_MAX_WORKERS = 32
+    
+    # Outbound calls of every analysis share these limits per provider: calls
+    # in flight, and calls started per `per` seconds. Providers not listed
+    # are not limited. With SCHEDULER_SHARED they hold for all processes on
+    # the host together (admission state in SCHEDULER_DB_PATH), otherwise
+    # for each process
+    SCHEDULER_LIMITS = {
+        "serpapi": {"concurrency": 4, "calls": 60, "per": 60},
+        "web": {"concurrency": 16},
+        "openai": {"concurrency": 8, "calls": 300, "per": 60},
+        "kaggle": {"concurrency": 2, "calls": 60, "per": 60},
+        "huggingface": {"concurrency": 4},
+        "github": {"concurrency": 4, "calls": 30, "per": 60},
+    }
+    # Priority of calls made outside an explicit priority class:
+    # "interactive", "batch" or "background"
+    REQUEST_PRIORITY = os.getenv("REQUEST_PRIORITY", "interactive")
+    # Share of a provider's concurrency each class may fill, and share of its
+    # quota each class leaves for the classes above it
+    SCHEDULER_CLASS_SHARES = {"interactive": 1.0, "batch": 0.75, "background": 0.5}
+    SCHEDULER_QUOTA_RESERVES = {"interactive": 0.0, "batch": 0.1, "background": 0.25}
+    SCHEDULER_SHARED = os.getenv("SCHEDULER_SHARED", "true").lower() == "true"
+    # Slots of calls whose process died are freed after this many seconds
+    SCHEDULER_SLOT_TIMEOUT = 600
+    
+    # Model settings
+    USECASE_MODEL = os.getenv("USECASE_MODEL", "gpt-4o-mini")
+    
+    # Map-reduce mode: condense each page into a fact sheet with a cheap model
+    # first, then generate use cases from the fact sheets
+    SUMMARIZE_DOCUMENTS = os.getenv("SUMMARIZE_DOCUMENTS", "false").lower() == "true"
+    SUMMARY_MODEL = os.getenv("SUMMARY_MODEL", "gpt-4o-mini")
+    SUMMARY_WORKERS = int(os.getenv("SUMMARY_WORKERS", "4"))
+    SUMMARY_MAX_DOC_CHARS = 12000
+    SUMMARY_TIMEOUT = 60
+    
+    # Pipeline settings
+    DATASET_SEARCH_WORKERS = int(os.getenv("DATASET_SEARCH_WORKERS", "3"))
+    PRINT_PIPELINE_REPORT = os.getenv("PRINT_PIPELINE_REPORT", "true").lower() == "true"
+    
+    # Time budget for a whole analysis in seconds (unset for no limit)
+    ANALYSIS_TIME_BUDGET = float(os.getenv("ANALYSIS_TIME_BUDGET")) if os.getenv("ANALYSIS_TIME_BUDGET") else None
+    BUDGET_STAGE_SHARES = {
+        "research": 0.35,
+        "use_cases": 0.40,
+        "datasets": 0.20,
+        "report": 0.05,
+    }
+    BUDGET_CONTEXT_CHARS_PER_SECOND = 1500
+    BUDGET_MIN_CONTEXT_CHARS = 4000
+    BUDGET_MIN_LLM_TIMEOUT = 10
+    
+    # Batch settings
+    BATCH_MAX_WORKERS = int(os.getenv("BATCH_MAX_WORKERS", "4"))
+    BATCH_USE_PROCESSES = os.getenv("BATCH_USE_PROCESSES", "false").lower() == "true"
+    
     # Output settings
     OUTPUT_DIR = "outputs"
     
+    # Input canonicalization (see canonical.py): aliases map tickers and other
+    # names to one entity; unknown names match a known one above the threshold
+    ENTITY_ALIASES = {
+        "TSLA": "Tesla",
+        "AAPL": "Apple",
+        "MSFT": "Microsoft",
+        "GOOGL": "Google",
+        "GOOG": "Google",
+        "Alphabet": "Google",
+        "AMZN": "Amazon",
+        "NVDA": "Nvidia",
+        "META": "Meta",
+        "Facebook": "Meta",
+    }
+    ENTITY_ALIASES_PATH = os.getenv("ENTITY_ALIASES_PATH")
+    ENTITY_INDEX_PATH = os.getenv("ENTITY_INDEX_PATH", os.path.join(OUTPUT_DIR, "entities.json"))
+    # Similarity of a new input to a known one above which the app suggests it
+    FUZZY_MATCH_THRESHOLD = float(os.getenv("FUZZY_MATCH_THRESHOLD", "0.85"))
+    
+    # Near-duplicate use cases (across the analyses of a process) share one
+    # dataset search; see dedup.py
+    DEDUP_USE_CASES = os.getenv("DEDUP_USE_CASES", "true").lower() == "true"
+    # Weighted title and description similarity. The same or a reordered title
+    # alone scores DEDUP_TITLE_WEIGHT, so the threshold above it also asks for
+    # overlapping descriptions (a description cosine of 0.125 at the defaults)
+    DEDUP_SIMILARITY = float(os.getenv("DEDUP_SIMILARITY", "0.65"))
+    DEDUP_TITLE_WEIGHT = float(os.getenv("DEDUP_TITLE_WEIGHT", "0.6"))
+    DEDUP_HASH_DIMENSIONS = 2 ** 20
+    DEDUP_MAX_CLUSTERS = 5000
+    DEDUP_TTL = 24 * 3600
+    
+    # Watch list refresh (see watchlist.py): reports are regenerated only when
+    # the research similarity to the last refresh drops below the threshold
+    WATCH_INTERVAL = float(os.getenv("WATCH_INTERVAL", str(6 * 3600)))
+    WATCH_CHANGE_THRESHOLD = float(os.getenv("WATCH_CHANGE_THRESHOLD", "0.9"))
+    WATCH_STATE_PATH = os.path.join(OUTPUT_DIR, "watchlist_state.json")
+    WATCH_LOG_PATH = os.path.join(OUTPUT_DIR, "watchlist_log.jsonl")
+    
+    # Persistent caches of search results, pages, LLM completions, dataset
+    # searches and summaries (see cache.py), in one SQLite database shared by
+    # all processes on the host; TTL in seconds per namespace
+    ENABLE_CACHE = os.getenv("ENABLE_CACHE", "true").lower() == "true"
+    CACHE_DIR = os.getenv("CACHE_DIR", os.path.join(OUTPUT_DIR, "cache"))
+    CACHE_DB_PATH = os.getenv("CACHE_DB_PATH", os.path.join(CACHE_DIR, "cache.sqlite3"))
+    CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+    CACHE_LEASE_TIMEOUT = 300
+    CACHE_TTLS = {
+        "search": 24 * 3600,
+        "pages": 24 * 3600,
+        "completions": 7 * 24 * 3600,
+        "datasets": 7 * 24 * 3600,
+        "summaries": 30 * 24 * 3600,
+    }
+    
+    # Bulk generation through the OpenAI Batch API (see llm_batch.py); point
+    # LLM_BATCH_BASE_URL at `python llm_batch.py serve` to test locally
+    LLM_BATCH_BASE_URL = os.getenv("LLM_BATCH_BASE_URL") or None
+    LLM_BATCH_POLL_INTERVAL = float(os.getenv("LLM_BATCH_POLL_INTERVAL", "60"))
+    LLM_BATCH_DIR = os.path.join(OUTPUT_DIR, "llm_batches")
+    
+    # Cache pre-warming (see prewarm.py): local off-peak window and niceness
+    PREWARM_WINDOW = os.getenv("PREWARM_WINDOW", "01:00-06:00")
+    PREWARM_NICE = 10
+    
+    # Job queue settings
+    USE_JOB_QUEUE = os.getenv("USE_JOB_QUEUE", "true").lower() == "true"
+    JOB_DB_PATH = os.getenv("JOB_DB_PATH", os.path.join(OUTPUT_DIR, "jobs.sqlite3"))
+    SCHEDULER_DB_PATH = os.getenv("SCHEDULER_DB_PATH", os.path.join(OUTPUT_DIR, "scheduler.sqlite3"))
+    JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+    JOB_POLL_INTERVAL = 1
+    JOB_HEARTBEAT_INTERVAL = 30
+    JOB_STALE_AFTER = 600
+    JOB_MAX_ATTEMPTS = 3
+    
+    # How long the app reuses a completed analysis for the same input
+    APP_RESULT_TTL = int(os.getenv("APP_RESULT_TTL", "3600"))
+    
+    # Coalesce concurrent identical analyses within and across processes
+    SINGLE_FLIGHT = os.getenv("SINGLE_FLIGHT", "true").lower() == "true"
+    FLIGHT_DIR = os.getenv("FLIGHT_DIR", os.path.join(OUTPUT_DIR, "inflight"))
+    
+    # Observability settings (set to an empty string to disable)
+    TRACE_DIR = os.getenv("TRACE_DIR", os.path.join(OUTPUT_DIR, "traces"))
+    METRICS_TEXTFILE = os.getenv("METRICS_TEXTFILE", os.path.join(OUTPUT_DIR, "metrics.prom"))
+    METRICS_PORT = int(os.getenv("METRICS_PORT", "9464"))
+    
+    # Opt-in cProfile and tracemalloc profiling of every pipeline stage
+    ENABLE_PROFILING = os.getenv("ENABLE_PROFILING", "false").lower() == "true"
+    PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(OUTPUT_DIR, "profiles"))
+    PROFILE_TOP = 25
+    
+    # Checkpoint settings
+    ENABLE_CHECKPOINTS = os.getenv("ENABLE_CHECKPOINTS", "true").lower() == "true"
+    CHECKPOINT_DIR = os.getenv("CHECKPOINT_DIR", os.path.join(OUTPUT_DIR, "checkpoints"))
+    # Stage outputs older than this are redone, so finished analyses refresh
+    # (0 to resume from them forever)
+    CHECKPOINT_TTL = float(os.getenv("CHECKPOINT_TTL", "21600"))
+    
     @classmethod
     def validate_keys(cls):
         """Validate that required API keys are present"""
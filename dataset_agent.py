@@ -1,9 +1,16 @@
 # agents/dataset_agent.py
 import os
+import threading
+import time
+from itertools import islice
 from kaggle.api.kaggle_api_extended import KaggleApi
 from huggingface_hub import HfApi
 from github import Github, RateLimitExceededException, Auth
+from cache import cache_for
+from call_policy import policy_for
 from config import Config
+from records import Dataset
+from tracing import tracer
 
 class DatasetAgent:
     """Agent responsible for finding relevant datasets and resources"""
@@ -11,6 +18,9 @@ class DatasetAgent:
     def __init__(self):
         self.config = Config()
         self._setup_kaggle()
+        # Smoothed latency per provider, used to skip slow providers under a time budget
+        self.provider_latency = {}
+        self._latency_lock = threading.Lock()
     
     def _setup_kaggle(self):
         """Setup Kaggle API authentication"""
@@ -33,34 +43,36 @@ class DatasetAgent:
         results = []
         
         try:
-            search_results = self.kaggle_api.dataset_list(search=keyword, sort_by="hottest")
+            search_results = policy_for("kaggle").call(
+                lambda: self.kaggle_api.dataset_list(search=keyword, sort_by="hottest")
+            )
 
             if not search_results:
                 print(f"No datasets found on Kaggle for '{keyword}'")
                 return []
 
             for ds in search_results[:max_results]:
-                dataset_info = {
-                    "url": f"https://www.kaggle.com/{ds.ref}",
-                    "title": getattr(ds, "title", "Untitled Dataset"),
-                    "notes": f"Kaggle Dataset - Downloads: {getattr(ds, 'downloadCount', 'N/A')}, Views: {getattr(ds, 'viewCount', 'N/A')}"
-                }
+                dataset_info = Dataset(
+                    f"https://www.kaggle.com/{ds.ref}",
+                    getattr(ds, "title", "Untitled Dataset"),
+                    provider="kaggle",
+                    downloads=getattr(ds, "downloadCount", None),
+                    views=getattr(ds, "viewCount", None)
+                )
 
                 try:
                     # Fetch file info for dataset size
-                    files_in_dataset = self.kaggle_api.dataset_list_files(ds.ref)
+                    files_in_dataset = policy_for("kaggle").call(
+                        lambda: self.kaggle_api.dataset_list_files(ds.ref)
+                    )
                     if files_in_dataset and hasattr(files_in_dataset, "datasetFiles"):
-                        total_size_bytes = sum(
+                        dataset_info.size_bytes = sum(
                             getattr(f, "totalBytes", 0) for f in files_in_dataset.datasetFiles
                         )
-                        total_size_mb = total_size_bytes / (1024 * 1024)
-                        dataset_info["notes"] += f", Total Size: {total_size_mb:.2f} MB"
-                    else:
-                        dataset_info["notes"] += ", Size info not available"
 
                 except Exception as e:
+                    # The size is left unknown
                     print(f"  - Error getting file list for {ds.ref}: {e}")
-                    dataset_info["notes"] += ", Error getting size info"
 
                 results.append(dataset_info)
 
@@ -80,14 +92,18 @@ class DatasetAgent:
         
         try:
             api = HfApi()
-            datasets = api.list_datasets(search=keyword, sort="downloads", limit=max_results)
+            # list_datasets pages lazily; the request happens while iterating
+            datasets = policy_for("huggingface").call(
+                lambda: list(api.list_datasets(search=keyword, sort="downloads", limit=max_results))
+            )
 
             for ds in datasets:
-                results.append({
-                    "url": f"https://huggingface.co/datasets/{ds.id}",
-                    "title": ds.id.split('/')[-1],
-                    "notes": f"HuggingFace Dataset, downloads: {ds.downloads}"
-                })
+                results.append(Dataset(
+                    f"https://huggingface.co/datasets/{ds.id}",
+                    ds.id.split('/')[-1],
+                    provider="huggingface",
+                    downloads=ds.downloads
+                ))
             return results
         except Exception as e:
             print(f"Error searching Hugging Face: {e}")
@@ -110,21 +126,23 @@ class DatasetAgent:
             g = Github(auth=auth)
 
             query = f"{keyword} dataset"
-            repositories = g.search_repositories(
-                query=query, 
-                sort="stars", 
-                order="desc", 
-                per_page=max_results
+            repositories = policy_for("github").call(
+                # The paginated list only makes requests while iterating
+                lambda: list(islice(g.search_repositories(
+                    query=query, 
+                    sort="stars", 
+                    order="desc", 
+                    per_page=max_results
+                ), max_results))
             )
 
-            for i, repo in enumerate(repositories):
-                if i >= max_results:
-                    break
-                results.append({
-                    "url": repo.html_url,
-                    "title": repo.full_name,
-                    "notes": f"GitHub Repo, stars: {repo.stargazers_count}"
-                })
+            for repo in repositories:
+                results.append(Dataset(
+                    repo.html_url,
+                    repo.full_name,
+                    provider="github",
+                    stars=repo.stargazers_count
+                ))
             return results
             
         except RateLimitExceededException:
@@ -144,37 +162,118 @@ class DatasetAgent:
         Returns:
             list: Updated use cases with datasets attached
         """
-        updated_use_cases = []
+        return [self.find_datasets_for_use_case(uc) for uc in use_cases]
+
+    def find_datasets_for_use_case(self, uc, budget=None):
+        """
+        Searches for relevant datasets and resources for a single use case
         
-        for uc in use_cases:
-            keywords = []
-            # Extract keywords from title and description
-            all_words = []
-            if uc.get("title"):
-                all_words.extend(uc["title"].lower().replace(':', '').split())
-            if uc.get("description"):
-                all_words.extend(uc["description"].lower().replace(':', '').split())
-
-            # Filter out short words and basic stopwords
-            stop_words = [
-                'for', 'and', 'with', 'the', 'from', 'about', 'this', 'that', 
-                'which', 'using', 'based', 'improve', 'enhance', 'generate', 
-                'automate', 'predict', 'implement', 'utilize', 'leverage'
-            ]
-            keywords = [
-                word for word in all_words 
-                if len(word) > 2 and word not in stop_words
-            ]
-
-            search_keywords = " ".join(list(set(keywords))[:5])  # Take up to 5 unique keywords
-
-            datasets = []
-            # Search across all platforms
-            datasets.extend(self.search_kaggle(search_keywords))
-            datasets.extend(self.search_huggingface(search_keywords))
-            datasets.extend(self.search_github(search_keywords))
-
-            uc['datasets'] = datasets
-            updated_use_cases.append(uc)
+        Args:
+            uc (dict): Use case dictionary
+            budget (LatencyBudget): Optional time budget; providers expected to
+                take longer than the dataset share has left are skipped
             
-        return updated_use_cases
\ No newline at end of file
+        Returns:
+            dict: The same use case with 'datasets' attached
+        """
+        uc['datasets'], _ = self.search_providers(uc, budget)
+        return uc
+
+    def search_providers(self, uc, budget=None):
+        """
+        Runs the provider searches for a single use case
+        
+        Args:
+            uc (dict): Use case dictionary
+            budget (LatencyBudget): Optional time budget, see find_datasets_for_use_case
+            
+        Returns:
+            tuple: (list of Dataset, list of providers skipped for the budget)
+        """
+        search_keywords = self.extract_search_keywords(uc)
+
+        providers = [
+            ("kaggle", self.search_kaggle),
+            ("huggingface", self.search_huggingface),
+            ("github", self.search_github),
+        ]
+        if budget and budget.limited:
+            # Fastest providers first so the time left goes as far as possible
+            providers.sort(key=lambda p: self.provider_latency.get(p[0], 0.0))
+
+        datasets = []
+        skipped = []
+        # Search across all platforms
+        for provider, search in providers:
+            def compute(provider=provider, search=search):
+                if budget and budget.limited:
+                    remaining = budget.stage_remaining("datasets")
+                    if remaining <= self.provider_latency.get(provider, 0.0):
+                        budget.degrade(
+                            "datasets",
+                            f"skipped {provider} for '{uc.get('title')}' ({remaining:.1f}s left)"
+                        )
+                        skipped.append(provider)
+                        return None
+
+                started = time.perf_counter()
+                with tracer.span("dataset.search", provider=provider, keywords=search_keywords) as span:
+                    found = search(search_keywords)
+                    span.set("results", len(found))
+                self._record_latency(provider, time.perf_counter() - started)
+                return [d.to_dict() for d in found]
+
+            cache_key = f"{provider}:{self.config.MAX_DATASET_RESULTS}:{search_keywords}"
+            # Providers return [] on errors too, so only results are cached
+            found, hit = cache_for("datasets").get_or_compute(cache_key, compute, cacheable=bool)
+            if hit:
+                with tracer.span("dataset.search", provider=provider, keywords=search_keywords) as span:
+                    span.set("cache_hits", 1)
+                    span.set("results", len(found))
+            datasets.extend(Dataset.from_dict(d) for d in found or [])
+
+        return datasets, skipped
+
+    def _record_latency(self, provider, elapsed):
+        with self._latency_lock:
+            previous = self.provider_latency.get(provider)
+            self.provider_latency[provider] = elapsed if previous is None else 0.7 * previous + 0.3 * elapsed
+
+    def extract_search_keywords(self, uc):
+        """Builds the provider search query from a use case title and description"""
+        return extract_search_keywords(uc)
+
+
+# Basic stopwords dropped from provider search queries
+STOP_WORDS = [
+    'for', 'and', 'with', 'the', 'from', 'about', 'this', 'that', 
+    'which', 'using', 'based', 'improve', 'enhance', 'generate', 
+    'automate', 'predict', 'implement', 'utilize', 'leverage'
+]
+
+
+def extract_search_keywords(uc):
+    """
+    Builds the provider search query from a use case title and description
+    
+    Args:
+        uc (dict): Use case dictionary
+        
+    Returns:
+        str: Up to 5 unique keywords separated by spaces
+    """
+    # Extract keywords from title and description
+    all_words = []
+    if uc.get("title"):
+        all_words.extend(uc["title"].lower().replace(':', '').split())
+    if uc.get("description"):
+        all_words.extend(uc["description"].lower().replace(':', '').split())
+
+    # Filter out short words and basic stopwords
+    keywords = [
+        word for word in all_words 
+        if len(word) > 2 and word not in STOP_WORDS
+    ]
+
+    # Take up to 5 unique keywords, in order, so the query (and its cache key) is stable
+    return " ".join(list(dict.fromkeys(keywords))[:5])
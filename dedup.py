@@ -0,0 +1,261 @@
+# dedup.py
+import collections
+import copy
+import re
+import threading
+import time
+import zlib
+from concurrent.futures import Future
+import numpy as np
+from config import Config
+
+# Words too common in use cases to tell two of them apart
+STOP_WORDS = {
+    "the", "and", "for", "with", "from", "into", "that", "this", "which", "their",
+    "using", "based", "use", "case", "cases", "ai", "genai", "powered", "driven",
+    "improve", "enhance", "generate", "automate", "predict", "implement", "utilize",
+    "leverage",
+}
+
+def _words(text):
+    return [w for w in re.findall(r"[a-z0-9']+", (text or "").lower()) if len(w) > 2 and w not in STOP_WORDS]
+
+def _title_features(use_case):
+    """Title words; their order does not matter, short titles reorder freely"""
+    return [f"t:{w}" for w in _words(use_case.get("title"))]
+
+def _description_features(use_case):
+    """Unigrams and bigrams of the description"""
+    words = _words(use_case.get("description"))
+    return [f"d:{w}" for w in words] + [f"d:{a} {b}" for a, b in zip(words, words[1:])]
+
+class HashingTfidf:
+    """
+    TF-IDF vectors over hashed features with document frequencies learned online
+
+    Features are hashed with crc32 into a fixed number of dimensions, so the
+    vocabulary never has to be known up front and vectors are comparable
+    across processes. Vectors are sparse: (indices, values) arrays.
+    Document frequencies are only kept for features that occurred.
+
+    The title and the description are normalized separately and scaled by
+    the square roots of their weights, so the dot product of two vectors is
+    the weighted sum of the title and the description cosine similarities.
+    Titles are short and say what the use case is; descriptions vary in
+    wording between companies even for the same idea.
+    """
+
+    def __init__(self, dimensions=None, title_weight=None):
+        self.dimensions = dimensions or Config.DEDUP_HASH_DIMENSIONS
+        self.title_weight = title_weight if title_weight is not None else Config.DEDUP_TITLE_WEIGHT
+        self.document_frequency = collections.Counter()
+        self.documents = 0
+
+    def transform(self, use_case, learn=True):
+        """
+        Args:
+            use_case (dict): Use case with 'title' and 'description'
+            learn (bool): Count the use case into the document frequencies
+
+        Returns:
+            tuple: (indices, values) numpy arrays, empty if there are no features
+        """
+        fields = [
+            (self._hash(_title_features(use_case)), self.title_weight),
+            (self._hash(_description_features(use_case)), 1.0 - self.title_weight),
+        ]
+        if learn:
+            self.document_frequency.update(
+                i for hashes, _ in fields for i in np.unique(hashes).tolist()
+            )
+            self.documents += 1
+
+        parts = [self._weigh(hashes, weight) for hashes, weight in fields if len(hashes) and weight > 0]
+        if not parts:
+            return np.array([], dtype=np.int64), np.array([], dtype=np.float32)
+        indices = np.concatenate([i for i, _ in parts])
+        values = np.concatenate([v for _, v in parts])
+        # Title and description features rarely share a hash bucket, but may
+        indices, inverse = np.unique(indices, return_inverse=True)
+        return indices, np.bincount(inverse, weights=values).astype(np.float32)
+
+    def _hash(self, features):
+        return np.array([zlib.crc32(f.encode('utf-8')) % self.dimensions for f in features], dtype=np.int64)
+
+    def _weigh(self, hashes, weight):
+        """TF-IDF values of one field, with norm sqrt(weight)"""
+        indices, counts = np.unique(hashes, return_counts=True)
+        frequency = np.array([self.document_frequency[i] for i in indices.tolist()], dtype=np.float64)
+        idf = np.log((1 + self.documents) / (1 + frequency)) + 1.0
+        values = (1 + np.log(counts)) * idf
+        return indices, values * (np.sqrt(weight) / np.linalg.norm(values))
+
+class UseCaseClusterer:
+    """
+    Online leader clustering of use cases by cosine similarity
+
+    Each use case joins the most similar existing cluster if its similarity
+    to that cluster's leader reaches the threshold, otherwise it starts a new
+    cluster and becomes its leader. Leaders are kept in an inverted index
+    from feature to leader weights, so a lookup only touches the leaders
+    that share a feature with the use case.
+
+    The threshold must exceed the title weight, so the same title alone
+    never merges two use cases; their descriptions have to overlap too.
+    """
+
+    def __init__(self, threshold=None, max_clusters=None, dimensions=None, title_weight=None):
+        self.threshold = threshold if threshold is not None else Config.DEDUP_SIMILARITY
+        self.max_clusters = max_clusters or Config.DEDUP_MAX_CLUSTERS
+        self.vectorizer = HashingTfidf(dimensions, title_weight)
+        if self.threshold <= self.vectorizer.title_weight:
+            raise ValueError(
+                f"Dedup similarity {self.threshold} must be above the title weight "
+                f"{self.vectorizer.title_weight}, or equal titles alone would merge use cases"
+            )
+        self._lock = threading.Lock()
+        self._leaders = collections.OrderedDict()  # Cluster ID -> feature indices, oldest first
+        self._postings = {}                        # Feature index -> {cluster ID: weight}
+        self._next_id = 0
+
+    def similarities(self, indices, values):
+        """
+        Returns:
+            dict: Cluster ID -> cosine similarity, for the leaders sharing a feature
+        """
+        scores = collections.defaultdict(float)
+        for index, value in zip(indices.tolist(), values.tolist()):
+            for cluster_id, weight in self._postings.get(index, {}).items():
+                scores[cluster_id] += value * weight
+        return scores
+
+    def _add_leader(self, cluster_id, indices, values):
+        self._leaders[cluster_id] = indices.tolist()
+        for index, value in zip(indices.tolist(), values.tolist()):
+            self._postings.setdefault(index, {})[cluster_id] = value
+
+    def _forget_oldest(self):
+        cluster_id, indices = self._leaders.popitem(last=False)
+        for index in indices:
+            posting = self._postings[index]
+            del posting[cluster_id]
+            if not posting:
+                del self._postings[index]
+
+    def assign(self, use_case):
+        """
+        Returns:
+            tuple: (cluster ID, similarity to its leader; 1.0 for a new cluster)
+        """
+        with self._lock:
+            indices, values = self.vectorizer.transform(use_case)
+            if len(indices):
+                sims = self.similarities(indices, values)
+                if sims:
+                    best = max(sims, key=sims.get)
+                    if sims[best] >= self.threshold:
+                        return best, float(sims[best])
+
+            cluster_id = self._next_id
+            self._next_id += 1
+            if len(indices):
+                if len(self._leaders) >= self.max_clusters:
+                    # Forget the oldest leader; its use cases just stop matching
+                    self._forget_oldest()
+                self._add_leader(cluster_id, indices, values)
+            return cluster_id, 1.0
+
+    @property
+    def clusters(self):
+        return len(self._leaders)
+
+class ClusteredSearch:
+    """
+    Runs one dataset search per cluster of near-duplicate use cases
+
+    The first use case of a cluster runs the search. Use cases that join the
+    cluster later, or while that search is still running, receive a copy of
+    its results. Results expire after a TTL. Results cut short by a time
+    budget are never shared, and a failed search is retried by the next
+    member.
+    """
+
+    def __init__(self, clusterer=None, ttl=None):
+        self.clusterer = clusterer or UseCaseClusterer()
+        self.ttl = ttl if ttl is not None else Config.DEDUP_TTL
+        self._lock = threading.Lock()
+        self._searches = {}  # Cluster ID -> (started at, Future of (datasets, skipped))
+        self.searches = 0
+        self.shared = 0
+
+    def search(self, use_case, run_search):
+        """
+        Args:
+            use_case (dict): Use case to find datasets for
+            run_search (callable): Runs the provider searches for this use case,
+                returning (datasets, skipped providers)
+
+        Returns:
+            tuple: (datasets, skipped providers, shared) where shared is True
+                if the results came from another use case of the cluster
+        """
+        cluster_id, similarity = self.clusterer.assign(use_case)
+        with self._lock:
+            entry = self._searches.get(cluster_id)
+            if entry is not None and time.time() - entry[0] > self.ttl:
+                entry = None
+            leader = entry is None
+            if leader:
+                if len(self._searches) >= self.clusterer.max_clusters:
+                    self._prune()
+                future = Future()
+                self._searches[cluster_id] = (time.time(), future)
+            else:
+                future = entry[1]
+
+        if not leader:
+            try:
+                datasets, skipped = future.result()
+                if not skipped:
+                    with self._lock:
+                        self.shared += 1
+                    print(f"Reusing datasets of a similar use case ({similarity:.2f}) for: {use_case.get('title')}")
+                    return copy.deepcopy(datasets), [], True
+            except Exception:
+                pass
+            # The cluster's search failed or was cut short; search for this one
+            datasets, skipped = run_search()
+            with self._lock:
+                self.searches += 1
+            return datasets, skipped, False
+
+        try:
+            datasets, skipped = run_search()
+        except BaseException as e:
+            future.set_exception(e)
+            with self._lock:
+                self._searches.pop(cluster_id, None)
+            raise
+        future.set_result((copy.deepcopy(datasets), list(skipped)))
+        with self._lock:
+            self.searches += 1
+            if skipped:
+                self._searches.pop(cluster_id, None)
+        return datasets, skipped, False
+
+    def _prune(self):
+        # Finished searches older than the TTL, or of the oldest clusters
+        now = time.time()
+        finished = [
+            (started, cluster_id) for cluster_id, (started, future) in self._searches.items()
+            if future.done()
+        ]
+        finished.sort()
+        excess = len(self._searches) - self.clusterer.max_clusters + 1
+        for i, (started, cluster_id) in enumerate(finished):
+            if i < excess or now - started > self.ttl:
+                del self._searches[cluster_id]
+
+    def stats(self):
+        with self._lock:
+            return {"clusters": self.clusterer.clusters, "searches": self.searches, "shared": self.shared}
@@ -0,0 +1,250 @@
+# documents.py
+import hashlib
+import mmap
+import os
+import sys
+import tempfile
+import threading
+from collections.abc import Mapping
+from config import Config
+
+try:
+    import resource
+except ImportError:  # Windows: no peak RSS reporting
+    resource = None
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB, or None where unsupported"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    if sys.platform == "darwin":
+        return peak / (1024 * 1024)
+    return peak / 1024
+
+class Document(Mapping):
+    """
+    Read-only, dict-compatible view of one document in a DocumentStore
+
+    Supports doc['url'], doc['title'], doc['text'] and doc.get(...) like the
+    plain dicts the agents used to pass around. The text is only decoded when
+    it is asked for; text_view() gives the raw UTF-8 bytes without a copy.
+    """
+
+    __slots__ = ("store", "index")
+
+    KEYS = ("url", "title", "text")
+
+    def __init__(self, store, index):
+        self.store = store
+        self.index = index
+
+    def __getitem__(self, key):
+        if key == "text":
+            return self.store.text(self.index)
+        if key in ("url", "title"):
+            return self.store._meta[self.index][key]
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(self.KEYS)
+
+    def __len__(self):
+        return len(self.KEYS)
+
+    @property
+    def digest(self):
+        """SHA-256 of the text, computed when the document was added"""
+        return self.store._meta[self.index]["digest"]
+
+    def text_view(self):
+        return self.store.text_view(self.index)
+
+    def __repr__(self):
+        return f"Document({self['url']!r}, {self.store._meta[self.index]['length']} bytes)"
+
+class DocumentStore:
+    """
+    Scraped documents of one run with a cap on the text held in memory
+
+    Texts are kept as UTF-8 bytes. Once the resident total would exceed
+    max_resident_bytes, further texts are appended to an anonymous temporary
+    file and read back through a memory map, so a run's footprint stays
+    bounded however many or however large the pages are. The file is removed
+    when the store is closed or garbage collected.
+    """
+
+    def __init__(self, max_resident_bytes=None, spill_dir=None):
+        """
+        Args:
+            max_resident_bytes (int): Text kept in memory before spilling,
+                defaults to Config.MAX_RESIDENT_DOC_BYTES
+            spill_dir (str): Directory of the spill file, defaults to
+                Config.DOC_SPILL_DIR or the system temp directory
+        """
+        if max_resident_bytes is None:
+            max_resident_bytes = Config.MAX_RESIDENT_DOC_BYTES
+        self.max_resident_bytes = max_resident_bytes
+        self.spill_dir = spill_dir or Config.DOC_SPILL_DIR
+        self.resident_bytes = 0
+        self.spilled_bytes = 0
+        self._meta = []
+        self._resident = []
+        self._lock = threading.Lock()
+        self._spill_file = None
+        self._spill_map = None
+        self._retired_maps = []
+
+    @classmethod
+    def from_documents(cls, documents, max_resident_bytes=None, spill_dir=None):
+        """Builds a store from dicts with 'url', 'title' and 'text', e.g. a checkpoint"""
+        store = cls(max_resident_bytes, spill_dir)
+        for doc in documents:
+            store.add(doc.get("url"), doc.get("title"), doc.get("text", ""))
+        return store
+
+    def add(self, url, title, text):
+        """
+        Adds a document, spilling its text to disk if the resident cap is reached
+
+        Returns:
+            Document: View of the added document
+        """
+        data = text.encode('utf-8')
+        meta = {
+            "url": url,
+            "title": title,
+            "length": len(data),
+            "digest": hashlib.sha256(data).hexdigest(),
+            "offset": None,
+        }
+        with self._lock:
+            if self.resident_bytes + len(data) <= self.max_resident_bytes:
+                self._resident.append(data)
+                meta["slot"] = len(self._resident) - 1
+                self.resident_bytes += len(data)
+            else:
+                if self._spill_file is None:
+                    directory = self.spill_dir
+                    if directory:
+                        os.makedirs(directory, exist_ok=True)
+                    self._spill_file = tempfile.TemporaryFile(prefix="docs-", dir=directory)
+                self._spill_file.seek(0, os.SEEK_END)
+                meta["offset"] = self._spill_file.tell()
+                self._spill_file.write(data)
+                self._spill_file.flush()
+                self.spilled_bytes += len(data)
+            self._meta.append(meta)
+            return Document(self, len(self._meta) - 1)
+
+    def _mapped(self, end):
+        # Remap when the file has grown past the current map; views into the
+        # old map stay valid, so it is only closed with the store
+        if self._spill_map is None or len(self._spill_map) < end:
+            if self._spill_map is not None:
+                self._retired_maps.append(self._spill_map)
+            self._spill_map = mmap.mmap(self._spill_file.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._spill_map
+
+    def text_view(self, index):
+        """Returns the UTF-8 text of a document as a memoryview, without copying it"""
+        with self._lock:
+            meta = self._meta[index]
+            if meta["offset"] is None:
+                return memoryview(self._resident[meta["slot"]])
+            end = meta["offset"] + meta["length"]
+            if meta["length"] == 0:
+                return memoryview(b"")
+            return memoryview(self._mapped(end))[meta["offset"]:end]
+
+    def text(self, index):
+        """Decodes the text of a document"""
+        with self.text_view(index) as view:
+            return str(view, 'utf-8')
+
+    def __len__(self):
+        return len(self._meta)
+
+    def __iter__(self):
+        for index in range(len(self._meta)):
+            yield Document(self, index)
+
+    def __getitem__(self, index):
+        return Document(self, range(len(self._meta))[index])
+
+    @property
+    def total_bytes(self):
+        return self.resident_bytes + self.spilled_bytes
+
+    def stats(self):
+        return {
+            "documents": len(self),
+            "resident_bytes": self.resident_bytes,
+            "spilled_bytes": self.spilled_bytes,
+        }
+
+    def close(self):
+        """Releases the spill file and its memory maps"""
+        with self._lock:
+            for mapped in self._retired_maps + [self._spill_map]:
+                if mapped is None:
+                    continue
+                try:
+                    mapped.close()
+                except BufferError:
+                    # A caller still holds a view; the map goes with it
+                    pass
+            self._retired_maps = []
+            self._spill_map = None
+            if self._spill_file is not None:
+                self._spill_file.close()
+                self._spill_file = None
+
+def document_digest(doc):
+    """SHA-256 of a document's text, for Documents and plain dicts alike"""
+    if isinstance(doc, Document):
+        return doc.digest
+    return hashlib.sha256(doc.get('text', '').encode('utf-8')).hexdigest()
+
+def build_context(documents, separator="\n", max_bytes=None):
+    """
+    Joins document texts into the LLM context with a single copy
+
+    Texts of Documents are read through their memoryviews, so spilled pages
+    are copied straight from the memory map into the context buffer.
+
+    Args:
+        documents (iterable): Documents or plain dicts with a 'text' field
+        separator (str): Placed between texts
+        max_bytes (int): Truncate the context to this many UTF-8 bytes
+
+    Returns:
+        tuple: (context string, full context size in bytes before truncation)
+    """
+    sep = separator.encode('utf-8')
+    views = []
+    for doc in documents:
+        if isinstance(doc, Document):
+            view = doc.text_view()
+        else:
+            view = memoryview(doc.get('text', '').encode('utf-8'))
+        if len(view):
+            views.append(view)
+
+    total = sum(len(v) for v in views) + len(sep) * max(0, len(views) - 1)
+    size = total if max_bytes is None else min(total, max_bytes)
+    buffer = bytearray(size)
+    position = 0
+    for i, view in enumerate(views):
+        for part in ((sep,) if i else ()) + (view,):
+            n = min(len(part), size - position)
+            buffer[position:position + n] = part[:n]
+            position += n
+        if position >= size:
+            break
+    for view in views:
+        view.release()
+
+    # A cut can fall inside a multi-byte character; drop the partial bytes
+    return buffer.decode('utf-8', errors='ignore'), total
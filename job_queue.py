@@ -0,0 +1,247 @@
+# job_queue.py
+import json
+import os
+import sqlite3
+import time
+import uuid
+from contextlib import closing
+from config import Config
+from canonical import canonical_key
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    company TEXT NOT NULL,
+    key TEXT,
+    status TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    worker TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    heartbeat_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at);
+CREATE TABLE IF NOT EXISTS job_events (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id TEXT NOT NULL,
+    event TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS job_events_job_seq ON job_events (job_id, seq);
+"""
+
+# Databases created before jobs were keyed get the column added on open
+MIGRATIONS = [
+    ("key", "ALTER TABLE jobs ADD COLUMN key TEXT"),
+]
+
+INDEXES = """
+CREATE INDEX IF NOT EXISTS jobs_key_status ON jobs (key, status);
+"""
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+class JobQueue:
+    """
+    Analysis jobs in a local SQLite table shared by app replicas and workers
+
+    Every call opens its own short-lived connection, so one JobQueue can be
+    used from several threads and the database from several processes.
+    """
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path or Config.JOB_DB_PATH
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+            for column, statement in MIGRATIONS:
+                if column not in columns:
+                    conn.execute(statement)
+            conn.executescript(INDEXES)
+
+    def _connect(self):
+        # Autocommit mode; multi-statement updates use explicit transactions
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA busy_timeout=30000")
+        return conn
+
+    @staticmethod
+    def _to_dict(row):
+        if row is None:
+            return None
+        job = dict(row)
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def submit(self, company_or_industry):
+        """
+        Enqueues an analysis
+
+        If a job for the same canonical input is already queued or running,
+        no new job is created and the caller gets that job's ID, so identical
+        requests from several sessions or replicas share one run.
+
+        Args:
+            company_or_industry (str): The name of the company or industry to research
+
+        Returns:
+            str: The job ID to poll with get()
+        """
+        key = canonical_key(company_or_industry)
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT id FROM jobs WHERE key = ? AND status IN (?, ?) ORDER BY created_at LIMIT 1",
+                    (key, QUEUED, RUNNING)
+                ).fetchone()
+                if row is not None:
+                    job_id = row["id"]
+                else:
+                    job_id = uuid.uuid4().hex
+                    conn.execute(
+                        "INSERT INTO jobs (id, company, key, status, created_at) VALUES (?, ?, ?, ?, ?)",
+                        (job_id, company_or_industry, key, QUEUED, time.time())
+                    )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return job_id
+
+    def get(self, job_id):
+        """
+        Returns a job as a dict with 'status' ('queued', 'running', 'done' or
+        'failed'), 'result' (the prioritized use cases once done) and 'error',
+        or None if the job does not exist
+        """
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_dict(row)
+
+    def claim(self, worker_id):
+        """
+        Atomically takes the oldest queued job for a worker
+
+        Returns:
+            dict: The claimed job, or None if the queue is empty
+        """
+        now = time.time()
+        with closing(self._connect()) as conn:
+            # BEGIN IMMEDIATE takes the write lock up front, so two workers
+            # can never select the same queued row
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT id FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1",
+                    (QUEUED,)
+                ).fetchone()
+                if row is None:
+                    conn.execute("COMMIT")
+                    return None
+                conn.execute(
+                    "UPDATE jobs SET status = ?, worker = ?, attempts = attempts + 1, "
+                    "started_at = ?, heartbeat_at = ? WHERE id = ?",
+                    (RUNNING, worker_id, now, now, row["id"])
+                )
+                job = conn.execute("SELECT * FROM jobs WHERE id = ?", (row["id"],)).fetchone()
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return self._to_dict(job)
+
+    def add_event(self, job_id, event):
+        """Appends a progress event (a JSON-serializable dict) to a running job"""
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "INSERT INTO job_events (job_id, event, created_at) VALUES (?, ?, ?)",
+                (job_id, json.dumps(event), time.time())
+            )
+
+    def events(self, job_id, after_seq=0):
+        """
+        Returns the progress events of a job recorded after after_seq
+
+        Returns:
+            list of tuple: (seq, event dict) in the order they were recorded
+        """
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT seq, event FROM job_events WHERE job_id = ? AND seq > ? ORDER BY seq",
+                (job_id, after_seq)
+            ).fetchall()
+        return [(row["seq"], json.loads(row["event"])) for row in rows]
+
+    def heartbeat(self, job_id):
+        """Marks a running job as still alive"""
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "UPDATE jobs SET heartbeat_at = ? WHERE id = ? AND status = ?",
+                (time.time(), job_id, RUNNING)
+            )
+
+    def complete(self, job_id, result):
+        """Stores the result of a finished job"""
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, finished_at = ? WHERE id = ?",
+                (DONE, json.dumps(result), time.time(), job_id)
+            )
+
+    def fail(self, job_id, error):
+        """Marks a job as failed with an error message"""
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE id = ?",
+                (FAILED, error, time.time(), job_id)
+            )
+
+    def requeue_stale(self, stale_after=None, max_attempts=None):
+        """
+        Puts running jobs whose worker stopped sending heartbeats back in the
+        queue, or fails them once they have used up their attempts
+
+        Returns:
+            int: Number of jobs requeued or failed
+        """
+        if stale_after is None:
+            stale_after = Config.JOB_STALE_AFTER
+        if max_attempts is None:
+            max_attempts = Config.JOB_MAX_ATTEMPTS
+        cutoff = time.time() - stale_after
+
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                failed = conn.execute(
+                    "UPDATE jobs SET status = ?, error = ?, finished_at = ? "
+                    "WHERE status = ? AND heartbeat_at < ? AND attempts >= ?",
+                    (FAILED, "Worker stopped responding", time.time(), RUNNING, cutoff, max_attempts)
+                ).rowcount
+                requeued = conn.execute(
+                    "UPDATE jobs SET status = ?, worker = NULL WHERE status = ? AND heartbeat_at < ?",
+                    (QUEUED, RUNNING, cutoff)
+                ).rowcount
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return failed + requeued
+
+    def counts(self):
+        """Returns the number of jobs per status"""
+        with closing(self._connect()) as conn:
+            rows = conn.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        return {row["status"]: row["n"] for row in rows}
@@ -0,0 +1,506 @@
+# llm_batch.py
+import argparse
+import contextvars
+import json
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from email.parser import BytesParser
+from email.policy import default as email_policy
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import openai
+from batch import read_companies
+from cache import cache_for
+from call_policy import policy_for
+from canonical import entities
+from config import Config
+from scheduler import BATCH, priority, set_default_priority
+
+# Batch statuses after which the batch will not change any more
+TERMINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+
+class BulkGenerator:
+    """
+    Generates the use cases of many inputs through the OpenAI Batch API
+
+    Research is scraped (or loaded from its checkpoint) for every input and
+    the use case prompts are written to one JSONL batch file, which is
+    uploaded and submitted as a batch. Once the batch completes, each
+    completion is stored in the "completions" cache under the key the live
+    UseCaseAgent looks up, so a following run_analysis() of the input
+    reuses it instead of calling the model. The batch ID and the mapping of
+    requests to inputs are saved, so results can be collected after a restart.
+    """
+
+    def __init__(self, orchestrator=None, client=None, state_dir=None, poll_interval=None):
+        """
+        Args:
+            orchestrator (Orchestrator): Defaults to a new one
+            client (openai.OpenAI): Defaults to a client for Config.LLM_BATCH_BASE_URL
+            state_dir (str): Directory for batch files and state, defaults to Config.LLM_BATCH_DIR
+            poll_interval (float): Seconds between status checks of a submitted batch
+        """
+        if orchestrator is None:
+            from orchestrator import Orchestrator
+            orchestrator = Orchestrator()
+        self.orchestrator = orchestrator
+        self.usecase_agent = orchestrator.usecase_agent
+        # Retries are left to the shared call policy
+        self.client = client or openai.OpenAI(
+            api_key=Config.OPENAI_API_KEY,
+            base_url=Config.LLM_BATCH_BASE_URL,
+            max_retries=0
+        )
+        if not hasattr(self.client, "batches"):
+            raise RuntimeError(
+                f"openai {getattr(openai, '__version__', '?')} has no Batch API; "
+                "bulk generation needs the release pinned in requirements.txt"
+            )
+        self.state_dir = state_dir or Config.LLM_BATCH_DIR
+        self.poll_interval = poll_interval if poll_interval is not None else Config.LLM_BATCH_POLL_INTERVAL
+        self._stop = threading.Event()
+
+    def prepare(self, companies):
+        """
+        Builds one chat completion request per input
+
+        Returns:
+            list of dict: Requests with 'custom_id', 'company', 'cache_key' and 'body'
+        """
+        names = list(dict.fromkeys(entities.resolve(c).name for c in companies if c.strip()))
+        print(f"Preparing research for {len(names)} inputs...")
+        with ThreadPoolExecutor(max_workers=Config.BATCH_MAX_WORKERS, thread_name_prefix="research") as executor:
+            futures = [
+                executor.submit(contextvars.copy_context().run, self.orchestrator.prepare_research, name)
+                for name in names
+            ]
+            research = [future.result() for future in futures]
+
+        requests = []
+        for company, research_docs in zip(names, research):
+            if not research_docs:
+                print(f"No research for {company}, leaving it out of the batch")
+                continue
+            prompt, _ = self.usecase_agent.build_prompt(company, research_docs)
+            if prompt is None:
+                continue
+            cache_key = self.usecase_agent.completion_key(prompt)
+            if cache_for("completions").get(cache_key) is not None:
+                print(f"Completion for {company} is already cached")
+                continue
+            requests.append({
+                "custom_id": f"usecases-{len(requests)}",
+                "company": company,
+                "cache_key": cache_key,
+                # Same request as the live stream, minus streaming
+                "body": {
+                    "model": Config.USECASE_MODEL,
+                    "messages": [{"role": "user", "content": prompt}],
+                    "temperature": 0.7,
+                },
+            })
+        return requests
+
+    def submit(self, companies):
+        """
+        Prepares the requests, uploads the batch file and creates the batch
+
+        Returns:
+            str: The batch ID, or None if there was nothing to submit
+        """
+        if not Config.ENABLE_CACHE:
+            raise ValueError("Bulk generation hands completions over through the cache; set ENABLE_CACHE=true")
+        if not Config.ENABLE_CHECKPOINTS:
+            print("Warning: without checkpoints the later runs scrape again and may not match the batch prompts")
+
+        requests = self.prepare(companies)
+        if not requests:
+            print("Nothing to submit.")
+            return None
+
+        os.makedirs(self.state_dir, exist_ok=True)
+        input_path = os.path.join(self.state_dir, f"input_{time.strftime('%Y%m%d_%H%M%S')}.jsonl")
+        with open(input_path, 'w', encoding='utf-8') as f:
+            for request in requests:
+                f.write(json.dumps({
+                    "custom_id": request["custom_id"],
+                    "method": "POST",
+                    "url": "/v1/chat/completions",
+                    "body": request["body"],
+                }, ensure_ascii=False) + "\n")
+
+        policy = policy_for("openai")
+        with open(input_path, 'rb') as f:
+            data = f.read()
+        input_file = policy.call(
+            lambda: self.client.files.create(file=(os.path.basename(input_path), data), purpose="batch")
+        )
+        batch = policy.call(lambda: self.client.batches.create(
+            input_file_id=input_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h"
+        ))
+        print(f"Submitted batch {batch.id} with {len(requests)} requests")
+
+        self._save_state(batch.id, {
+            "batch_id": batch.id,
+            "input_file_id": input_file.id,
+            "input_path": input_path,
+            "submitted_at": time.time(),
+            "requests": {r["custom_id"]: {"company": r["company"], "cache_key": r["cache_key"]} for r in requests},
+        })
+        return batch.id
+
+    def wait(self, batch_id):
+        """
+        Polls the batch until it reaches a terminal status or stop() is called
+
+        Returns:
+            The batch object, or None if stopped
+        """
+        while True:
+            batch = policy_for("openai").call(lambda: self.client.batches.retrieve(batch_id), idempotent=True)
+            counts = batch.request_counts
+            progress = f" ({counts.completed}/{counts.total} done, {counts.failed} failed)" if counts else ""
+            print(f"Batch {batch_id}: {batch.status}{progress}")
+            if batch.status in TERMINAL_STATUSES:
+                return batch
+            if self._stop.wait(self.poll_interval):
+                return None
+
+    def collect(self, batch_id, batch=None):
+        """
+        Stores the completions of a finished batch in the completions cache
+
+        Returns:
+            dict: Company -> number of use cases parsed from its completion
+                (0 if its request failed)
+        """
+        from agents.usecase_agent import parse_use_cases
+
+        state = self._load_state(batch_id)
+        batch = batch or policy_for("openai").call(lambda: self.client.batches.retrieve(batch_id), idempotent=True)
+        results = {request["company"]: 0 for request in state["requests"].values()}
+
+        if batch.error_file_id:
+            for line in self._download(batch.error_file_id).splitlines():
+                if line.strip():
+                    record = json.loads(line)
+                    request = state["requests"].get(record.get("custom_id"))
+                    if request:
+                        print(f"Batch request for {request['company']} failed: {record.get('error')}")
+
+        if not batch.output_file_id:
+            print(f"Batch {batch_id} ended as {batch.status} without output")
+            return results
+
+        for line in self._download(batch.output_file_id).splitlines():
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            request = state["requests"].get(record.get("custom_id"))
+            if request is None:
+                continue
+            response = record.get("response") or {}
+            if record.get("error") or response.get("status_code") != 200:
+                print(f"Batch request for {request['company']} failed: {record.get('error') or response.get('status_code')}")
+                continue
+            content = response["body"]["choices"][0]["message"]["content"] or ""
+            use_cases = parse_use_cases(content)
+            # As in the live path, only completions with use cases are kept
+            if use_cases:
+                cache_for("completions").set(request["cache_key"], content)
+            results[request["company"]] = len(use_cases)
+
+        stored = sum(1 for n in results.values() if n)
+        print(f"Stored completions for {stored} of {len(results)} inputs from batch {batch_id}")
+        return results
+
+    def finish(self, companies, summary_path=None):
+        """
+        Runs the remaining stages (datasets, prioritization, reports) for the
+        inputs; use case generation is served from the stored completions
+
+        Yields:
+            dict: Per-company results as run_analysis_many() yields them
+        """
+        from orchestrator import run_analysis_many
+        # The batch may have outlived CHECKPOINT_TTL; the runs must still use
+        # the research the prompts were built from, or they miss the completions
+        for company in companies:
+            self.orchestrator.renew_research(company)
+        # The prompts were built without a time budget; a budget would cap the
+        # context and change the completion key, so run these without one
+        if Config.ANALYSIS_TIME_BUDGET:
+            print("Finishing the bulk runs without ANALYSIS_TIME_BUDGET so they match the batch prompts")
+        yield from run_analysis_many(companies, summary_path=summary_path, time_budget=0)
+
+    def run(self, companies, finish=True):
+        """
+        Submits, waits for and collects one batch, then optionally finishes the runs
+
+        Returns:
+            dict: Company -> number of use cases from the batch
+        """
+        companies = list(companies)
+        with priority(BATCH):
+            batch_id = self.submit(companies)
+            results = {}
+            if batch_id is not None:
+                batch = self.wait(batch_id)
+                if batch is None:
+                    print(f"Stopped waiting; collect later with: python llm_batch.py collect {batch_id}")
+                    return results
+                results = self.collect(batch_id, batch)
+            if finish:
+                for result in self.finish(companies):
+                    print(f"{result['company']}: {result['status']}, {len(result['use_cases'])} use cases")
+        return results
+
+    def stop(self):
+        self._stop.set()
+
+    def _download(self, file_id):
+        response = policy_for("openai").call(lambda: self.client.files.content(file_id), idempotent=True)
+        return response.text
+
+    def _state_path(self, batch_id):
+        return os.path.join(self.state_dir, f"{batch_id}.json")
+
+    def _save_state(self, batch_id, state):
+        with open(self._state_path(batch_id), 'w', encoding='utf-8') as f:
+            json.dump(state, f, indent=2)
+
+    def _load_state(self, batch_id):
+        with open(self._state_path(batch_id), 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+def standin_completion(body):
+    """Canned use cases for a chat completion request, naming the input of the prompt"""
+    prompt = body["messages"][-1]["content"]
+    match = re.search(r"facts about (.+?) \(context below\)", prompt)
+    name = match.group(1) if match else "the company"
+    blocks = [
+        f"TITLE: {title} for {name}\n"
+        f"DESCRIPTION: {description}\n"
+        f"DATA SOURCES: {sources}\n"
+        f"BUSINESS IMPACT: {impact}\n"
+        f"COMPLEXITY: {complexity}\n"
+        for title, description, sources, impact, complexity in (
+            ("Customer Support Assistant", "Answer customer questions with a retrieval-augmented chatbot.", "support tickets, product docs", "High", "Medium"),
+            ("Demand Forecasting", "Forecast demand to plan inventory and staffing.", "sales data, seasonality", "High", "Medium"),
+            ("Document Summarization", "Summarize contracts and reports for faster review.", "internal documents", "Medium", "Low"),
+            ("Personalized Marketing", "Generate personalized campaign content per segment.", "customer data, campaign history", "Medium", "Medium"),
+            ("Anomaly Detection", "Flag unusual transactions or sensor readings.", "transaction logs, telemetry", "High", "High"),
+        )
+    ]
+    return "---\n".join(blocks)
+
+class StandInBatchServer:
+    """
+    Minimal local stand-in for the OpenAI files and batches endpoints
+
+    Implements file upload and download, batch creation and retrieval.
+    Batches complete `delay` seconds after creation, answering every
+    request with respond(body), by default canned use cases. Meant for
+    testing the bulk mode without quota: set LLM_BATCH_BASE_URL to
+    base_url.
+    """
+
+    def __init__(self, port=0, delay=2.0, respond=None):
+        self.delay = delay
+        self.respond = respond or standin_completion
+        self.files = {}
+        self.batches = {}
+        # Reentrant: completing a batch on retrieval adds its output file
+        self._lock = threading.RLock()
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self._thread = None
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}/v1"
+
+    def start(self):
+        """Serves in a background thread; returns the base URL"""
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="batch-standin", daemon=True)
+        self._thread.start()
+        return self.base_url
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def _add_file(self, filename, data, purpose):
+        file_id = f"file-{uuid.uuid4().hex[:24]}"
+        with self._lock:
+            self.files[file_id] = {
+                "id": file_id, "object": "file", "bytes": len(data), "created_at": int(time.time()),
+                "filename": filename, "purpose": purpose, "status": "processed", "data": data,
+            }
+        return file_id
+
+    def _create_batch(self, params):
+        batch_id = f"batch_{uuid.uuid4().hex[:24]}"
+        now = int(time.time())
+        batch = {
+            "id": batch_id, "object": "batch", "endpoint": params["endpoint"], "errors": None,
+            "input_file_id": params["input_file_id"], "completion_window": params["completion_window"],
+            "status": "in_progress", "output_file_id": None, "error_file_id": None,
+            "created_at": now, "in_progress_at": now, "expires_at": now + 24 * 3600, "completed_at": None,
+            "request_counts": {"total": 0, "completed": 0, "failed": 0}, "metadata": params.get("metadata"),
+        }
+        with self._lock:
+            lines = self.files[params["input_file_id"]]["data"].decode('utf-8').splitlines()
+            batch["request_counts"]["total"] = sum(1 for line in lines if line.strip())
+            self.batches[batch_id] = batch
+        return batch
+
+    def _advance(self, batch):
+        # Runs the batch once its delay has passed
+        if batch["status"] != "in_progress" or time.time() - batch["created_at"] < self.delay:
+            return
+        lines = self.files[batch["input_file_id"]]["data"].decode('utf-8').splitlines()
+        output = []
+        for line in lines:
+            if not line.strip():
+                continue
+            request = json.loads(line)
+            body = request["body"]
+            output.append(json.dumps({
+                "id": f"batch_req_{uuid.uuid4().hex[:24]}",
+                "custom_id": request["custom_id"],
+                "response": {
+                    "status_code": 200,
+                    "request_id": uuid.uuid4().hex,
+                    "body": {
+                        "id": f"chatcmpl-{uuid.uuid4().hex[:24]}",
+                        "object": "chat.completion",
+                        "created": int(time.time()),
+                        "model": body.get("model"),
+                        "choices": [{
+                            "index": 0,
+                            "message": {"role": "assistant", "content": self.respond(body)},
+                            "finish_reason": "stop",
+                        }],
+                    },
+                },
+                "error": None,
+            }))
+        batch["output_file_id"] = self._add_file(f"{batch['id']}_output.jsonl", ("\n".join(output) + "\n").encode('utf-8'), "batch_output")
+        batch["request_counts"]["completed"] = len(output)
+        batch["status"] = "completed"
+        batch["completed_at"] = int(time.time())
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _send(self, status, payload=None, raw=None):
+                data = raw if raw is not None else json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header("Content-Type", "application/octet-stream" if raw is not None else "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _body(self):
+                return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+            def do_POST(self):
+                if self.path == "/v1/files":
+                    message = BytesParser(policy=email_policy).parsebytes(
+                        f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode('utf-8') + self._body()
+                    )
+                    fields = {}
+                    for part in message.iter_parts():
+                        name = part.get_param("name", header="content-disposition")
+                        fields[name] = (part.get_filename(), part.get_payload(decode=True))
+                    filename, data = fields.get("file", ("input.jsonl", b""))
+                    purpose = (fields.get("purpose") or (None, b"batch"))[1].decode('utf-8')
+                    file_id = server._add_file(filename, data, purpose)
+                    entry = {k: v for k, v in server.files[file_id].items() if k != "data"}
+                    self._send(200, entry)
+                elif self.path == "/v1/batches":
+                    params = json.loads(self._body() or b"{}")
+                    if params.get("input_file_id") not in server.files:
+                        self._send(404, {"error": {"message": "No such file", "type": "invalid_request_error"}})
+                        return
+                    self._send(200, server._create_batch(params))
+                else:
+                    self._send(404, {"error": {"message": "Not found", "type": "invalid_request_error"}})
+
+            def do_GET(self):
+                match = re.fullmatch(r"/v1/batches/([\w-]+)", self.path)
+                if match and match.group(1) in server.batches:
+                    with server._lock:
+                        batch = server.batches[match.group(1)]
+                        server._advance(batch)
+                        self._send(200, batch)
+                    return
+                match = re.fullmatch(r"/v1/files/([\w-]+)/content", self.path)
+                if match and match.group(1) in server.files:
+                    self._send(200, raw=server.files[match.group(1)]["data"])
+                    return
+                self._send(404, {"error": {"message": "Not found", "type": "invalid_request_error"}})
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+def main(argv=None):
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description="Generate use cases for many inputs through the Batch API")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="Submit a batch for a list of inputs and wait for it")
+    run.add_argument("input", help="CSV file with a header row, or a text file with one name per line")
+    run.add_argument("--column", help="CSV column with the names (default: first column)")
+    run.add_argument("--no-finish", action="store_true",
+                     help="Only store the completions, do not run the dataset and report stages")
+
+    collect = commands.add_parser("collect", help="Wait for and collect a batch submitted earlier")
+    collect.add_argument("batch_id")
+    collect.add_argument("--no-finish", action="store_true",
+                         help="Only store the completions, do not run the dataset and report stages")
+
+    serve = commands.add_parser("serve", help="Run a local stand-in for the batch endpoints")
+    serve.add_argument("--port", type=int, default=8765)
+    serve.add_argument("--delay", type=float, default=5.0, help="Seconds until a batch completes")
+    args = parser.parse_args(argv)
+
+    if args.command == "serve":
+        server = StandInBatchServer(args.port, args.delay)
+        print(f"Stand-in batch API at {server.base_url}; set LLM_BATCH_BASE_URL to it")
+        try:
+            server.httpd.serve_forever()
+        except KeyboardInterrupt:
+            server.stop()
+        return 0
+
+    Config.validate_keys()
+    set_default_priority(BATCH)
+    generator = BulkGenerator()
+    try:
+        if args.command == "run":
+            generator.run(read_companies(args.input, args.column), finish=not args.no_finish)
+        else:
+            batch = generator.wait(args.batch_id)
+            if batch is not None:
+                generator.collect(args.batch_id, batch)
+                if not args.no_finish:
+                    companies = [r["company"] for r in generator._load_state(args.batch_id)["requests"].values()]
+                    for result in generator.finish(companies):
+                        print(f"{result['company']}: {result['status']}, {len(result['use_cases'])} use cases")
+    except KeyboardInterrupt:
+        print("Stopping bulk generation...")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
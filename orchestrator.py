@@ -1,11 +1,76 @@
 # orchestrator.py
+import contextvars
+import json
 import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, FIRST_COMPLETED, wait
 from agents.research_agent import ResearchAgent
 from agents.usecase_agent import UseCaseAgent
 from agents.dataset_agent import DatasetAgent
 from agents.prioritizer import Prioritizer
 from agents.writer import Writer
+from budget import LatencyBudget
+from canonical import entities
+from checkpoints import CheckpointStore, input_hash, make_run_id
 from config import Config
+from dedup import ClusteredSearch
+from documents import DocumentStore, document_digest, peak_rss_mb
+from pipeline import Pipeline
+from profiling import RunProfiler
+from records import Dataset, UseCase, to_dicts
+from scheduler import current_priority, request_flow, set_default_priority
+from singleflight import coalescer
+from tracing import tracer
+
+class AnalysisRun:
+    """Per-run state shared by the pipeline stages of one analysis"""
+
+    def __init__(self, entity, run_id, checkpoints, resume, budget, on_event=None):
+        self.entity = entity
+        # Canonical name the agents search for, and the key stage outputs are stored under
+        self.company_or_industry = entity.name
+        self.key = entity.key
+        self.run_id = run_id
+        self.checkpoints = checkpoints
+        self.resume = resume and checkpoints is not None
+        self.budget = budget
+        self.on_event = on_event
+        # Research documents of the run, closed once the pipeline finishes
+        self.documents = None
+        # Position of each generated use case, so dataset events can refer to it
+        self._indexes = {}
+        self._lock = threading.Lock()
+
+    def emit(self, event):
+        """Sends a progress event to the listener; listener errors never fail the run"""
+        if self.on_event is None:
+            return
+        try:
+            self.on_event(event)
+        except Exception as e:
+            print(f"Progress listener failed: {e}")
+
+    def use_case_generated(self, use_case):
+        with self._lock:
+            index = len(self._indexes)
+            self._indexes[id(use_case)] = index
+        self.emit({"type": "use_case", "index": index, "use_case": use_case.to_dict()})
+
+    def datasets_found(self, use_case):
+        with self._lock:
+            index = self._indexes.get(id(use_case))
+        self.emit({"type": "datasets", "index": index, "datasets": [d.to_dict() for d in use_case.datasets or []]})
+
+    def can_checkpoint(self, stage):
+        # Output cut short by the time budget must not be reused by later runs
+        return self.checkpoints is not None and not self.budget.stage_degraded(stage)
+
+    def close(self):
+        """Releases the spill file of the research documents"""
+        if self.documents is not None:
+            self.documents.close()
+            self.documents = None
 
 class Orchestrator:
     """Main orchestrator for the multi-agent system workflow"""
@@ -17,72 +82,602 @@ class Orchestrator:
         self.dataset_agent = DatasetAgent()
         self.prioritizer = Prioritizer()
         self.writer = Writer()
+        # Shared by every analysis run through this orchestrator, e.g. a batch
+        self.clustered_search = ClusteredSearch() if self.config.DEDUP_USE_CASES else None
+        self.last_report = None
     
-    def run_analysis(self, company_or_industry):
+    def run_analysis(self, company_or_industry, run_id=None, resume=True, time_budget=None, on_event=None,
+                     profile=None):
         """
         Orchestrates the complete analysis workflow
+
+        The phases run as a streaming pipeline: dataset search for a use case
+        starts as soon as the LLM has finished writing that use case.
         
         Args:
             company_or_industry (str): The name of the company or industry to research
+            run_id (str): Checkpoint namespace, defaults to one derived from the input
+            resume (bool): Reuse checkpoints of completed stages from earlier runs
+            time_budget (float): Seconds the whole analysis may take, defaults to
+                Config.ANALYSIS_TIME_BUDGET (no limit when unset); 0 runs without
+                a limit even when the setting is
+            on_event (callable): Optional progress listener, see analyze()
+            profile (bool): Profile every stage, see analyze()
             
         Returns:
             list: Prioritized use cases with associated data and resources
         """
+        prioritized_usecases, report = self.analyze(
+            company_or_industry, run_id, resume, time_budget, on_event, profile
+        )
+        self.last_report = report
+        return prioritized_usecases
+
+    def analyze(self, company_or_industry, run_id=None, resume=True, time_budget=None, on_event=None,
+                profile=None):
+        """
+        Runs the analysis pipeline and returns its results with the timing report
+
+        The input is canonicalized first, so "Tesla, Inc.", "tesla" and "TSLA"
+        share one run ID, checkpoints and report. Concurrent analyses of the
+        same entity, from threads of this process or from other processes on
+        the host, are coalesced: later callers attach to the run in progress
+        and get its result. Their report is None and they receive no progress
+        events.
+
+        Args:
+            company_or_industry (str): The name of the company or industry to research
+            run_id (str): Checkpoint namespace, defaults to one derived from the input
+            resume (bool): Reuse checkpoints of completed stages from earlier runs
+            time_budget (float): Seconds the whole analysis may take
+            on_event (callable): Optional listener called from pipeline threads with
+                JSON-serializable progress events:
+                {"type": "stage", "stage", "status": "started"/"finished", "elapsed"},
+                {"type": "use_case", "index", "use_case"} as each use case is generated,
+                {"type": "datasets", "index", "datasets"} as its dataset search finishes
+            profile (bool): Run every stage under cProfile and tracemalloc and
+                write the profile to Config.PROFILE_DIR, defaults to
+                Config.ENABLE_PROFILING; see profiling.RunProfiler
+
+        Returns:
+            tuple: (prioritized use cases, PipelineReport or None)
+        """
+        entity = entities.resolve(company_or_industry)
+        company_or_industry = entity.name
+
+        if not self.config.SINGLE_FLIGHT:
+            return self._run_pipeline(company_or_industry, run_id, resume, time_budget, on_event, profile)
+
+        reports = {}
+
+        def run():
+            use_cases, reports["report"] = self._run_pipeline(
+                company_or_industry, run_id, resume, time_budget, on_event, profile
+            )
+            # Shared with other processes as JSON
+            return to_dicts(use_cases)
+
+        key = f"{entity.key}|{run_id or ''}"
+        use_cases, shared = coalescer.do(key, run)
+        if shared:
+            print(f"Attached to the analysis already in progress for: {company_or_industry}")
+        return [UseCase.from_dict(uc) for uc in use_cases], reports.get("report")
+
+    def _run_pipeline(self, company_or_industry, run_id, resume, time_budget, on_event, profile=None):
         print(f"Starting orchestration for: {company_or_industry}")
 
+        if time_budget is None:
+            time_budget = self.config.ANALYSIS_TIME_BUDGET
+        # 0 lifts the configured budget for this run
+        time_budget = time_budget or None
+        budget = LatencyBudget(time_budget)
+        rss_before = peak_rss_mb()
+        if profile is None:
+            profile = self.config.ENABLE_PROFILING
+        flow = run_id or make_run_id(company_or_industry)
+        profiler = RunProfiler(flow) if profile else None
+
+        # The run's outbound calls queue as one flow in the request scheduler
+        with tracer.span("analysis", company=company_or_industry, time_budget=time_budget) as span, \
+                request_flow(flow):
+            run = self._new_run(company_or_industry, run_id, resume, budget, on_event)
+            pipeline = self._build_stages(run, profiler)
+            if profiler is not None:
+                profiler.start()
+            try:
+                outputs = pipeline.run()
+            finally:
+                # Every stage has finished with the research documents by now
+                run.close()
+                if profiler is not None:
+                    profiler.finish()
+                    print(f"Profile saved to {profiler.directory}")
+            report = pipeline.last_report
+            report.degradations = budget.degradations
+            # ru_maxrss is a process-wide high-water mark; the growth is what
+            # this run added to it
+            rss_after = peak_rss_mb()
+            if rss_after is not None:
+                report.resources = {
+                    "peak_rss_mb": round(rss_after, 1),
+                    "peak_rss_growth_mb": round(rss_after - rss_before, 1),
+                }
+            span.set("use_cases", len(outputs["prioritization"]))
+            span.set("degraded", budget.degraded)
+            if profiler is not None:
+                report.resources["profile_dir"] = profiler.directory
+            for key, value in report.resources.items():
+                span.set(key, value)
+
+        if self.config.PRINT_PIPELINE_REPORT:
+            print(report.format())
+
+        if outputs["prioritization"]:
+            # Later spellings of this input can now be matched to it
+            entities.remember(entities.resolve(company_or_industry))
+
+        return outputs["prioritization"], report
+
+    def build_pipeline(self, company_or_industry, run_id=None, resume=True, budget=None, on_event=None,
+                       profiler=None):
+        """
+        Builds the stage graph for one analysis
+
+        Research, use case and dataset outputs are checkpointed under the run
+        ID. Prioritization and report writing are cheap and always re-run, so
+        changing their settings reuses every upstream checkpoint.
+
+        Args:
+            company_or_industry (str): The name of the company or industry to research
+            run_id (str): Checkpoint namespace, defaults to one derived from the input
+            resume (bool): Reuse checkpoints of completed stages from earlier runs
+            budget (LatencyBudget): Time budget the stages degrade against
+            on_event (callable): Optional progress listener, see analyze()
+            profiler (RunProfiler): Optional profiler the stages run under
+
+        Returns:
+            Pipeline: research -> use_cases -> datasets -> prioritization -> report
+        """
+        run = self._new_run(company_or_industry, run_id, resume, budget, on_event)
+        return self._build_stages(run, profiler)
+
+    def _new_run(self, company_or_industry, run_id=None, resume=True, budget=None, on_event=None):
+        entity = entities.resolve(company_or_industry)
+        run_id = run_id or make_run_id(entity.key)
+        checkpoints = CheckpointStore(run_id) if self.config.ENABLE_CHECKPOINTS else None
+        return AnalysisRun(
+            entity, run_id, checkpoints, resume, budget or LatencyBudget(None), on_event
+        )
+
+    def _build_stages(self, run, profiler=None):
+        pipeline = Pipeline(
+            f"analysis:{run.company_or_industry}",
+            listener=lambda stage, status, elapsed: run.emit(
+                {"type": "stage", "stage": stage, "status": status, "elapsed": elapsed}
+            ),
+            profiler=profiler
+        )
+
+        pipeline.add_stage(
+            "research",
+            lambda: self._research_stage(run),
+            kind="source"
+        )
+        pipeline.add_stage(
+            "use_cases",
+            lambda docs: self._usecase_stage(run, docs),
+            deps=["research"],
+            kind="gather"
+        )
+
+        dataset_hash = input_hash("datasets", self.config.MAX_DATASET_RESULTS)
+        saved_datasets = run.checkpoints.load_items("datasets", dataset_hash) if run.resume else {}
+        pipeline.add_stage(
+            "datasets",
+            lambda use_case: self._dataset_stage(run, use_case, dataset_hash, saved_datasets),
+            deps=["use_cases"],
+            kind="map",
+            workers=self.config.DATASET_SEARCH_WORKERS,
+            ordered=True
+        )
+        pipeline.add_stage(
+            "prioritization",
+            self._prioritization_stage,
+            deps=["datasets"],
+            kind="gather"
+        )
+        pipeline.add_stage(
+            "report",
+            lambda use_cases: self._report_stage(run, use_cases),
+            deps=["prioritization"],
+            kind="gather"
+        )
+        return pipeline
+
+    def refresh_research(self, company_or_industry):
+        """
+        Scrapes fresh research for an input without running any later stage
+        
+        Cached search results and pages are bypassed, so the documents show
+        what the web says now; the cache is updated with them.
+        
+        Args:
+            company_or_industry (str): The name of the company or industry to research
+            
+        Returns:
+            list: Research documents, empty if the research failed
+        """
+        return self.research_agent.conduct_research(entities.resolve(company_or_industry).name, refresh=True)
+
+    def store_research(self, company_or_industry, research_docs, run_id=None):
+        """
+        Stores research documents as the research checkpoint of an input
+        
+        A following run_analysis() with resume=True starts from these
+        documents and only re-runs the stages whose inputs changed.
+        
+        Args:
+            company_or_industry (str): The name of the company or industry to research
+            research_docs (list): Documents, e.g. from refresh_research()
+            run_id (str): Checkpoint namespace, defaults to one derived from the input
+        """
+        entity = entities.resolve(company_or_industry)
+        CheckpointStore(run_id or make_run_id(entity.key)).save(
+            "research",
+            self._research_hash(entity.key),
+            [dict(d) for d in research_docs]
+        )
+
+    def prepare_research(self, company_or_industry):
+        """
+        Returns the research of an input, scraping and checkpointing it only
+        if there is no research checkpoint yet
+        
+        Args:
+            company_or_industry (str): The name of the company or industry to research
+            
+        Returns:
+            list: Research documents, empty if the research failed
+        """
+        entity = entities.resolve(company_or_industry)
+        if self.config.ENABLE_CHECKPOINTS:
+            research_docs = CheckpointStore(make_run_id(entity.key)).load("research", self._research_hash(entity.key))
+            if research_docs:
+                return DocumentStore.from_documents(research_docs)
+
+        research_docs = self.research_agent.conduct_research(entity.name)
+        if research_docs and self.config.ENABLE_CHECKPOINTS:
+            self.store_research(entity.name, research_docs)
+        return research_docs
+
+    def renew_research(self, company_or_industry):
+        """
+        Restarts the TTL of an input's research checkpoint, even if it has
+        expired, so the following run uses exactly that research
+
+        Returns:
+            bool: False if there is no research checkpoint
+        """
+        entity = entities.resolve(company_or_industry)
+        store = CheckpointStore(make_run_id(entity.key), ttl=0)
+        research_docs = store.load("research", self._research_hash(entity.key))
+        if not research_docs:
+            return False
+        store.save("research", self._research_hash(entity.key), research_docs)
+        return True
+
+    def _research_hash(self, key):
+        return input_hash("research", key, self.config.MAX_SEARCH_RESULTS)
+
+    def _research_stage(self, run):
         # 1. Research Phase
+        stage_hash = self._research_hash(run.key)
+        if run.resume:
+            research_docs = run.checkpoints.load("research", stage_hash)
+            if research_docs:
+                print(f"Resuming research from checkpoint ({len(research_docs)} documents).")
+                tracer.current_span().incr("cache_hits")
+                run.documents = DocumentStore.from_documents(research_docs)
+                return run.documents
+
         print("Running research agent...")
-        research_docs = self.research_agent.conduct_research(company_or_industry)
+        research_docs = self.research_agent.conduct_research(run.company_or_industry, budget=run.budget)
         if not research_docs:
             print("Research phase failed or returned no documents.")
             return []
+        run.documents = research_docs
+
+        span = tracer.current_span()
+        for key, value in research_docs.stats().items():
+            span.set(key, value)
+        if run.can_checkpoint("research"):
+            run.checkpoints.save("research", stage_hash, [dict(d) for d in research_docs])
+        return research_docs
 
+    def _usecase_stage(self, run, research_docs):
         # 2. Use Case Generation Phase
-        print("Running use case generation agent...")
-        generated_use_cases = self.usecase_agent.generate_use_cases(
-            company_or_industry, 
-            research_docs
+        if not research_docs:
+            return
+
+        stage_hash = input_hash(
+            "use_cases",
+            run.key,
+            self.config.USECASE_MODEL,
+            self.config.SUMMARY_MODEL if self.config.SUMMARIZE_DOCUMENTS else None,
+            [document_digest(d) for d in research_docs]
         )
-        if not generated_use_cases:
+        if run.resume:
+            use_cases = run.checkpoints.load("use_cases", stage_hash)
+            if use_cases:
+                print(f"Resuming use cases from checkpoint ({len(use_cases)} use cases).")
+                tracer.current_span().incr("cache_hits")
+                for use_case in map(UseCase.from_dict, use_cases):
+                    run.use_case_generated(use_case)
+                    yield use_case
+                return
+
+        print("Running use case generation agent...")
+        use_cases = []
+        try:
+            for use_case in self.usecase_agent.stream_use_cases(
+                run.company_or_industry, research_docs, raise_errors=True, budget=run.budget
+            ):
+                # Keep a copy, the dataset stage attaches datasets to the emitted record
+                use_cases.append(use_case.to_dict())
+                run.use_case_generated(use_case)
+                yield use_case
+        except Exception:
+            # Do not checkpoint a partial response; the next run regenerates it.
+            # Re-raise so the pipeline records the error on the stage.
+            raise
+
+        if not use_cases:
             print("Use case generation phase failed or returned no use cases.")
-            return []
+        elif run.can_checkpoint("use_cases"):
+            run.checkpoints.save("use_cases", stage_hash, use_cases)
 
-        # 3. Resource Collection Phase
-        print("Running dataset agent...")
-        use_cases_with_datasets = self.dataset_agent.find_datasets_for_use_cases(
-            generated_use_cases
-        )
-        if not use_cases_with_datasets:
-            print("Dataset agent failed or returned no datasets.")
-            # Continue with use cases without datasets if the agent fails
-            use_cases_with_datasets = generated_use_cases
+    def _dataset_stage(self, run, use_case, dataset_hash, saved_datasets):
+        # 3. Resource Collection Phase, once per use case
+        item_key = input_hash(use_case.get('title'), use_case.get('description'))
+        if item_key in saved_datasets:
+            print(f"Resuming datasets from checkpoint for: {use_case.get('title')}")
+            tracer.current_span().incr("cache_hits")
+            use_case.datasets = [Dataset.from_dict(d) for d in saved_datasets[item_key]]
+            run.datasets_found(use_case)
+            return use_case
+
+        if run.budget.limited and run.budget.stage_remaining("datasets") <= 0:
+            run.budget.degrade("datasets", f"no dataset search for '{use_case.get('title')}'")
+            use_case.datasets = []
+            run.datasets_found(use_case)
+            return use_case
 
+        print(f"Running dataset agent for: {use_case.get('title')}")
+        try:
+            run_search = lambda: self.dataset_agent.search_providers(use_case, run.budget)
+            if self.clustered_search:
+                use_case.datasets, skipped, shared = self.clustered_search.search(use_case, run_search)
+                if shared:
+                    tracer.current_span().incr("deduplicated")
+            else:
+                use_case.datasets, skipped = run_search()
+            # Only checkpoint searches that ran against every provider
+            if run.checkpoints and not skipped:
+                run.checkpoints.save_item(
+                    "datasets", dataset_hash, item_key, [d.to_dict() for d in use_case.datasets]
+                )
+            run.datasets_found(use_case)
+            return use_case
+        except Exception as e:
+            print(f"Dataset agent failed for '{use_case.get('title')}': {e}")
+            # Continue with the use case without datasets if the agent fails
+            run.datasets_found(use_case)
+            return use_case
+
+    def _prioritization_stage(self, use_cases_with_datasets):
         # 4. Prioritization Phase
+        if not use_cases_with_datasets:
+            return []
+
         print("Running prioritization agent...")
-        prioritized_usecases = self.prioritizer.rank_use_cases(use_cases_with_datasets)
+        try:
+            prioritized_usecases = self.prioritizer.rank_use_cases(use_cases_with_datasets)
+        except Exception as e:
+            print(f"Prioritization agent raised an error: {e}")
+            prioritized_usecases = None
+
         if not prioritized_usecases:
             print("Prioritization agent failed.")
             # Continue with the list from the previous step if prioritization fails
             prioritized_usecases = use_cases_with_datasets
+        return prioritized_usecases
 
+    def _report_stage(self, run, prioritized_usecases):
         # 5. Report Writing Phase
+        if not prioritized_usecases:
+            return []
+
         print("Saving markdown report...")
-        output_filename = f"{company_or_industry.replace(' ', '_').lower()}_usecases.md"
-        self.writer.save_markdown_report(prioritized_usecases, output_filename)
+        output_filename = f"{make_run_id(run.key)}_usecases.md"
+        filepath = self.writer.save_markdown_report(
+            prioritized_usecases,
+            output_filename,
+            degradations=run.budget.degradations
+        )
 
         print(f"Orchestration complete. Report saved to {output_filename}")
+        return [filepath] if filepath else []
 
-        return prioritized_usecases
-
-def run_analysis(company_or_industry):
+def run_analysis(company_or_industry, run_id=None, resume=True, time_budget=None, profile=None):
     """
     Convenience function to run the complete analysis
     
     Args:
         company_or_industry (str): The name of the company or industry to research
+        run_id (str): Checkpoint namespace, defaults to one derived from the input
+        resume (bool): Reuse checkpoints of completed stages from earlier runs
+        time_budget (float): Seconds the whole analysis may take
+        profile (bool): Profile every stage, defaults to Config.ENABLE_PROFILING
         
     Returns:
         list: Prioritized use cases with associated data and resources
     """
     orchestrator = Orchestrator()
-    return orchestrator.run_analysis(company_or_industry)
\ No newline at end of file
+    return orchestrator.run_analysis(company_or_industry, run_id, resume, time_budget, profile=profile)
+
+
+# Per-process orchestrator used by process pool workers in run_analysis_many
+_worker_orchestrator = None
+
+def _init_worker(priority):
+    global _worker_orchestrator
+    set_default_priority(priority)
+    _worker_orchestrator = Orchestrator()
+
+def _analyze_with(orchestrator, company_or_industry, resume=True, time_budget=None):
+    """Runs one analysis and packs the outcome into a picklable result dict"""
+    started = time.perf_counter()
+    try:
+        use_cases, report = orchestrator.analyze(company_or_industry, resume=resume, time_budget=time_budget)
+        # A generation error with nothing generated is a failed run, not an empty one
+        generation_errors = report.timings["use_cases"].errors if report else []
+        if use_cases:
+            status = "ok"
+        elif generation_errors:
+            status = "error"
+        else:
+            status = "empty"
+        return {
+            "company": company_or_industry,
+            "status": status,
+            "use_cases": use_cases,
+            "error": "; ".join(generation_errors) or None,
+            "elapsed": time.perf_counter() - started,
+            "report": report.to_dict() if report else None,
+        }
+    except Exception as e:
+        return {
+            "company": company_or_industry,
+            "status": "error",
+            "use_cases": [],
+            "error": f"{type(e).__name__}: {e}",
+            "elapsed": time.perf_counter() - started,
+            "report": None,
+        }
+
+def _analyze_in_worker(company_or_industry, resume=True, time_budget=None):
+    return _analyze_with(_worker_orchestrator, company_or_industry, resume, time_budget)
+
+def run_analysis_many(companies, max_workers=None, use_processes=None, summary_path=None, resume=True,
+                      time_budget=None):
+    """
+    Runs the analysis for many companies or industries concurrently
+
+    Threads share a single Orchestrator, so API clients and sessions are
+    reused across workers. With use_processes every worker process builds
+    one Orchestrator at startup and reuses it for all of its companies.
+
+    Args:
+        companies (iterable): Company or industry names, consumed lazily
+        max_workers (int): Pool size, defaults to Config.BATCH_MAX_WORKERS
+        use_processes (bool): Use a process pool instead of a thread pool
+        summary_path (str): Where to write the run summary JSON
+        resume (bool): Reuse checkpoints of completed stages from earlier runs
+        time_budget (float): Seconds each analysis may take, see Orchestrator.run_analysis()
+
+    Yields:
+        dict: Per-company result with 'company', 'status' ('ok', 'empty' or
+            'error'), 'use_cases', 'error', 'elapsed' and 'report', in
+            completion order
+    """
+    if max_workers is None:
+        max_workers = Config.BATCH_MAX_WORKERS
+    if use_processes is None:
+        use_processes = Config.BATCH_USE_PROCESSES
+    if summary_path is None:
+        summary_path = os.path.join(
+            Config.OUTPUT_DIR,
+            f"batch_summary_{time.strftime('%Y%m%d_%H%M%S')}.json"
+        )
+
+    # Workers make their calls at the caller's request priority
+    if use_processes:
+        pool = ProcessPoolExecutor(
+            max_workers=max_workers, initializer=_init_worker, initargs=(current_priority(),)
+        )
+        submit = lambda company: pool.submit(_analyze_in_worker, company, resume, time_budget)
+    else:
+        shared = Orchestrator()
+        pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="analysis")
+        submit = lambda company: pool.submit(
+            contextvars.copy_context().run, _analyze_with, shared, company, resume, time_budget
+        )
+
+    started = time.perf_counter()
+    results = []
+    # Keep a bounded number of companies in flight so huge inputs are read lazily
+    max_in_flight = max_workers * 2
+    pending = set()
+    company_iter = iter(companies)
+    exhausted = False
+
+    try:
+        while pending or not exhausted:
+            while not exhausted and len(pending) < max_in_flight:
+                try:
+                    company = next(company_iter)
+                except StopIteration:
+                    exhausted = True
+                    break
+                company = company.strip()
+                if company:
+                    pending.add(submit(company))
+
+            if not pending:
+                continue
+
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                result = future.result()
+                results.append(result)
+                yield result
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+        summary = _summarize_batch(results, time.perf_counter() - started, max_workers, use_processes)
+        _write_batch_summary(summary, summary_path)
+
+def _summarize_batch(results, wall_time, max_workers, use_processes):
+    """Builds the throughput and latency summary for a batch run"""
+    latencies = sorted(r["elapsed"] for r in results)
+
+    def percentile(p):
+        if not latencies:
+            return None
+        return latencies[min(len(latencies) - 1, int(p / 100 * len(latencies)))]
+
+    return {
+        "companies": len(results),
+        "succeeded": sum(1 for r in results if r["status"] == "ok"),
+        "empty": sum(1 for r in results if r["status"] == "empty"),
+        "failed": sum(1 for r in results if r["status"] == "error"),
+        "use_cases": sum(len(r["use_cases"]) for r in results),
+        "max_workers": max_workers,
+        "pool": "process" if use_processes else "thread",
+        "wall_time_s": wall_time,
+        "throughput_per_min": len(results) / wall_time * 60 if wall_time > 0 else None,
+        "latency_mean_s": sum(latencies) / len(latencies) if latencies else None,
+        "latency_p50_s": percentile(50),
+        "latency_p95_s": percentile(95),
+        "errors": {r["company"]: r["error"] for r in results if r["status"] == "error"},
+    }
+
+def _write_batch_summary(summary, summary_path):
+    try:
+        directory = os.path.dirname(summary_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(summary_path, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2)
+        print(f"Batch summary saved to {summary_path}")
+    except IOError as e:
+        print(f"Error saving batch summary to {summary_path}: {e}")
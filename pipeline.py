@@ -0,0 +1,372 @@
+# pipeline.py
+import contextvars
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from tracing import tracer
+
+# Marker pushed into a stage inbox when one of its upstream stages is done
+_END = object()
+
+
+class Stage:
+    """A node of the pipeline graph
+
+    kind="source": func() returns an iterable of items (no upstream stages)
+    kind="map":    func(item) is called for every upstream item as soon as it
+                   arrives and returns one item (None drops it)
+    kind="gather": func(items) is called once with every upstream item and
+                   returns an iterable; yielded items are forwarded immediately
+    """
+
+    KINDS = ("source", "map", "gather")
+
+    def __init__(self, name, func, deps=(), kind="map", workers=1, ordered=False):
+        if kind not in self.KINDS:
+            raise ValueError(f"Unknown stage kind: {kind}")
+        if kind == "source" and deps:
+            raise ValueError(f"Source stage '{name}' cannot have dependencies")
+        if kind != "source" and not deps:
+            raise ValueError(f"Stage '{name}' needs at least one dependency")
+
+        self.name = name
+        self.func = func
+        self.deps = list(deps)
+        self.kind = kind
+        self.workers = max(1, workers)
+        self.ordered = ordered
+
+
+class StageTiming:
+    """Wall-clock bookkeeping for a single stage, relative to the run start"""
+
+    def __init__(self, name, deps):
+        self.name = name
+        self.deps = deps
+        self.started = None
+        self.first_output = None
+        self.finished = None
+        self.busy = 0.0
+        self.items_in = 0
+        self.items_out = 0
+        self.errors = []
+
+    @property
+    def wall(self):
+        if self.started is None or self.finished is None:
+            return 0.0
+        return self.finished - self.started
+
+    def to_dict(self):
+        return {
+            "stage": self.name,
+            "deps": self.deps,
+            "started": self.started,
+            "first_output": self.first_output,
+            "finished": self.finished,
+            "wall": self.wall,
+            "busy": self.busy,
+            "items_in": self.items_in,
+            "items_out": self.items_out,
+            "errors": self.errors,
+        }
+
+
+class PipelineReport:
+    """Per-stage timings and the critical path of one pipeline run"""
+
+    def __init__(self, name, timings, total):
+        self.name = name
+        self.timings = timings
+        self.total = total
+        self.critical_path = self._compute_critical_path()
+        # Work the stages cut to meet a time budget, filled in by the caller
+        self.degradations = []
+        # Resource usage of the run such as peak RSS, filled in by the caller
+        self.resources = {}
+
+    def _compute_critical_path(self):
+        """
+        Walks back from the stage that finished last, always following the
+        dependency that finished last, since that is the one it waited on
+        """
+        finished = [t for t in self.timings.values() if t.finished is not None]
+        if not finished:
+            return []
+
+        current = max(finished, key=lambda t: t.finished)
+        path = [current.name]
+        while current.deps:
+            current = max(
+                (self.timings[d] for d in current.deps),
+                key=lambda t: t.finished or 0.0
+            )
+            path.append(current.name)
+        return list(reversed(path))
+
+    def critical_contributions(self):
+        """
+        Returns the wall-clock time each critical-path stage added on top of
+        its predecessor, so the values sum to the end of the path
+        """
+        contributions = {}
+        previous_end = 0.0
+        for name in self.critical_path:
+            end = self.timings[name].finished or previous_end
+            contributions[name] = max(0.0, end - previous_end)
+            previous_end = end
+        return contributions
+
+    def to_dict(self):
+        return {
+            "pipeline": self.name,
+            "total": self.total,
+            "critical_path": self.critical_path,
+            "critical_contributions": self.critical_contributions(),
+            "stages": [t.to_dict() for t in self.timings.values()],
+            "degradations": self.degradations,
+            "resources": self.resources,
+        }
+
+    def format(self):
+        """Formats the report as a plain-text table"""
+        contributions = self.critical_contributions()
+        lines = [
+            f"Pipeline report for {self.name} (total {self.total:.2f}s)",
+            f"{'stage':<14}{'start':>8}{'first':>8}{'end':>8}{'busy':>8}{'in':>6}{'out':>6}  critical",
+        ]
+        for t in self.timings.values():
+            first = f"{t.first_output:.2f}" if t.first_output is not None else "-"
+            critical = f"+{contributions[t.name]:.2f}s" if t.name in contributions else ""
+            lines.append(
+                f"{t.name:<14}{(t.started or 0.0):>8.2f}{first:>8}{(t.finished or 0.0):>8.2f}"
+                f"{t.busy:>8.2f}{t.items_in:>6}{t.items_out:>6}  {critical}"
+            )
+        lines.append(f"Critical path: {' -> '.join(self.critical_path)}")
+        for d in self.degradations:
+            lines.append(f"Degraded {d['stage']}: {d['reason']}")
+        if self.resources:
+            lines.append("Resources: " + ", ".join(f"{k}={v}" for k, v in self.resources.items()))
+        return "\n".join(lines)
+
+
+class Pipeline:
+    """
+    Small dependency-graph executor where stages stream items to each other
+
+    Every stage runs in its own thread. Items are forwarded downstream as soon
+    as they are produced, so a map stage starts on the first item while its
+    upstream stage is still producing the rest.
+    """
+
+    def __init__(self, name="pipeline", listener=None, profiler=None):
+        """
+        Args:
+            name (str): Pipeline name used in reports and thread names
+            listener (callable): Optional listener(stage_name, status, elapsed)
+                called with "started" and "finished" from the stage threads
+            profiler (RunProfiler): Optional profiler the stages run under
+        """
+        self.name = name
+        self.listener = listener
+        self.profiler = profiler
+        self.stages = {}
+        self.last_report = None
+
+    def add_stage(self, name, func, deps=(), kind="map", workers=1, ordered=False):
+        """
+        Adds a stage to the graph
+
+        Args:
+            name (str): Unique stage name
+            func (callable): Stage function, see Stage for the signature per kind
+            deps (list): Names of upstream stages; they must already be added
+            kind (str): "source", "map" or "gather"
+            workers (int): Concurrent calls for map stages
+            ordered (bool): Emit map results in input order instead of completion order
+
+        Returns:
+            Stage: The created stage
+        """
+        if name in self.stages:
+            raise ValueError(f"Duplicate stage name: {name}")
+        for dep in deps:
+            if dep not in self.stages:
+                raise ValueError(f"Stage '{name}' depends on unknown stage '{dep}'")
+
+        stage = Stage(name, func, deps, kind, workers, ordered)
+        self.stages[name] = stage
+        return stage
+
+    def run(self):
+        """
+        Runs every stage to completion
+
+        Returns:
+            dict: Stage name -> list of items emitted by that stage
+        """
+        start = time.perf_counter()
+        inboxes = {name: queue.Queue() for name in self.stages}
+        consumers = {name: [] for name in self.stages}
+        for stage in self.stages.values():
+            for dep in stage.deps:
+                consumers[dep].append(stage.name)
+
+        outputs = {name: [] for name in self.stages}
+        profiler = self.profiler
+        timings = {name: StageTiming(name, stage.deps) for name, stage in self.stages.items()}
+        lock = threading.Lock()
+
+        def now():
+            return time.perf_counter() - start
+
+        def emit(stage, item):
+            with lock:
+                timing = timings[stage.name]
+                if timing.first_output is None:
+                    timing.first_output = now()
+                timing.items_out += 1
+                outputs[stage.name].append(item)
+            for consumer in consumers[stage.name]:
+                inboxes[consumer].put(item)
+
+        def notify(stage, status, elapsed):
+            if self.listener is None:
+                return
+            try:
+                self.listener(stage.name, status, elapsed)
+            except Exception as e:
+                print(f"Pipeline listener failed: {e}")
+
+        def mark_started(stage):
+            with lock:
+                if timings[stage.name].started is not None:
+                    return
+                timings[stage.name].started = now()
+            notify(stage, "started", 0.0)
+
+        def record_error(stage, e):
+            print(f"Stage '{stage.name}' failed: {e}")
+            with lock:
+                timings[stage.name].errors.append(str(e))
+
+        def call(stage, *args):
+            began = time.perf_counter()
+            try:
+                return stage.func(*args)
+            finally:
+                with lock:
+                    timings[stage.name].busy += time.perf_counter() - began
+
+        def upstream_items(stage):
+            """Yields upstream items until every dependency has finished"""
+            remaining = len(stage.deps)
+            inbox = inboxes[stage.name]
+            while remaining:
+                item = inbox.get()
+                mark_started(stage)
+                if item is _END:
+                    remaining -= 1
+                    continue
+                with lock:
+                    timings[stage.name].items_in += 1
+                yield item
+
+        def drain(stage, results):
+            # Generators run lazily, so time each step of the iteration as busy time
+            results = iter(results or [])
+            while True:
+                began = time.perf_counter()
+                try:
+                    item = next(results)
+                except StopIteration:
+                    break
+                finally:
+                    with lock:
+                        timings[stage.name].busy += time.perf_counter() - began
+                emit(stage, item)
+
+        def run_source(stage):
+            drain(stage, call(stage))
+
+        def run_gather(stage):
+            drain(stage, call(stage, list(upstream_items(stage))))
+
+        def run_map(stage):
+            # Results keyed by input position so ordered stages can release them in order
+            pending = {}
+            next_index = [0]
+            order_lock = threading.Lock()
+
+            def process(index, item):
+                try:
+                    with profiler.thread(stage.name) if profiler else nullcontext():
+                        result = call(stage, item)
+                except Exception as e:
+                    record_error(stage, e)
+                    result = None
+
+                if not stage.ordered:
+                    if result is not None:
+                        emit(stage, result)
+                    return
+
+                with order_lock:
+                    pending[index] = result
+                    while next_index[0] in pending:
+                        ready = pending.pop(next_index[0])
+                        next_index[0] += 1
+                        if ready is not None:
+                            emit(stage, ready)
+
+            with ThreadPoolExecutor(
+                max_workers=stage.workers,
+                thread_name_prefix=f"{self.name}-{stage.name}"
+            ) as executor:
+                for index, item in enumerate(upstream_items(stage)):
+                    context = contextvars.copy_context()
+                    executor.submit(context.run, process, index, item)
+
+        runners = {"source": run_source, "map": run_map, "gather": run_gather}
+
+        def run_stage(stage):
+            # Sources start right away; other stages start at their first input
+            if stage.kind == "source":
+                mark_started(stage)
+
+            with tracer.span("stage", stage=stage.name) as span:
+                try:
+                    with profiler.stage(stage.name) if profiler else nullcontext():
+                        runners[stage.kind](stage)
+                except Exception as e:
+                    record_error(stage, e)
+                    span.status = "error"
+                    span.error = str(e)
+                finally:
+                    with lock:
+                        timings[stage.name].finished = now()
+                    span.set("items_in", timings[stage.name].items_in)
+                    span.set("items_out", timings[stage.name].items_out)
+                    notify(stage, "finished", timings[stage.name].wall)
+                    for consumer in consumers[stage.name]:
+                        inboxes[consumer].put(_END)
+
+        threads = []
+        for stage in self.stages.values():
+            context = contextvars.copy_context()
+            thread = threading.Thread(
+                target=context.run,
+                args=(run_stage, stage),
+                name=f"{self.name}-{stage.name}",
+                daemon=True
+            )
+            threads.append(thread)
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        self.last_report = PipelineReport(self.name, timings, now())
+        return outputs
@@ -0,0 +1,221 @@
+# prewarm.py
+import argparse
+import datetime
+import json
+import os
+import sys
+import threading
+import time
+from batch import read_companies
+from call_policy import call_counts
+from config import Config
+from scheduler import BACKGROUND, priority, set_default_priority
+
+def parse_window(window):
+    """
+    Parses an 'HH:MM-HH:MM' local time window; the end may be past midnight
+
+    Returns:
+        tuple: (start, end) as minutes after midnight
+    """
+    start, end = window.split("-")
+    to_minutes = lambda hm: int(hm.split(":")[0]) * 60 + int(hm.split(":")[1])
+    return to_minutes(start.strip()), to_minutes(end.strip())
+
+def in_window(window, now=None):
+    """Whether a local time falls inside the window"""
+    now = now or datetime.datetime.now()
+    start, end = window
+    minute = now.hour * 60 + now.minute
+    if start <= end:
+        return start <= minute < end
+    return minute >= start or minute < end
+
+def seconds_until_window(window, now=None):
+    """Seconds until the window next opens, 0 inside it"""
+    now = now or datetime.datetime.now()
+    if in_window(window, now):
+        return 0
+    minute = now.hour * 60 + now.minute
+    minutes = (window[0] - minute) % (24 * 60)
+    return minutes * 60 - now.second
+
+def parse_quota(values):
+    """
+    Parses 'provider=calls' pairs such as serpapi=50 or openai=200
+
+    Returns:
+        dict: Provider -> maximum number of requests
+    """
+    quota = {}
+    for value in values or []:
+        provider, _, calls = value.partition("=")
+        quota[provider.strip()] = int(calls)
+    return quota
+
+class Prewarmer:
+    """
+    Runs the pipeline for popular inputs ahead of time, most popular first
+
+    Each run fills the search, page, completion and dataset caches and the
+    stage checkpoints, so the first interactive request for the same input
+    is served from them. Runs only start inside the off-peak window and
+    while every provider has quota left for another run: the most requests a
+    single run has needed so far is kept in reserve. A run in progress is
+    always finished.
+    """
+
+    def __init__(self, inputs, quota=None, window=None, orchestrator=None):
+        """
+        Args:
+            inputs (list): Company or industry names, most important first
+            quota (dict): Provider -> maximum requests for the whole job
+            window (tuple): Off-peak (start, end) minutes, None to run at any time
+            orchestrator (Orchestrator): Defaults to a new one
+        """
+        if orchestrator is None:
+            from orchestrator import Orchestrator
+            orchestrator = Orchestrator()
+        self.orchestrator = orchestrator
+        self.inputs = list(dict.fromkeys(i.strip() for i in inputs if i.strip()))
+        self.quota = quota or {}
+        self.window = window
+        self.spent = {}
+        self.max_run_cost = {}
+        self._stop = threading.Event()
+
+    def quota_left_for_run(self):
+        """Whether every limited provider can afford the costliest run seen so far"""
+        for provider, limit in self.quota.items():
+            reserve = self.max_run_cost.get(provider, 1)
+            if self.spent.get(provider, 0) + reserve > limit:
+                return False
+        return True
+
+    def warm(self, company):
+        """
+        Runs one analysis and accounts for the requests it sent
+
+        Returns:
+            dict: Outcome with 'company', 'status', 'use_cases', 'calls' and 'elapsed'
+        """
+        before = call_counts()
+        started = time.perf_counter()
+        try:
+            # Only uses provider capacity interactive and batch calls leave over
+            with priority(BACKGROUND):
+                use_cases = self.orchestrator.run_analysis(company, resume=True)
+            status = "ok" if use_cases else "empty"
+            error = None
+        except Exception as e:
+            use_cases, status, error = [], "error", f"{type(e).__name__}: {e}"
+
+        after = call_counts()
+        calls = {p: after[p] - before.get(p, 0) for p in after if after[p] != before.get(p, 0)}
+        for provider, n in calls.items():
+            self.spent[provider] = self.spent.get(provider, 0) + n
+            self.max_run_cost[provider] = max(self.max_run_cost.get(provider, 0), n)
+
+        return {
+            "company": company,
+            "status": status,
+            "error": error,
+            "use_cases": len(use_cases),
+            "calls": calls,
+            "elapsed": time.perf_counter() - started,
+        }
+
+    def run(self):
+        """
+        Pre-warms the inputs in rank order until they are done, the window
+        closes or the quota runs out
+
+        Returns:
+            dict: Summary with per-input results and the requests spent
+        """
+        results = []
+        stopped = None
+        for rank, company in enumerate(self.inputs, start=1):
+            if self.window is not None and not in_window(self.window):
+                if results:
+                    stopped = "off-peak window closed"
+                    break
+                wait = seconds_until_window(self.window)
+                print(f"Waiting {wait / 60:.0f} minutes for the off-peak window...")
+                if self._stop.wait(wait):
+                    break
+            if self._stop.is_set():
+                stopped = "stopped"
+                break
+            if not self.quota_left_for_run():
+                stopped = "quota exhausted"
+                break
+
+            print(f"Pre-warming #{rank}: {company}")
+            result = self.warm(company)
+            result["rank"] = rank
+            results.append(result)
+            print(f"Pre-warmed {company}: {result['status']}, requests {result['calls'] or 'none (cached)'}")
+
+        remaining = self.inputs[len(results):]
+        if stopped:
+            print(f"Pre-warming stopped ({stopped}); {len(remaining)} inputs left")
+        return {
+            "finished_at": time.time(),
+            "stopped": stopped,
+            "quota": self.quota,
+            "spent": self.spent,
+            "results": results,
+            "remaining": remaining,
+        }
+
+    def stop(self):
+        self._stop.set()
+
+def main(argv=None):
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description="Pre-warm caches for popular industries and companies")
+    parser.add_argument("input", help="Ranked list: a text file with one name per line, or a CSV")
+    parser.add_argument("--column", help="CSV column with the names (default: first column)")
+    parser.add_argument("--top", type=int, help="Only pre-warm the first N inputs")
+    parser.add_argument("--quota", action="append", metavar="PROVIDER=CALLS",
+                        help="Request budget per provider, e.g. serpapi=50 (repeatable)")
+    parser.add_argument("--window", default=Config.PREWARM_WINDOW,
+                        help="Local off-peak window HH:MM-HH:MM (default: %(default)s)")
+    parser.add_argument("--now", action="store_true", help="Ignore the off-peak window")
+    parser.add_argument("--summary", help="JSON file for the run summary")
+    args = parser.parse_args(argv)
+
+    Config.validate_keys()
+    set_default_priority(BACKGROUND)
+    # Background work: leave the CPU to interactive processes on the host
+    if hasattr(os, "nice"):
+        os.nice(Config.PREWARM_NICE)
+
+    inputs = list(read_companies(args.input, args.column))
+    if args.top:
+        inputs = inputs[:args.top]
+    prewarmer = Prewarmer(
+        inputs,
+        quota=parse_quota(args.quota),
+        window=None if args.now else parse_window(args.window)
+    )
+    try:
+        summary = prewarmer.run()
+    except KeyboardInterrupt:
+        print("Stopping pre-warming...")
+        return 1
+
+    summary_path = args.summary or os.path.join(
+        Config.OUTPUT_DIR, f"prewarm_{time.strftime('%Y%m%d_%H%M%S')}.json"
+    )
+    directory = os.path.dirname(summary_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(summary_path, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, indent=2)
+    print(f"Pre-warm summary saved to {summary_path}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
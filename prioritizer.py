@@ -1,63 +1,139 @@
 # agents/prioritizer.py
+from bisect import bisect_left, bisect_right
+import numpy as np
 from config import Config
+from records import UseCase, to_columns
+
+RANKING_MODES = ("score", "pareto")
+
+def pareto_layers(objectives):
+    """
+    Non-dominated sorting of points on three objectives, larger is better
+
+    A point's layer is one more than the highest layer of the points that
+    dominate it (at least as good on every objective, better on one), so
+    layer 1 is the Pareto front (the skyline), layer 2 the front once
+    layer 1 is removed, and so on.
+
+    Duplicate points are collapsed first. The rest are swept in decreasing
+    order of the first objective while a 2D Fenwick tree over the ranks of
+    the other two answers "highest layer among the points at least as good
+    on both" in O(log^2 n) per point. The tree is built offline: each node
+    of the outer tree only holds the third-objective ranks of the points
+    that update it, so memory stays O(n log n) however many distinct
+    values the objectives take.
+
+    Args:
+        objectives (np.ndarray): n x 3 array
+
+    Returns:
+        np.ndarray: int32 layer of every row, starting at 1
+    """
+    if len(objectives) == 0:
+        return np.zeros(0, dtype=np.int32)
+
+    points, inverse = np.unique(objectives, axis=0, return_inverse=True)
+    # Rank 1 is the best value of an objective
+    _, second = np.unique(-points[:, 1], return_inverse=True)
+    _, third = np.unique(-points[:, 2], return_inverse=True)
+    second = second.ravel() + 1
+    third = third.ravel() + 1
+
+    second = second.tolist()
+    third = third.tolist()
+    size = max(second) + 1
+
+    # Outer node -> sorted third ranks it stores, and a prefix-max tree over them
+    keys = [[] for _ in range(size)]
+    for b, c in zip(second, third):
+        while b < size:
+            keys[b].append(c)
+            b += b & -b
+    keys = [sorted(set(k)) for k in keys]
+    tree = [[0] * (len(k) + 1) for k in keys]
+
+    layers = np.zeros(len(points), dtype=np.int32)
+    # Dominating points come first: better first objective, or the same one
+    # and no worse on the others
+    for i in np.lexsort((third, second, -points[:, 0])).tolist():
+        best = 0
+        b = second[i]
+        while b > 0:
+            row = tree[b]
+            c = bisect_right(keys[b], third[i])
+            while c > 0:
+                if row[c] > best:
+                    best = row[c]
+                c -= c & -c
+            b -= b & -b
+        layer = best + 1
+        layers[i] = layer
+
+        b = second[i]
+        while b < size:
+            row = tree[b]
+            c = bisect_left(keys[b], third[i]) + 1
+            while c < len(row):
+                if row[c] < layer:
+                    row[c] = layer
+                c += c & -c
+            b += b & -b
+
+    return layers[inverse.ravel()]
 
 class Prioritizer:
     """Agent responsible for prioritizing use cases based on impact and complexity"""
-    
+
     def __init__(self):
         self.config = Config()
-    
-    def rank_use_cases(self, use_cases):
+
+    def rank_use_cases(self, use_cases, mode=None):
         """
         Ranks use cases based on impact and complexity
-        
+
+        Impact and complexity come from the Levels parsed by UseCaseAgent,
+        so all use cases are scored at once on their columnar arrays.
+
+        In "pareto" mode use cases are ordered by Pareto layer over impact,
+        complexity (lower is better) and data availability (datasets found),
+        so a use case is only ranked below one that is at least as good on all
+        three. Within a layer they are ordered by core score.
+
         Args:
-            use_cases (list): List of use case dictionaries
-            
+            use_cases (list): UseCase records (plain dicts are converted)
+            mode (str): "score" or "pareto", defaults to Config.RANKING_MODE
+
         Returns:
-            list: Ranked use cases with core scores
+            list: Ranked use cases with core scores, and Pareto layers in pareto mode
         """
-        ranked_use_cases = []
-        
-        for uc in use_cases:
-            # Assign numerical scores for impact
-            impact_score = 0
-            if 'impact' in uc:
-                impact_lower = uc['impact'].lower()
-                if 'high' in impact_lower:
-                    impact_score = 3
-                elif 'med' in impact_lower:
-                    impact_score = 2
-                elif 'low' in impact_lower:
-                    impact_score = 1
-
-            # Assign numerical scores for complexity (inverse scoring)
-            complexity_score = 0
-            if 'complexity' in uc:
-                complexity_lower = uc['complexity'].lower()
-                if 'high' in complexity_lower:
-                    complexity_score = 1  # Inverse score for complexity
-                elif 'med' in complexity_lower:
-                    complexity_score = 2
-                elif 'low' in complexity_lower:
-                    complexity_score = 3
-
-            # Assuming data availability is medium (score 2) if not explicitly provided
-            data_avail_score = 2
-
-            # Calculate core score using the provided formula structure
-            # core = 0.5 * impact_score + 0.4 * data_avail_score - 0.3 * complexity_score
-            # Simplified formula using only impact and complexity as data_avail_score is assumed constant
-            core_score = 0.5 * impact_score - 0.3 * complexity_score
-
-            uc['core_score'] = core_score
-            ranked_use_cases.append(uc)
-
-        # Sort by core score in descending order
-        ranked_use_cases = sorted(
-            ranked_use_cases, 
-            key=lambda x: x.get('core_score', 0), 
-            reverse=True
-        )
-
-        return ranked_use_cases
\ No newline at end of file
+        mode = mode or self.config.RANKING_MODE
+        if mode not in RANKING_MODES:
+            raise ValueError(f"Unknown ranking mode '{mode}', expected one of {RANKING_MODES}")
+
+        records = [UseCase.from_dict(uc) for uc in use_cases]
+        columns = to_columns(records)
+
+        # Impact scores 1-3 by level; complexity is scored inversely
+        # (high = 1, low = 3); unknown levels score 0
+        impact_score = columns["impact"].astype(np.float64)
+        complexity = columns["complexity"]
+        complexity_score = np.where(complexity > 0, 4 - complexity, 0).astype(np.float64)
+
+        # Assuming data availability is medium (score 2) if not explicitly provided
+        # core = 0.5 * impact_score + 0.4 * data_avail_score - 0.3 * complexity_score
+        # Simplified formula using only impact and complexity as data_avail_score is assumed constant
+        core_scores = 0.5 * impact_score - 0.3 * complexity_score
+
+        for uc, core_score in zip(records, core_scores.tolist()):
+            uc.core_score = core_score
+
+        if mode == "pareto":
+            layers = pareto_layers(np.column_stack((impact_score, complexity_score, columns["datasets"])))
+            for uc, layer in zip(records, layers.tolist()):
+                uc.pareto_layer = layer
+            # By layer, then by core score; ties keep their order
+            order = np.lexsort((-core_scores, layers))
+        else:
+            # Sort by core score in descending order, ties keep their order
+            order = np.argsort(-core_scores, kind="stable")
+        return [records[i] for i in order.tolist()]
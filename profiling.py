@@ -0,0 +1,182 @@
+# profiling.py
+import cProfile
+import io
+import json
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from config import Config
+
+# Allocations made by the profiler itself and by imports are not of interest
+SNAPSHOT_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, __file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+# tracemalloc is process-wide; it runs while any profiled analysis does
+_tracing_lock = threading.Lock()
+_tracing_users = 0
+
+def _start_tracing():
+    global _tracing_users
+    with _tracing_lock:
+        if _tracing_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        _tracing_users += 1
+
+def _stop_tracing():
+    global _tracing_users
+    with _tracing_lock:
+        _tracing_users -= 1
+        if _tracing_users == 0:
+            tracemalloc.stop()
+
+def _snapshot():
+    return tracemalloc.take_snapshot().filter_traces(SNAPSHOT_FILTERS)
+
+class RunProfiler:
+    """
+    Time and memory profile of one analysis, per pipeline stage
+
+    Every thread that works for a stage (the stage thread, and the workers of
+    map stages) runs under its own cProfile profiler; they are merged per
+    stage when the run finishes. Times are wall-clock, so a stage waiting for
+    its inputs or for a provider shows up in queue.get or the HTTP client.
+    Allocations are traced with tracemalloc and
+    compared between the start and the end of each stage. Stages overlap in
+    a streaming pipeline, so a stage's allocation sites also include what
+    stages running at the same time allocated; the sites' file names usually
+    tell them apart. Work a stage hands to threads of its own, such as
+    concurrent page fetches, shows up as time spent waiting.
+
+    Writes to <PROFILE_DIR>/<run_id>_<timestamp>/:
+        <stage>.prof              pstats dump, e.g. for snakeviz or pstats
+        <stage>_allocations.txt   top allocation sites by growth
+        summary.json              Profiled time, hot functions and memory per stage
+    """
+
+    def __init__(self, run_id, output_dir=None, top=None):
+        """
+        Args:
+            run_id (str): Run the profile belongs to, used in the directory name
+            output_dir (str): Defaults to Config.PROFILE_DIR
+            top (int): Functions and allocation sites listed per stage
+        """
+        self.run_id = run_id
+        self.directory = os.path.join(
+            output_dir or Config.PROFILE_DIR, f"{run_id}_{time.strftime('%Y%m%d_%H%M%S')}"
+        )
+        self.top = top or Config.PROFILE_TOP
+        self._lock = threading.Lock()
+        self._profiles = {}
+        self._skipped = {}
+        self._memory = {}
+        self._started = None
+
+    def start(self):
+        _start_tracing()
+        self._started = time.perf_counter()
+
+    @contextmanager
+    def thread(self, stage):
+        """Profiles the calling thread while it works for a stage"""
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Python 3.12+ allows only one active profiler per process
+            with self._lock:
+                self._skipped[stage] = self._skipped.get(stage, 0) + 1
+            yield
+            return
+        try:
+            yield
+        finally:
+            profile.disable()
+            with self._lock:
+                self._profiles.setdefault(stage, []).append(profile)
+
+    @contextmanager
+    def stage(self, stage):
+        """Profiles a stage from its own thread and records its allocations"""
+        before = _snapshot()
+        current_before, _ = tracemalloc.get_traced_memory()
+        try:
+            with self.thread(stage):
+                yield
+        finally:
+            after = _snapshot()
+            current_after, _ = tracemalloc.get_traced_memory()
+            with self._lock:
+                self._memory[stage] = {
+                    "growth_bytes": current_after - current_before,
+                    "top_allocations": after.compare_to(before, "lineno")[:self.top],
+                }
+
+    def finish(self):
+        """
+        Stops tracing and writes the profile
+
+        Returns:
+            dict: The summary that was written to summary.json
+        """
+        _, peak = tracemalloc.get_traced_memory()
+        _stop_tracing()
+
+        summary = {
+            "run_id": self.run_id,
+            "wall": time.perf_counter() - self._started,
+            "traced_peak_bytes": peak,
+            "stages": {},
+        }
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            for stage in list(dict.fromkeys(list(self._profiles) + list(self._memory))):
+                summary["stages"][stage] = self._write_stage(stage)
+            with open(os.path.join(self.directory, "summary.json"), 'w', encoding='utf-8') as f:
+                json.dump(summary, f, indent=2)
+        except IOError as e:
+            print(f"Error saving profile to {self.directory}: {e}")
+        return summary
+
+    def _write_stage(self, stage):
+        result = {}
+        profiles = self._profiles.get(stage)
+        if profiles:
+            stats = pstats.Stats(profiles[0], stream=io.StringIO())
+            for profile in profiles[1:]:
+                stats.add(profile)
+            stats.dump_stats(os.path.join(self.directory, f"{stage}.prof"))
+            result["profiled_seconds"] = round(stats.total_tt, 4)
+            result["threads"] = len(profiles)
+            hot = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:self.top]
+            result["hot_functions"] = [
+                {
+                    "function": f"{os.path.basename(filename)}:{line}({name})",
+                    "calls": calls,
+                    "own_seconds": round(own, 4),
+                    "cumulative_seconds": round(cumulative, 4),
+                }
+                for (filename, line, name), (_, calls, own, cumulative, _) in hot
+            ]
+        if self._skipped.get(stage):
+            result["threads_not_profiled"] = self._skipped[stage]
+
+        memory = self._memory.get(stage)
+        if memory is not None:
+            result["memory_growth_bytes"] = memory["growth_bytes"]
+            result["top_allocations"] = [
+                {"site": str(diff.traceback), "size_diff": diff.size_diff, "count_diff": diff.count_diff}
+                for diff in memory["top_allocations"]
+            ]
+            with open(os.path.join(self.directory, f"{stage}_allocations.txt"), 'w', encoding='utf-8') as f:
+                f.write(f"Top allocation sites while '{stage}' ran, by growth\n")
+                for diff in memory["top_allocations"]:
+                    f.write(f"{diff}\n")
+        return result
@@ -0,0 +1,385 @@
+# records.py
+import enum
+from collections.abc import MutableMapping
+import numpy as np
+
+class Level(enum.IntEnum):
+    """Business impact or complexity of a use case"""
+
+    UNKNOWN = 0
+    LOW = 1
+    MEDIUM = 2
+    HIGH = 3
+
+    @classmethod
+    def parse(cls, value):
+        """
+        Reads a level from LLM text such as "High" or "medium (needs ML team)",
+        a level number or a Level
+
+        Returns:
+            Level: UNKNOWN if no level is recognized
+        """
+        if isinstance(value, int):
+            return cls(value) if 0 <= value <= 3 else cls.UNKNOWN
+        text = (value or "").lower()
+        if 'high' in text:
+            return cls.HIGH
+        if 'med' in text:
+            return cls.MEDIUM
+        if 'low' in text:
+            return cls.LOW
+        return cls.UNKNOWN
+
+    @property
+    def label(self):
+        return self.name.capitalize() if self else None
+
+class Dataset(MutableMapping):
+    """
+    One dataset or repository found for a use case
+
+    Popularity and size are kept as numbers; the 'notes' text shown in the
+    report and the app is rendered from them when asked for. Supports
+    dataset['url'], dataset.get('notes') etc. like the dicts it replaces.
+    """
+
+    __slots__ = ("url", "title", "provider", "downloads", "views", "stars", "size_bytes", "_notes")
+
+    KEYS = ("url", "title", "notes", "provider", "downloads", "views", "stars", "size_bytes")
+
+    def __init__(self, url, title, provider=None, downloads=None, views=None, stars=None,
+                 size_bytes=None, notes=None):
+        self.url = url
+        self.title = title
+        self.provider = provider
+        self.downloads = downloads
+        self.views = views
+        self.stars = stars
+        self.size_bytes = size_bytes
+        # Only for datasets stored before the numeric fields existed
+        self._notes = notes
+
+    @property
+    def notes(self):
+        if self._notes is not None:
+            return self._notes
+        na = lambda value: "N/A" if value is None else value
+        if self.provider == "kaggle":
+            notes = f"Kaggle Dataset - Downloads: {na(self.downloads)}, Views: {na(self.views)}"
+            if self.size_bytes is None:
+                return notes + ", Size info not available"
+            return notes + f", Total Size: {self.size_bytes / (1024 * 1024):.2f} MB"
+        if self.provider == "huggingface":
+            return f"HuggingFace Dataset, downloads: {self.downloads}"
+        if self.provider == "github":
+            return f"GitHub Repo, stars: {self.stars}"
+        return ""
+
+    def __getitem__(self, key):
+        if key not in self.KEYS:
+            raise KeyError(key)
+        value = getattr(self, key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        if key == "notes":
+            self._notes = value
+        elif key in self.KEYS:
+            setattr(self, key, value)
+        else:
+            raise KeyError(key)
+
+    def __delitem__(self, key):
+        self[key] = None
+
+    def __iter__(self):
+        return (key for key in self.KEYS if getattr(self, key) is not None)
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def to_dict(self):
+        return dict(self)
+
+    @classmethod
+    def from_dict(cls, data):
+        """Builds a dataset from a dict, e.g. a checkpoint or cache entry; records pass through"""
+        if isinstance(data, cls):
+            return data
+        dataset = cls(
+            data.get("url"),
+            data.get("title"),
+            provider=data.get("provider"),
+            downloads=data.get("downloads"),
+            views=data.get("views"),
+            stars=data.get("stars"),
+            size_bytes=data.get("size_bytes"),
+        )
+        if dataset.provider is None:
+            dataset._notes = data.get("notes")
+        return dataset
+
+    def __repr__(self):
+        return f"Dataset({self.url!r}, {self.provider!r})"
+
+class UseCase(MutableMapping):
+    """
+    One proposed use case, parsed once from the LLM output
+
+    Impact and complexity are Levels and the score a float, so ranking
+    needs no string work. Mapping access keeps the keys of the dicts the
+    agents used to pass around ('title', 'data sources', 'impact', ...);
+    use_case['impact'] gives the level's label, e.g. "High". Keys without a
+    field of their own are kept in a small side dict.
+    """
+
+    __slots__ = ("title", "description", "data_sources", "impact", "complexity",
+                 "datasets", "core_score", "pareto_layer", "extra")
+
+    FIELDS = {
+        "title": "title",
+        "description": "description",
+        "data sources": "data_sources",
+        "impact": "impact",
+        "complexity": "complexity",
+        "datasets": "datasets",
+        "core_score": "core_score",
+        "pareto_layer": "pareto_layer",
+    }
+
+    def __init__(self, title, description=None, data_sources=None, impact=Level.UNKNOWN,
+                 complexity=Level.UNKNOWN, datasets=None, core_score=None):
+        self.title = title
+        self.description = description
+        self.data_sources = data_sources
+        self.impact = Level.parse(impact)
+        self.complexity = Level.parse(complexity)
+        self.datasets = None if datasets is None else [Dataset.from_dict(d) for d in datasets]
+        self.core_score = core_score
+        # Set by the Pareto ranking mode; 1 is the front
+        self.pareto_layer = None
+        self.extra = None
+
+    def __getitem__(self, key):
+        field = self.FIELDS.get(key)
+        if field is None:
+            if self.extra is None:
+                raise KeyError(key)
+            return self.extra[key]
+        value = getattr(self, field)
+        if isinstance(value, Level):
+            value = value.label
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        field = self.FIELDS.get(key)
+        if field is None:
+            if self.extra is None:
+                self.extra = {}
+            self.extra[key] = value
+        elif field in ("impact", "complexity"):
+            setattr(self, field, Level.parse(value))
+        elif field == "datasets":
+            self.datasets = None if value is None else [Dataset.from_dict(d) for d in value]
+        elif field == "core_score":
+            self.core_score = None if value is None else float(value)
+        elif field == "pareto_layer":
+            self.pareto_layer = None if value is None else int(value)
+        else:
+            setattr(self, field, value)
+
+    def __delitem__(self, key):
+        field = self.FIELDS.get(key)
+        if field is None:
+            if self.extra is None:
+                raise KeyError(key)
+            del self.extra[key]
+        else:
+            setattr(self, field, Level.UNKNOWN if field in ("impact", "complexity") else None)
+
+    def __iter__(self):
+        for key in self.FIELDS:
+            if key in self:
+                yield key
+        if self.extra:
+            yield from self.extra
+
+    def __contains__(self, key):
+        field = self.FIELDS.get(key)
+        if field is None:
+            return bool(self.extra) and key in self.extra
+        value = getattr(self, field)
+        return value is not None and value is not Level.UNKNOWN
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def to_dict(self):
+        """JSON-serializable dict with the datasets as dicts too"""
+        data = dict(self)
+        if self.datasets is not None:
+            data["datasets"] = [d.to_dict() for d in self.datasets]
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        """Builds a use case from a dict, e.g. a checkpoint; records pass through"""
+        if isinstance(data, cls):
+            return data
+        use_case = cls(data.get("title"))
+        for key, value in data.items():
+            use_case[key] = value
+        return use_case
+
+    def __repr__(self):
+        return f"UseCase({self.title!r}, impact={self.impact.name}, complexity={self.complexity.name})"
+
+def to_dicts(use_cases):
+    """Plain dicts of use cases (records or dicts), e.g. for JSON output"""
+    return [uc.to_dict() if isinstance(uc, UseCase) else uc for uc in use_cases]
+
+def to_columns(use_cases):
+    """
+    Columnar view of the numeric fields of many use cases
+
+    Args:
+        use_cases (list): UseCase records or dicts
+
+    Returns:
+        dict: 'impact' and 'complexity' (int8 Level values), 'core_score'
+            (float64, NaN if unscored) and 'datasets' (int32 counts) arrays
+    """
+    records = [UseCase.from_dict(uc) for uc in use_cases]
+    n = len(records)
+    return {
+        "impact": np.fromiter((uc.impact for uc in records), dtype=np.int8, count=n),
+        "complexity": np.fromiter((uc.complexity for uc in records), dtype=np.int8, count=n),
+        "core_score": np.fromiter(
+            (np.nan if uc.core_score is None else uc.core_score for uc in records),
+            dtype=np.float64, count=n
+        ),
+        "datasets": np.fromiter((len(uc.datasets or ()) for uc in records), dtype=np.int32, count=n),
+    }
+
+class UseCaseTable:
+    """
+    Sortable, filterable index over the use cases of one or many analyses
+
+    The numeric fields are held as columns (see to_columns) next to the
+    company of every row, so filtering, sorting and paging thousands of use
+    cases are array operations and only the rows of the requested page are
+    looked at again. Rows keep the UseCase records for detail views.
+    """
+
+    SORT_KEYS = ("core_score", "impact", "complexity", "datasets", "company", "title")
+
+    def __init__(self, use_cases, companies):
+        """
+        Args:
+            use_cases (list): UseCase records or dicts
+            companies (list): Company or industry of every use case
+        """
+        self.records = [UseCase.from_dict(uc) for uc in use_cases]
+        self.columns = to_columns(self.records)
+        self.columns["company"] = np.array(companies, dtype=object)
+        self.columns["title"] = np.array([uc.title or "" for uc in self.records], dtype=object)
+        # Rank of every row in its analysis, as shown in the report
+        seen = {}
+        ranks = np.zeros(len(self.records), dtype=np.int32)
+        for i, company in enumerate(companies):
+            seen[company] = ranks[i] = seen.get(company, 0) + 1
+        self.columns["rank"] = ranks
+
+    @classmethod
+    def from_results(cls, results):
+        """
+        Builds the table from per-company results, e.g. the lines of a batch
+        results file
+
+        Args:
+            results (iterable): Dicts with 'company' and 'use_cases'
+
+        Returns:
+            UseCaseTable: Rows in result order, each analysis in its ranked order
+        """
+        use_cases, companies = [], []
+        for result in results:
+            for uc in result.get("use_cases") or []:
+                use_cases.append(uc)
+                companies.append(result["company"])
+        return cls(use_cases, companies)
+
+    def __len__(self):
+        return len(self.records)
+
+    def companies(self):
+        """Distinct companies, sorted"""
+        return sorted(set(self.columns["company"].tolist()))
+
+    def query(self, companies=None, impacts=None, complexities=None, min_score=None,
+              sort_by="core_score", descending=True, page=0, page_size=25):
+        """
+        Filters, sorts and pages the rows
+
+        Args:
+            companies (list): Only these companies, None for all
+            impacts (list): Only these impact Levels, None for all
+            complexities (list): Only these complexity Levels, None for all
+            min_score (float): Lowest core score, None for no limit
+            sort_by (str): One of SORT_KEYS
+            descending (bool): Sort order; ties keep the table order
+            page (int): Zero-based page number, clamped to the last page
+            page_size (int): Rows per page
+
+        Returns:
+            tuple: (row indices of the page, number of matching rows)
+        """
+        if sort_by not in self.SORT_KEYS:
+            raise ValueError(f"Unknown sort key '{sort_by}', expected one of {self.SORT_KEYS}")
+
+        columns = self.columns
+        mask = np.ones(len(self.records), dtype=bool)
+        if companies is not None:
+            mask &= np.isin(columns["company"], np.array(list(companies), dtype=object))
+        if impacts is not None:
+            mask &= np.isin(columns["impact"], [int(level) for level in impacts])
+        if complexities is not None:
+            mask &= np.isin(columns["complexity"], [int(level) for level in complexities])
+        if min_score is not None:
+            # Unscored rows (NaN) never pass
+            mask &= columns["core_score"] >= min_score
+        rows = np.flatnonzero(mask)
+
+        key = columns[sort_by][rows]
+        if key.dtype == object:
+            # Strings: sort on their codes, case-insensitively
+            _, key = np.unique([str(value).lower() for value in key], return_inverse=True)
+            key = key.ravel()
+        elif sort_by == "core_score":
+            # Unscored rows last in either order
+            key = np.nan_to_num(key, nan=np.inf if not descending else -np.inf)
+        order = np.argsort(-key if descending else key, kind="stable")
+
+        total = len(rows)
+        last_page = max(0, (total - 1) // page_size)
+        start = min(max(page, 0), last_page) * page_size
+        return rows[order[start:start + page_size]], total
+
+    def row(self, index):
+        """Summary fields of one row, for the grid"""
+        uc = self.records[index]
+        return {
+            "company": self.columns["company"][index],
+            "rank": int(self.columns["rank"][index]),
+            "title": uc.title,
+            "impact": uc.impact.label,
+            "complexity": uc.complexity.label,
+            "core_score": uc.core_score,
+            "pareto_layer": uc.pareto_layer,
+            "datasets": len(uc.datasets or ()),
+        }
@@ -7,23 +7,28 @@ class ResearchAgent:
     def __init__(self):
         self.search_agent = SearchAgent()
     
-    def conduct_research(self, company_or_industry, max_results=None):
+    def conduct_research(self, company_or_industry, max_results=None, budget=None, refresh=False):
         """
         Conducts comprehensive research on a company or industry
         
         Args:
             company_or_industry (str): The name of the company or industry to research
             max_results (int): Number of search results to process
+            budget (LatencyBudget): Optional time budget for the run
+            refresh (bool): Fetch search results and pages again instead of
+                reading them from the cache
             
         Returns:
-            list of dict: Research findings with url, title, and text
+            DocumentStore: Research findings with url, title, and text
         """
         print(f"Conducting research for: {company_or_industry}")
         
         # Perform web search and scraping
         research_findings = self.search_agent.search_and_scrape(
             company_or_industry, 
-            max_results
+            max_results,
+            budget,
+            refresh=refresh
         )
         
         if not research_findings:
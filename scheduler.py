@@ -0,0 +1,548 @@
+# scheduler.py
+import collections
+import contextvars
+import math
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import closing, contextmanager
+from config import Config
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+BACKGROUND = "background"
+
+# Priority classes, highest first
+PRIORITIES = (INTERACTIVE, BATCH, BACKGROUND)
+
+# Set by priority() and request_flow(); copied into pipeline and worker threads with the context
+_priority = contextvars.ContextVar("request_priority", default=None)
+_flow = contextvars.ContextVar("request_flow", default=None)
+
+# Priority of calls made outside any priority() block, set once by entry points such as batch.py
+_default_priority = Config.REQUEST_PRIORITY
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS slots (
+    id TEXT PRIMARY KEY,
+    provider TEXT NOT NULL,
+    priority TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS slots_provider ON slots (provider);
+CREATE TABLE IF NOT EXISTS buckets (
+    provider TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    refilled_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS waiting (
+    provider TEXT NOT NULL,
+    owner TEXT NOT NULL,
+    priority TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (provider, owner, priority)
+);
+"""
+
+# Seconds between the admission attempts of a lane whose calls wait for
+# other processes, which cannot wake it up
+POLL_INTERVAL = 0.05
+
+# Classes a process has calls waiting in are forgotten this long after its
+# last admission attempt, e.g. when it died
+WAITING_TIMEOUT = 2.0
+
+def _check(name):
+    if name not in PRIORITIES:
+        raise ValueError(f"Unknown request priority '{name}', expected one of {PRIORITIES}")
+    return name
+
+def set_default_priority(name):
+    """Sets the priority of every call this process makes outside a priority() block"""
+    global _default_priority
+    _default_priority = _check(name)
+
+def current_priority():
+    return _priority.get() or _default_priority
+
+@contextmanager
+def priority(name):
+    """Runs the calls made in this context, and in the threads it starts, at a priority"""
+    token = _priority.set(_check(name))
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+@contextmanager
+def request_flow(key):
+    """Groups the calls made in this context, e.g. one analysis, for fair queuing"""
+    token = _flow.set(key)
+    try:
+        yield
+    finally:
+        _flow.reset(token)
+
+class _Ticket:
+    __slots__ = ("priority", "flow", "granted")
+
+    def __init__(self, priority, flow):
+        self.priority = priority
+        self.flow = flow
+        self.granted = False
+
+class SharedAdmission:
+    """
+    Admission state of the providers in one SQLite database shared by all
+    processes on the host
+
+    Holds the calls in flight, the token buckets and the classes each
+    process has calls waiting in. A call is admitted in one transaction
+    that checks the host-wide limits, so the app, batch workers and
+    pre-warming together stay within each provider's limits, and a class
+    only starts while no higher class waits in any process. Slots of a
+    process that died expire after slot_timeout seconds. Each call opens
+    its own short-lived connection, like JobQueue.
+    """
+
+    def __init__(self, db_path=None, slot_timeout=None):
+        """
+        Args:
+            db_path (str): SQLite database file
+            slot_timeout (float): Seconds after which a slot that was never
+                released is freed
+        """
+        self.db_path = db_path or Config.SCHEDULER_DB_PATH
+        self.slot_timeout = slot_timeout or Config.SCHEDULER_SLOT_TIMEOUT
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        # Autocommit mode; multi-statement updates use explicit transactions
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA busy_timeout=30000")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @staticmethod
+    def _owner():
+        return f"{socket.gethostname()}:{os.getpid()}"
+
+    def _transaction(self, update):
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = update(conn, time.time())
+                conn.execute("COMMIT")
+                return result
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def admit(self, lane, priority, waiting):
+        """
+        Admits one call of a lane if the host-wide limits allow
+
+        Args:
+            lane (ProviderLane): Lane the call waits in, for its limits
+            priority (str): Class of the call
+            waiting (frozenset): Classes the lane still has calls waiting in
+                once this one is admitted
+
+        Returns:
+            tuple: (slot ID, None) once admitted; otherwise (None, seconds
+                until the quota admits it, or None if it waits for a slot)
+        """
+        def update(conn, now):
+            conn.execute("DELETE FROM slots WHERE expires_at < ?", (now,))
+            conn.execute("DELETE FROM waiting WHERE expires_at < ?", (now,))
+            slot_id, wait = self._admit(conn, lane, priority, now)
+            self._set_waiting(conn, lane.provider, waiting if slot_id else waiting | {priority}, now)
+            return slot_id, wait
+        return self._transaction(update)
+
+    def _admit(self, conn, lane, priority, now):
+        higher = PRIORITIES[:PRIORITIES.index(priority)]
+        if higher and conn.execute(
+            f"SELECT 1 FROM waiting WHERE provider = ? AND owner != ? AND priority IN ({', '.join('?' * len(higher))})",
+            (lane.provider, self._owner(), *higher)
+        ).fetchone():
+            return None, None
+        if lane.concurrency is not None:
+            in_flight = conn.execute("SELECT COUNT(*) FROM slots WHERE provider = ?", (lane.provider,)).fetchone()[0]
+            if in_flight >= lane._slots(priority):
+                return None, None
+        if lane.rate is not None:
+            row = conn.execute(
+                "SELECT tokens, refilled_at FROM buckets WHERE provider = ?", (lane.provider,)
+            ).fetchone()
+            tokens = lane.capacity if row is None else min(lane.capacity, row[0] + (now - row[1]) * lane.rate)
+            floor = lane.capacity * lane.reserves.get(priority, 0.0)
+            if tokens - 1 < floor:
+                return None, (floor + 1 - tokens) / lane.rate
+            conn.execute(
+                "INSERT OR REPLACE INTO buckets (provider, tokens, refilled_at) VALUES (?, ?, ?)",
+                (lane.provider, tokens - 1, now)
+            )
+        slot_id = uuid.uuid4().hex
+        conn.execute(
+            "INSERT INTO slots (id, provider, priority, expires_at) VALUES (?, ?, ?, ?)",
+            (slot_id, lane.provider, priority, now + self.slot_timeout)
+        )
+        return slot_id, None
+
+    def _set_waiting(self, conn, provider, waiting, now):
+        owner = self._owner()
+        conn.execute("DELETE FROM waiting WHERE provider = ? AND owner = ?", (provider, owner))
+        conn.executemany(
+            "INSERT INTO waiting (provider, owner, priority, expires_at) VALUES (?, ?, ?, ?)",
+            [(provider, owner, p, now + WAITING_TIMEOUT) for p in waiting]
+        )
+
+    def set_waiting(self, provider, waiting):
+        """Records the classes this process has calls to the provider waiting in"""
+        self._transaction(lambda conn, now: self._set_waiting(conn, provider, waiting, now))
+
+    def release(self, slot_id):
+        with closing(self._connect()) as conn:
+            conn.execute("DELETE FROM slots WHERE id = ?", (slot_id,))
+
+    def in_flight(self, provider):
+        """Calls to the provider in flight in all processes"""
+        with closing(self._connect()) as conn:
+            return conn.execute(
+                "SELECT COUNT(*) FROM slots WHERE provider = ? AND expires_at >= ?", (provider, time.time())
+            ).fetchone()[0]
+
+class ProviderLane:
+    """
+    Admission of the outbound calls to one provider
+
+    At most `concurrency` calls are in flight, and a token bucket starts at
+    most `calls` per `per` seconds, with bursts of up to `calls`. Waiting calls are
+    admitted strictly by priority class: a batch call only starts while no
+    interactive call is waiting. Within a class, the flows (analyses) waiting
+    take turns, so one company with many calls does not hold up the others.
+
+    Lower classes also leave headroom for higher ones. A class is only
+    admitted while the calls in flight are below its share of the
+    concurrency limit and the bucket holds more than its reserve. An
+    interactive call that arrives during a large batch therefore finds a
+    free slot and quota.
+
+    With a SharedAdmission the limits hold for all processes on the host
+    together; the lane then only orders its own process's calls.
+    """
+
+    def __init__(self, provider, concurrency=None, calls=None, per=60.0, shares=None, reserves=None,
+                 shared=None):
+        """
+        Args:
+            provider (str): Provider name
+            concurrency (int): Calls in flight at most, None for no limit
+            calls (int): Calls started per `per` seconds at most, None for no limit
+            per (float): Quota window in seconds
+            shares (dict): Priority -> fraction of the concurrency it may fill
+            reserves (dict): Priority -> fraction of the quota it must leave
+            shared (SharedAdmission): Host-wide admission state, None for
+                limits of this process alone
+        """
+        self.provider = provider
+        self.concurrency = concurrency
+        self.capacity = calls
+        self.rate = calls / per if calls else None
+        self.shares = shares or Config.SCHEDULER_CLASS_SHARES
+        self.reserves = reserves or Config.SCHEDULER_QUOTA_RESERVES
+        self.in_flight = 0
+        self.admitted = collections.Counter()
+        self.queued_seconds = collections.Counter()
+        self._tokens = float(calls) if calls else None
+        self._refilled = time.monotonic()
+        # Priority -> flow -> waiting tickets; flows are served round robin
+        self._waiting = {p: collections.OrderedDict() for p in PRIORITIES}
+        self._cond = threading.Condition()
+        self.shared = shared
+        self._slot_ids = []                  # Shared slots held by this process's calls
+        self._next_attempt = 0.0             # Shared state is not asked again before this
+        self._waiting_recorded = frozenset()
+
+    def _slots(self, priority):
+        return max(1, math.floor(self.concurrency * self.shares.get(priority, 1.0)))
+
+    def _classes_waiting(self, admitting=None):
+        """Classes with waiting calls, besides one call of class `admitting`"""
+        return frozenset(
+            p for p in PRIORITIES
+            if sum(len(t) for t in self._waiting[p].values()) > (1 if p == admitting else 0)
+        )
+
+    def _admit_local(self, priority):
+        """
+        Returns:
+            tuple: (admitted, seconds until the quota admits the call or None)
+        """
+        if self.concurrency is not None and self.in_flight >= self._slots(priority):
+            return False, None
+        if self.rate is not None:
+            floor = self.capacity * self.reserves.get(priority, 0.0)
+            if self._tokens - 1 < floor:
+                return False, (floor + 1 - self._tokens) / self.rate
+            self._tokens -= 1
+        return True, None
+
+    def _admit_shared(self, priority):
+        """
+        Returns:
+            tuple: (admitted, seconds until the next attempt)
+        """
+        now = time.monotonic()
+        if now < self._next_attempt:
+            return False, self._next_attempt - now
+        waiting = self._classes_waiting(priority)
+        try:
+            slot_id, wait = self.shared.admit(self, priority, waiting)
+        except sqlite3.Error as e:
+            print(f"Error admitting a {self.provider} call through the shared scheduler state: {e}")
+            return self._admit_local(priority)
+        if slot_id is None:
+            # Other processes release slots without waking this one up; poll,
+            # often enough to keep this process's waiting classes recorded
+            wait = min(wait or POLL_INTERVAL, WAITING_TIMEOUT / 2)
+            self._next_attempt = now + wait
+            self._waiting_recorded = waiting | {priority}
+            return False, wait
+        self._slot_ids.append(slot_id)
+        self._waiting_recorded = waiting
+        return True, None
+
+    def _record_waiting(self):
+        """Clears the waiting classes recorded in the shared state once none are left"""
+        if self.shared is None or not self._waiting_recorded or self._classes_waiting():
+            return
+        try:
+            self.shared.set_waiting(self.provider, frozenset())
+            self._waiting_recorded = frozenset()
+        except sqlite3.Error as e:
+            print(f"Error updating the shared scheduler state of {self.provider}: {e}")
+
+    def _dispatch(self):
+        """
+        Admits waiting calls while limits allow; the caller holds the lock
+
+        Returns:
+            float: Seconds until the next waiting call may be admitted, None
+                if it waits for a call of this process to finish or nothing
+                is waiting
+        """
+        if self.rate is not None:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._refilled) * self.rate)
+            self._refilled = now
+
+        granted = False
+        wait = None
+        while True:
+            priority = next((p for p in PRIORITIES if self._waiting[p]), None)
+            if priority is None:
+                self._record_waiting()
+                break
+            # Shares and reserves shrink down the classes, so when the first
+            # waiting class cannot start, none below it can either
+            if self.shared is not None:
+                admitted, wait = self._admit_shared(priority)
+            else:
+                admitted, wait = self._admit_local(priority)
+            if not admitted:
+                break
+
+            flows = self._waiting[priority]
+            flow, tickets = next(iter(flows.items()))
+            ticket = tickets.popleft()
+            # The flow goes to the back of its class
+            del flows[flow]
+            if tickets:
+                flows[flow] = tickets
+            ticket.granted = True
+            self.in_flight += 1
+            self.admitted[priority] += 1
+            granted = True
+
+        if granted:
+            self._cond.notify_all()
+        return wait
+
+    def _remove(self, ticket):
+        flows = self._waiting[ticket.priority]
+        tickets = flows.get(ticket.flow)
+        if tickets is not None:
+            tickets.remove(ticket)
+            if not tickets:
+                del flows[ticket.flow]
+
+    def acquire(self, priority, flow, block=True):
+        """
+        Waits until a call may start
+
+        Args:
+            priority (str): One of PRIORITIES
+            flow: Key of the flow the call belongs to
+            block (bool): False to only take a slot that is free right away
+
+        Returns:
+            bool: True once admitted; False if block is False and it was not
+        """
+        ticket = _Ticket(priority, flow)
+        started = time.monotonic()
+        with self._cond:
+            self._waiting[priority].setdefault(flow, collections.deque()).append(ticket)
+            try:
+                while True:
+                    wait = self._dispatch()
+                    if ticket.granted or not block:
+                        break
+                    self._cond.wait(wait)
+            finally:
+                if not ticket.granted:
+                    self._remove(ticket)
+                    self._record_waiting()
+                    # Calls queued behind it may be able to start
+                    self._cond.notify_all()
+            if ticket.granted:
+                self.queued_seconds[priority] += time.monotonic() - started
+        return ticket.granted
+
+    def release(self):
+        """Ends a call admitted by acquire()"""
+        with self._cond:
+            self.in_flight -= 1
+            if self._slot_ids:
+                # The slots of one lane are interchangeable
+                slot_id = self._slot_ids.pop()
+                try:
+                    self.shared.release(slot_id)
+                except sqlite3.Error as e:
+                    print(f"Error releasing a {self.provider} slot in the shared scheduler state: {e}")
+                self._next_attempt = 0.0
+            self._dispatch()
+            # Calls that waited for a slot may now wait for quota instead
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            stats = {
+                "in_flight": self.in_flight,
+                "waiting": {p: sum(len(t) for t in self._waiting[p].values()) for p in PRIORITIES},
+                "admitted": dict(self.admitted),
+                "queued_seconds": {p: round(s, 3) for p, s in self.queued_seconds.items()},
+                "tokens": None if self._tokens is None or self.shared else round(self._tokens, 2),
+            }
+        if self.shared is not None:
+            try:
+                stats["host_in_flight"] = self.shared.in_flight(self.provider)
+            except sqlite3.Error as e:
+                print(f"Error reading the shared scheduler state of {self.provider}: {e}")
+        return stats
+
+class RequestScheduler:
+    """
+    Admission of outbound calls, one ProviderLane per provider
+
+    CallPolicy sends every attempt through it, so interactive analyses,
+    batch jobs and pre-warming share each provider's limits from
+    Config.SCHEDULER_LIMITS by priority. With Config.SCHEDULER_SHARED the
+    limits and priorities hold across all processes on the host (see
+    SharedAdmission), otherwise within this process. A call's priority and
+    flow come from the context (see priority() and request_flow()).
+    Providers without limits pass straight through.
+    """
+
+    def __init__(self, limits=None, shared=None):
+        """
+        Args:
+            limits (dict): Provider -> ProviderLane settings, defaults to
+                Config.SCHEDULER_LIMITS
+            shared (SharedAdmission): Host-wide state, by default opened on
+                first use if Config.SCHEDULER_SHARED is set
+        """
+        self.limits = Config.SCHEDULER_LIMITS if limits is None else limits
+        self._shared = shared
+        self._lanes = {}
+        self._lock = threading.Lock()
+
+    def _shared_state(self):
+        if self._shared is None and Config.SCHEDULER_SHARED:
+            try:
+                self._shared = SharedAdmission()
+            except (sqlite3.Error, OSError) as e:
+                print(f"Error opening the shared scheduler state, limiting this process alone: {e}")
+                return None
+        return self._shared
+
+    def lane(self, provider):
+        """Returns the provider's lane, None if it is not limited"""
+        lane = self._lanes.get(provider)
+        if lane is None and provider in self.limits:
+            with self._lock:
+                lane = self._lanes.get(provider)
+                if lane is None:
+                    lane = self._lanes[provider] = ProviderLane(
+                        provider, **self.limits[provider], shared=self._shared_state()
+                    )
+        return lane
+
+    def acquire(self, provider, block=True):
+        """
+        Waits until a call to the provider may start, at the context's priority
+
+        Returns:
+            bool: False only if block is False and no slot was free
+        """
+        lane = self.lane(provider)
+        if lane is None:
+            return True
+        return lane.acquire(current_priority(), _flow.get(), block)
+
+    def release(self, provider):
+        lane = self.lane(provider)
+        if lane is not None:
+            lane.release()
+
+    @contextmanager
+    def slot(self, provider):
+        """
+        Holds a slot of the provider for the duration of the block
+
+        For requests that outlive the call that starts them, such as a
+        streamed completion; calls in the block pass held=True to
+        CallPolicy.call() so they run in this slot.
+        """
+        self.acquire(provider)
+        try:
+            yield
+        finally:
+            self.release(provider)
+
+    def stats(self):
+        """
+        Returns:
+            dict: Provider -> in-flight, waiting and admitted calls per class
+        """
+        with self._lock:
+            lanes = dict(self._lanes)
+        return {provider: lane.stats() for provider, lane in lanes.items()}
+
+    def _after_fork(self):
+        # Calls in flight and waiting belong to the parent; its shared slots
+        # are released by the parent
+        self._lanes = {}
+        self._lock = threading.Lock()
+
+scheduler = RequestScheduler()
+os.register_at_fork(after_in_child=scheduler._after_fork)
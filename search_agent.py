@@ -1,11 +1,25 @@
 # agents/search_agent.py
+import contextvars
+import json
 import os
+import re
+import threading
 import requests
 from bs4 import BeautifulSoup
 from serpapi import GoogleSearch
-import time
 import random
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from cache import cache_for
+from call_policy import TransientHTTPError, IDEMPOTENT_RETRY_STATUSES, SAFE_RETRY_STATUSES, policy_for
 from config import Config
+from documents import DocumentStore
+from tracing import tracer
+
+# Google results per SerpApi page; the 'start' parameter pages through them
+SERP_PAGE_SIZE = 10
+
+# Query words that say nothing about the input
+QUERY_STOP_WORDS = {"the", "and", "inc", "ltd", "llc", "corp", "company", "co", "of", "group"}
 
 class SearchAgent:
     """Agent responsible for web search and content scraping"""
@@ -27,87 +41,334 @@ class SearchAgent:
             "Connection": "keep-alive"
         }
     
-    def search_and_scrape(self, company_or_industry, max_results=None):
+    def search_and_scrape(self, company_or_industry, max_results=None, budget=None, refresh=False):
         """
         Performs a real-time web search and scrapes content from top results
         
+        Search results are ranked by how well their title and snippet match
+        the input, and the best ones are fetched concurrently, with
+        Config.SEARCH_OVERFETCH extra candidates in flight so a blocked or
+        empty page is replaced right away. As soon as max_results documents
+        of at least Config.SEARCH_MIN_DOC_CHARS (or Config.RESEARCH_TARGET_CHARS
+        of text) are in, the outstanding fetches are cancelled. The next page
+        of search results is only requested once a page's candidates are used up.
+        
         Args:
             company_or_industry (str): The name of the company or industry to research
-            max_results (int): Number of top search results to scrape
+            max_results (int): Number of documents to collect
+            budget (LatencyBudget): Optional time budget; once the research share
+                is used up, no further pages are scraped
+            refresh (bool): Ignore cached search results and pages and fetch
+                them again; the fresh copies replace the cached ones
             
         Returns:
-            list of dict: Each dict contains 'url', 'title', and 'text' fields
+            DocumentStore: Documents with 'url', 'title', and 'text' fields in
+                relevance order, with text beyond Config.MAX_RESIDENT_DOC_BYTES
+                spilled to disk
         """
         if max_results is None:
             max_results = self.config.MAX_SEARCH_RESULTS
             
         print(f"Running search agent for: {company_or_industry}")
         search_query = f"{company_or_industry} company profile and recent news"
+
+        try:
+            organic_results = self._search_page(search_query, 0, budget, refresh)
+            if organic_results is None:
+                return []
+            if not organic_results:
+                print("No organic results found.")
+                return []
+
+            candidates = self._candidates(
+                search_query, organic_results, relevance_terms(company_or_industry), budget, refresh
+            )
+            return self._scrape_candidates(candidates, max_results, budget, refresh)
+
+        except Exception as e:
+            print(f"Unexpected error in search agent: {e}")
+            return []
+
+    def _search_page(self, search_query, page, budget=None, refresh=False):
+        """
+        Fetches one page of Google results through SerpApi, cached per query and page
         
+        With refresh, the cached page is not read, only replaced. SerpApi
+        errors are not cached.
+        
+        Returns:
+            list: Organic results, or None if SerpApi reported an error
+        """
         params = {
             "engine": "google",
             "q": search_query,
             "api_key": self.config.SERPAPI_API_KEY
         }
+        if page:
+            params["start"] = page * SERP_PAGE_SIZE
 
-        try:
-            search = GoogleSearch(params)
-            results = search.get_dict()
+        search_key = json.dumps({k: v for k, v in params.items() if k != "api_key"}, sort_keys=True)
+        with tracer.span("http.serpapi", provider="serpapi", page=page) as span:
+            results, hit = cache_for("search").get_or_compute(
+                search_key,
+                lambda: policy_for("serpapi").call(
+                    lambda: GoogleSearch(params).get_dict(),
+                    budget=budget,
+                    stage="research"
+                ),
+                cacheable=lambda results: "error" not in results,
+                refresh=refresh
+            )
+            if hit:
+                span.set("cache_hits", 1)
+            span.set("results", len(results.get("organic_results", [])))
 
-            # Check for SerpApi error
-            if "error" in results:
-                print(f"SerpApi Error: {results['error']}")
-                return []
+        # Check for SerpApi error
+        if "error" in results:
+            print(f"SerpApi Error: {results['error']}")
+            return None
+        return results.get("organic_results", [])
+
+    def _candidates(self, search_query, organic_results, terms, budget=None, refresh=False):
+        """
+        Yields search results to scrape, best snippet match first
 
-            organic_results = results.get("organic_results", [])
+        Results are ranked within each page. The next page is only requested
+        when the consumer asks for more candidates than the pages so far hold,
+        up to Config.SEARCH_MAX_PAGES pages.
+        """
+        seen = set()
+        page = 0
+        while True:
+            ranked = sorted(
+                enumerate(organic_results),
+                key=lambda item: (-snippet_relevance(item[1], terms), item[0])
+            )
+            for _, result in ranked:
+                url = result.get("link")
+                if url and result.get("title") and url not in seen:
+                    seen.add(url)
+                    yield result
+
+            page += 1
+            if page >= self.config.SEARCH_MAX_PAGES:
+                return
+            if budget and budget.limited and budget.stage_remaining("research") <= 0:
+                return
+            print(f"Out of search results, requesting page {page + 1}...")
+            organic_results = self._search_page(search_query, page, budget, refresh)
             if not organic_results:
-                print("No organic results found.")
-                return []
+                return
+
+    def _scrape_candidates(self, candidates, max_results, budget=None, refresh=False):
+        """
+        Scrapes candidates concurrently until enough documents are collected
 
-            scraped_docs = []
+        With refresh, cached pages are fetched again.
 
-            for i, result in enumerate(organic_results[:max_results]):
-                url = result.get("link")
-                title = result.get("title")
-                if not url or not title:
-                    continue
+        Returns:
+            DocumentStore: The collected documents in candidate order
+        """
+        target_chars = self.config.RESEARCH_TARGET_CHARS
+        in_flight = max_results + self.config.SEARCH_OVERFETCH
+        good = {}    # Candidate rank -> (url, title, text)
+        short = {}   # Pages below SEARCH_MIN_DOC_CHARS, used only if nothing better turns up
+        total_chars = 0
+        pending = {}
+        exhausted = False
+        rank = 0
+        span = tracer.current_span()
+        stop = threading.Event()
+        executor = ThreadPoolExecutor(max_workers=self.config.SCRAPE_WORKERS, thread_name_prefix="scrape")
+
+        def collect(rank, url, title, text):
+            nonlocal total_chars
+            if len(text) >= self.config.SEARCH_MIN_DOC_CHARS:
+                good[rank] = (url, title, text)
+                total_chars += len(text)
+            else:
+                short[rank] = (url, title, text)
+
+        def enough():
+            return len(good) >= max_results or (target_chars and total_chars >= target_chars)
 
+        try:
+            while not enough():
+                if budget and budget.limited and budget.stage_remaining("research") <= 0:
+                    # Keep at least one document, the use case stage needs context
+                    if good or short:
+                        budget.degrade(
+                            "research",
+                            f"scraped {len(good) + len(short)} of {max_results} pages"
+                        )
+                        break
+
+                # Keep the best remaining candidates in flight
+                while not exhausted and not enough() and len(good) + len(pending) < in_flight:
+                    result = next(candidates, None)
+                    if result is None:
+                        exhausted = True
+                        break
+                    url, title = result["link"], result["title"]
+                    # Each fetch runs in its own copy of this context so its span nests here
+                    future = executor.submit(
+                        contextvars.copy_context().run, self._page_text, url, budget, stop, refresh
+                    )
+                    pending[future] = (rank, url, title)
+                    rank += 1
+
+                if not pending:
+                    break
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    candidate_rank, url, title = pending.pop(future)
+                    try:
+                        text, hit = future.result()
+                    except Exception as e:
+                        # One broken page must not cost the documents already collected
+                        print(f"Error scraping {url}: {e}")
+                        continue
+                    if hit:
+                        span.incr("cache_hits")
+                    if text:
+                        collect(candidate_rank, url, title, text)
+        finally:
+            stop.set()
+            executor.shutdown(wait=False, cancel_futures=True)
+            span.set("candidates", rank)
+            if pending:
+                span.set("cancelled", len(pending))
+                print(f"Collected enough research, cancelled {len(pending)} outstanding fetches")
+
+        # Best candidates first; short pages only fill up missing documents
+        chosen = [good[r] for r in sorted(good)][:max_results]
+        chosen += [short[r] for r in sorted(short)][:max_results - len(chosen)]
+        scraped_docs = DocumentStore()
+        for url, title, text in chosen:
+            scraped_docs.add(url, title, text)
+        return scraped_docs
+
+    def _page_text(self, url, budget=None, stop=None, refresh=False):
+        """
+        Returns the text of a page from the cache, scraping it on a miss
+
+        Returns:
+            tuple: (text or None, whether it came from the cache)
+        """
+        text, hit = cache_for("pages").get_or_compute(
+            url, lambda: self._scrape_page(url, budget, stop), refresh=refresh
+        )
+        if hit:
+            print(f"Scraped (cached): {url}")
+        return text, hit
+
+    def _scrape_page(self, url, budget=None, stop=None):
+        """
+        Fetches one page and extracts its text
+
+        Returns:
+            str: The page text, or None if the page failed, was empty, or the
+                scrape was cancelled through stop before the request was sent
+        """
+        timeout = self.config.REQUEST_TIMEOUT
+        if budget and budget.limited:
+            timeout = budget.timeout("research", timeout)
+
+        try:
+            # Add random sleep to avoid bot detection, unless it would
+            # eat into the time left for the request itself
+            if not budget or budget.stage_remaining("research") > self.config.RANDOM_SLEEP_MAX + timeout:
+                delay = random.uniform(self.config.RANDOM_SLEEP_MIN, self.config.RANDOM_SLEEP_MAX)
+                if stop is not None and stop.wait(delay):
+                    return None
+            if stop is not None and stop.is_set():
+                return None
+
+            with tracer.span("http.scrape", provider="web", url=url) as span:
                 try:
-                    # Add random sleep to avoid bot detection
-                    time.sleep(random.uniform(
-                        self.config.RANDOM_SLEEP_MIN, 
-                        self.config.RANDOM_SLEEP_MAX
-                    ))
-
-                    response = self.session.get(
-                        url, 
-                        headers=self.headers_template, 
-                        timeout=self.config.REQUEST_TIMEOUT
+                    response = policy_for("web").call(
+                        lambda: self._fetch(url, timeout),
+                        budget=budget,
+                        stage="research"
                     )
-                    
-                    if response.status_code == 200:
-                        soup = BeautifulSoup(response.text, "html.parser")
-                        paragraphs = soup.find_all("p")
-                        text = " ".join(p.get_text() for p in paragraphs)
-                        clean_text = " ".join(text.split()).strip()
-
-                        if clean_text:
-                            scraped_docs.append({
-                                "url": url,
-                                "title": title,
-                                "text": clean_text
-                            })
-                            print(f"Scraped: {url}")
-                    elif response.status_code == 403:
-                        print(f"403 Forbidden at {url}. Skipping...")
-                    else:
-                        print(f"Failed {url} — Status {response.status_code}")
-
-                except requests.exceptions.RequestException as e:
-                    print(f"Error scraping {url}: {e}")
-
-            return scraped_docs
+                except TransientHTTPError as e:
+                    response = e.response
+                span.set("status_code", response.status_code)
+                span.set("bytes", len(response.content))
+            
+            if response.status_code == 200:
+                clean_text = extract_text(response.text)
 
-        except Exception as e:
-            print(f"Unexpected error in search agent: {e}")
-            return []
\ No newline at end of file
+                if clean_text:
+                    print(f"Scraped: {url}")
+                    return clean_text
+                print(f"No text at {url}. Skipping...")
+            elif response.status_code == 403:
+                print(f"403 Forbidden at {url}. Skipping...")
+            else:
+                print(f"Failed {url} — Status {response.status_code}")
+
+        except requests.exceptions.RequestException as e:
+            print(f"Error scraping {url}: {e}")
+        return None
+
+    def _fetch(self, url, timeout):
+        """One GET attempt; retryable statuses raise so the call policy retries them"""
+        response = self.session.get(
+            url, 
+            headers=self.headers_template, 
+            timeout=timeout
+        )
+        if response.status_code in SAFE_RETRY_STATUSES + IDEMPOTENT_RETRY_STATUSES:
+            raise TransientHTTPError(response.status_code, response)
+        return response
+
+
+def extract_text(html):
+    """
+    Extracts the whitespace-normalized text of all paragraphs in an HTML page
+    
+    Args:
+        html (str): Raw HTML
+        
+    Returns:
+        str: Paragraph text joined by single spaces
+    """
+    soup = BeautifulSoup(html, "html.parser")
+    paragraphs = soup.find_all("p")
+    text = " ".join(p.get_text() for p in paragraphs)
+    return " ".join(text.split()).strip()
+
+
+def relevance_terms(company_or_industry):
+    """Lower-case words of the input that a relevant result should mention"""
+    return [
+        w for w in re.findall(r"\w+", company_or_industry.lower())
+        if len(w) > 1 and w not in QUERY_STOP_WORDS
+    ]
+
+
+def snippet_relevance(result, terms):
+    """
+    Scores a search result by how many input terms its title and snippet mention
+
+    Title matches count double. Results with the same score keep their
+    search position.
+    
+    Args:
+        result (dict): SerpApi organic result
+        terms (list): Words from relevance_terms()
+        
+    Returns:
+        float: Relevance, higher is better
+    """
+    title = (result.get("title") or "").lower()
+    snippet = (result.get("snippet") or "").lower()
+    score = 0.0
+    for term in terms:
+        pattern = r"\b" + re.escape(term) + r"\b"
+        if re.search(pattern, title):
+            score += 2
+        if re.search(pattern, snippet):
+            score += 1
+    return score
@@ -0,0 +1,159 @@
+# singleflight.py
+import copy
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import Future
+from config import Config
+
+try:
+    import fcntl
+except ImportError:  # Windows: coalesce within the process only
+    fcntl = None
+
+def normalize_key(company_or_industry):
+    """Normalizes an analysis input so trivially different spellings share a flight"""
+    return re.sub(r'\s+', ' ', company_or_industry).strip().lower()
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key into one execution
+
+    The first caller for a key runs the function. Callers that arrive while
+    it is still running wait for it and get a copy of the same result, or
+    the same exception. Nothing is cached once the call has finished.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights = {}
+
+    def do(self, key, func):
+        """
+        Runs func() once for all concurrent callers with this key
+
+        Returns:
+            tuple: (result, shared) where shared is True if this caller
+                attached to a call already in flight
+        """
+        with self._lock:
+            future = self._flights.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._flights[key] = future
+
+        if not leader:
+            return copy.deepcopy(future.result()), True
+
+        try:
+            future.set_result(func())
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+        return future.result(), False
+
+class FileSingleFlight:
+    """
+    Coalesces identical calls across processes on the same host
+
+    The leader holds an exclusive flock on <directory>/<key hash>.lock while
+    it runs and then writes the JSON result next to it. Other processes block
+    on the lock and read that result once it is released, provided it was
+    written after they started waiting. If the leader failed they take the
+    lock and run the call themselves.
+    """
+
+    def __init__(self, directory=None):
+        self.directory = directory or Config.FLIGHT_DIR
+
+    def _paths(self, key):
+        digest = hashlib.sha256(key.encode('utf-8')).hexdigest()[:24]
+        base = os.path.join(self.directory, digest)
+        return f"{base}.lock", f"{base}.json"
+
+    def do(self, key, func):
+        """
+        Runs func() once for all concurrent callers with this key on the host
+
+        func must return a JSON-serializable value.
+
+        Returns:
+            tuple: (result, shared) as in SingleFlight.do
+        """
+        if fcntl is None:
+            return func(), False
+
+        os.makedirs(self.directory, exist_ok=True)
+        lock_path, result_path = self._paths(key)
+        waiting_since = time.time()
+
+        with open(lock_path, 'a') as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                # Another process is running this call; wait for it to finish
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                result = self._read_result(result_path, waiting_since)
+                if result is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+                    return result["value"], True
+
+            try:
+                value = func()
+                self._write_result(result_path, value)
+                return value, False
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _read_result(result_path, not_before):
+        try:
+            with open(result_path, 'r', encoding='utf-8') as f:
+                result = json.load(f)
+        except (IOError, ValueError):
+            return None
+        # Only results of the run we waited on count, not older ones
+        if result.get("finished_at", 0) < not_before:
+            return None
+        return result
+
+    @staticmethod
+    def _write_result(result_path, value):
+        tmp_path = f"{result_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({"finished_at": time.time(), "value": value}, f)
+            os.replace(tmp_path, result_path)
+        except (IOError, TypeError) as e:
+            print(f"Error sharing in-flight result: {e}")
+
+class Coalescer:
+    """
+    Threads of one process share a single flight per key, and that flight in
+    turn coalesces with other processes through FileSingleFlight
+    """
+
+    def __init__(self, directory=None):
+        self.local = SingleFlight()
+        self.host = FileSingleFlight(directory)
+
+    def do(self, key, func):
+        """
+        Returns:
+            tuple: (result, shared) as in SingleFlight.do
+        """
+        (result, host_shared), local_shared = self.local.do(
+            key,
+            lambda: self.host.do(key, func)
+        )
+        return result, host_shared or local_shared
+
+# Process-wide coalescer used by the orchestrator
+coalescer = Coalescer()
@@ -0,0 +1,22 @@
+# tests/conftest.py
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cache
+from config import Config
+
+
+@pytest.fixture
+def isolated_stores(tmp_path, monkeypatch):
+    """Points the cache, checkpoints and scheduler databases at a temporary directory"""
+    monkeypatch.setattr(Config, "CACHE_DB_PATH", str(tmp_path / "cache.sqlite3"))
+    monkeypatch.setattr(Config, "CHECKPOINT_DIR", str(tmp_path / "checkpoints"))
+    monkeypatch.setattr(Config, "SCHEDULER_DB_PATH", str(tmp_path / "scheduler.sqlite3"))
+    monkeypatch.setattr(Config, "ENABLE_CACHE", True)
+    monkeypatch.setattr(cache, "_store", None)
+    monkeypatch.setattr(cache, "_caches", {})
+    return tmp_path
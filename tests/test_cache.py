@@ -0,0 +1,106 @@
+# tests/test_cache.py
+import multiprocessing
+import threading
+import time
+
+from cache import Cache, CacheStore
+
+# Child processes inherit the test's configuration through fork
+fork = multiprocessing.get_context("fork")
+
+
+def make_cache(tmp_path, lease_timeout=None):
+    store = CacheStore(str(tmp_path / "cache.sqlite3"), lease_timeout=lease_timeout)
+    return Cache("completions", store=store)
+
+
+def test_concurrent_misses_compute_once(isolated_stores):
+    cache = make_cache(isolated_stores)
+    calls = []
+    results = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.3)
+        return "value"
+
+    def worker():
+        results.append(cache.get_or_compute("key", compute))
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+
+    assert len(calls) == 1
+    assert sorted(results) == [("value", False)] + [("value", True)] * 3
+
+
+def test_failed_holder_hands_the_lease_on(isolated_stores):
+    cache = make_cache(isolated_stores)
+
+    def fail():
+        raise RuntimeError("rate limited")
+
+    try:
+        cache.get_or_compute("key", fail)
+    except RuntimeError:
+        pass
+
+    assert cache.get_or_compute("key", lambda: "value") == ("value", False)
+    assert cache.get("key") == "value"
+
+
+def test_uncacheable_results_are_not_stored(isolated_stores):
+    cache = make_cache(isolated_stores)
+
+    assert cache.get_or_compute("key", lambda: [], cacheable=bool) == ([], False)
+    assert cache.get("key") is None
+
+
+def compute_in_child(db_path, leased, proceed):
+    cache = Cache("completions", store=CacheStore(db_path))
+    with cache.lease("key") as value:
+        assert value is None
+        leased.set()
+        proceed.wait(10)
+        cache.set("key", "from child")
+
+
+def test_waiting_process_gets_the_holders_value(isolated_stores):
+    db_path = str(isolated_stores / "cache.sqlite3")
+    leased, proceed = fork.Event(), fork.Event()
+    child = fork.Process(target=compute_in_child, args=(db_path, leased, proceed))
+    child.start()
+    try:
+        assert leased.wait(10)
+        cache = Cache("completions", store=CacheStore(db_path))
+        threading.Timer(0.3, proceed.set).start()
+
+        with cache.lease("key") as value:
+            assert value == "from child"
+    finally:
+        proceed.set()
+        child.join(10)
+    assert child.exitcode == 0
+
+
+def die_holding_the_lease(db_path, leased):
+    store = CacheStore(db_path, lease_timeout=0.5)
+    store.acquire("completions", Cache._key("key"))
+    leased.set()
+
+
+def test_lease_of_a_dead_holder_is_taken_over(isolated_stores):
+    db_path = str(isolated_stores / "cache.sqlite3")
+    leased = fork.Event()
+    child = fork.Process(target=die_holding_the_lease, args=(db_path, leased))
+    child.start()
+    child.join(10)
+    assert leased.is_set()
+
+    cache = Cache("completions", store=CacheStore(db_path, lease_timeout=0.5))
+    started = time.monotonic()
+    assert cache.get_or_compute("key", lambda: "value") == ("value", False)
+    assert time.monotonic() - started >= 0.3
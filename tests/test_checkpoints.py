@@ -0,0 +1,153 @@
+# tests/test_checkpoints.py
+import json
+import os
+import time
+
+import pytest
+
+import orchestrator
+from checkpoints import CheckpointStore
+from config import Config
+from documents import DocumentStore
+from records import UseCase
+
+TITLES = ["Support Chatbot", "Demand Forecasting", "Predictive Maintenance"]
+
+
+class FakeResearchAgent:
+    def __init__(self):
+        self.calls = 0
+
+    def conduct_research(self, company_or_industry, max_results=None, budget=None, refresh=False):
+        self.calls += 1
+        return DocumentStore.from_documents([
+            {"url": "https://example.com/about", "title": "About", "text": f"{company_or_industry} builds cars."},
+        ])
+
+
+class FakeUseCaseAgent:
+    def __init__(self):
+        self.calls = 0
+        self.fail_after = None
+
+    def stream_use_cases(self, company_name, research_findings, raise_errors=False, budget=None):
+        self.calls += 1
+        for index, title in enumerate(TITLES):
+            if index == self.fail_after:
+                raise RuntimeError("stream broken")
+            yield UseCase.from_dict({
+                "title": title,
+                "description": f"{title} for {company_name}",
+                "impact": "High",
+                "complexity": "Medium",
+            })
+
+
+class FakeDatasetAgent:
+    def __init__(self):
+        self.searched = []
+        self.failing = set()
+
+    def search_providers(self, use_case, budget=None):
+        self.searched.append(use_case.get("title"))
+        if use_case.get("title") in self.failing:
+            raise RuntimeError("provider down")
+        return [], []
+
+
+@pytest.fixture
+def make_orchestrator(isolated_stores, monkeypatch):
+    monkeypatch.chdir(isolated_stores)
+    monkeypatch.setattr(Config, "DEDUP_USE_CASES", False)
+    monkeypatch.setattr(Config, "PRINT_PIPELINE_REPORT", False)
+    monkeypatch.setattr(orchestrator.coalescer.host, "directory", str(isolated_stores / "inflight"))
+    monkeypatch.setattr(orchestrator, "ResearchAgent", FakeResearchAgent)
+    monkeypatch.setattr(orchestrator, "UseCaseAgent", FakeUseCaseAgent)
+    monkeypatch.setattr(orchestrator, "DatasetAgent", FakeDatasetAgent)
+    return orchestrator.Orchestrator
+
+
+def titles(use_cases):
+    return sorted(uc["title"] for uc in use_cases)
+
+
+def test_completed_run_is_resumed_from_its_checkpoints(make_orchestrator):
+    first = make_orchestrator()
+    use_cases, _ = first.analyze("Tesla")
+
+    second = make_orchestrator()
+    resumed, _ = second.analyze("Tesla")
+
+    assert titles(resumed) == titles(use_cases) == sorted(TITLES)
+    assert second.research_agent.calls == 0
+    assert second.usecase_agent.calls == 0
+    assert second.dataset_agent.searched == []
+
+
+def test_resume_false_runs_every_stage(make_orchestrator):
+    make_orchestrator().analyze("Tesla")
+
+    fresh = make_orchestrator()
+    fresh.analyze("Tesla", resume=False)
+
+    assert fresh.research_agent.calls == 1
+    assert fresh.usecase_agent.calls == 1
+    assert sorted(fresh.dataset_agent.searched) == sorted(TITLES)
+
+
+def test_broken_generation_is_not_checkpointed(make_orchestrator):
+    interrupted = make_orchestrator()
+    interrupted.usecase_agent.fail_after = 1
+    interrupted.analyze("Tesla")
+
+    resumed = make_orchestrator()
+    use_cases, _ = resumed.analyze("Tesla")
+
+    # Research is reused, the partial generation is not
+    assert resumed.research_agent.calls == 0
+    assert resumed.usecase_agent.calls == 1
+    assert titles(use_cases) == sorted(TITLES)
+
+
+def test_only_failed_dataset_searches_run_again(make_orchestrator):
+    interrupted = make_orchestrator()
+    interrupted.dataset_agent.failing = {"Demand Forecasting"}
+    interrupted.analyze("Tesla")
+
+    resumed = make_orchestrator()
+    resumed.analyze("Tesla")
+
+    assert resumed.dataset_agent.searched == ["Demand Forecasting"]
+
+
+def test_generation_error_is_recorded_on_the_stage(make_orchestrator):
+    failing = make_orchestrator()
+    failing.usecase_agent.fail_after = 0
+    result = orchestrator._analyze_with(failing, "Tesla")
+
+    assert result["status"] == "error"
+    assert "stream broken" in result["error"]
+    stage = next(s for s in result["report"]["stages"] if s["stage"] == "use_cases")
+    assert stage["errors"] == ["stream broken"]
+
+
+def test_expired_checkpoints_are_not_loaded(tmp_path):
+    store = CheckpointStore("tesla", root=str(tmp_path), ttl=60)
+    store.save("research", "abc", [{"url": "u"}])
+    assert store.load("research", "abc") == [{"url": "u"}]
+
+    path = os.path.join(store.directory, "research-abc.json")
+    old = time.time() - 120
+    os.utime(path, (old, old))
+    assert store.load("research", "abc") is None
+    assert CheckpointStore("tesla", root=str(tmp_path), ttl=0).load("research", "abc") == [{"url": "u"}]
+
+
+def test_item_checkpoints_survive_a_torn_last_line(tmp_path):
+    store = CheckpointStore("tesla", root=str(tmp_path))
+    store.save_item("datasets", "abc", "first", [1])
+    store.save_item("datasets", "abc", "second", [2])
+    with open(os.path.join(store.directory, "datasets-abc.jsonl"), 'a', encoding='utf-8') as f:
+        f.write(json.dumps({"key": "third", "value": [3]})[:10])
+
+    assert store.load_items("datasets", "abc") == {"first": [1], "second": [2]}
@@ -0,0 +1,97 @@
+# tests/test_llm_batch.py
+import openai
+import pytest
+
+from agents.usecase_agent import UseCaseAgent
+from cache import cache_for
+from config import Config
+from documents import DocumentStore
+from llm_batch import BulkGenerator, StandInBatchServer
+
+
+class StubOrchestrator:
+    """Serves fixed research instead of scraping it"""
+
+    def __init__(self):
+        self.usecase_agent = UseCaseAgent()
+
+    def prepare_research(self, company_or_industry):
+        return DocumentStore.from_documents([{
+            "url": f"https://example.com/{company_or_industry}",
+            "title": company_or_industry,
+            "text": f"{company_or_industry} sells products online and runs a support center.",
+        }])
+
+
+class NoLiveCalls:
+    """Chat client that fails the test if the model is called"""
+
+    def create(self, **kwargs):
+        raise AssertionError("use cases were generated live instead of from the batch")
+
+
+@pytest.fixture
+def bulk_env(isolated_stores, monkeypatch):
+    monkeypatch.setattr(Config, "OPENAI_API_KEY", "test-key")
+    monkeypatch.setattr(Config, "SUMMARIZE_DOCUMENTS", False)
+    return isolated_stores
+
+
+@pytest.fixture
+def server():
+    server = StandInBatchServer(delay=0.2)
+    server.start()
+    yield server
+    server.stop()
+
+
+def make_generator(server, state_dir):
+    client = openai.OpenAI(api_key="test-key", base_url=server.base_url, max_retries=0)
+    return BulkGenerator(
+        orchestrator=StubOrchestrator(), client=client, state_dir=str(state_dir), poll_interval=0.05
+    )
+
+
+@pytest.fixture
+def generator(bulk_env, server):
+    return make_generator(server, bulk_env / "llm_batches")
+
+
+def test_batch_completions_serve_the_live_path(generator):
+    results = generator.run(["Tesla", "Fintech", "tesla"], finish=False)
+
+    assert results == {"Tesla": 5, "Fintech": 5}
+    agent = generator.usecase_agent
+    agent.client.chat.completions = NoLiveCalls()
+    for company in ("Tesla", "Fintech"):
+        research_docs = generator.orchestrator.prepare_research(company)
+        use_cases = list(agent.stream_use_cases(company, research_docs, raise_errors=True))
+        assert len(use_cases) == 5
+        assert all(company in use_case["title"] for use_case in use_cases)
+
+
+def test_cached_inputs_are_not_submitted_again(generator, server):
+    batch_id = generator.submit(["Tesla"])
+    generator.collect(batch_id, generator.wait(batch_id))
+
+    assert generator.submit(["Tesla"]) is None
+    assert len(server.batches) == 1
+
+
+def test_failed_requests_store_nothing(bulk_env):
+    server = StandInBatchServer(delay=0.1, respond=lambda body: "no use cases here")
+    server.start()
+    try:
+        generator = make_generator(server, bulk_env / "llm_batches")
+        assert generator.run(["Tesla"], finish=False) == {"Tesla": 0}
+
+        research_docs = generator.orchestrator.prepare_research("Tesla")
+        prompt, _ = generator.usecase_agent.build_prompt("Tesla", research_docs)
+        assert cache_for("completions").get(generator.usecase_agent.completion_key(prompt)) is None
+    finally:
+        server.stop()
+
+
+def test_sdk_without_batch_api_is_rejected(bulk_env):
+    with pytest.raises(RuntimeError, match="Batch API"):
+        BulkGenerator(orchestrator=StubOrchestrator(), client=object())
@@ -0,0 +1,58 @@
+# tests/test_prioritizer.py
+import numpy as np
+import pytest
+
+from prioritizer import pareto_layers
+
+
+def peel_layers(points):
+    """Layers by repeatedly removing the points no remaining point dominates"""
+    layers = np.zeros(len(points), dtype=np.int32)
+    remaining = set(range(len(points)))
+    layer = 0
+    while remaining:
+        layer += 1
+        front = [
+            i for i in remaining
+            if not any(
+                np.all(points[j] >= points[i]) and np.any(points[j] > points[i])
+                for j in remaining
+            )
+        ]
+        for i in front:
+            layers[i] = layer
+        remaining -= set(front)
+    return layers
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_matches_brute_force_on_continuous_values(seed):
+    rng = np.random.default_rng(seed)
+    points = rng.random((int(rng.integers(1, 80)), 3))
+
+    assert pareto_layers(points).tolist() == peel_layers(points).tolist()
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_matches_brute_force_with_ties(seed):
+    rng = np.random.default_rng(seed)
+    levels = int(rng.integers(2, 6))
+    points = rng.integers(0, levels, (int(rng.integers(1, 80)), 3)).astype(float)
+
+    assert pareto_layers(points).tolist() == peel_layers(points).tolist()
+
+
+def test_duplicates_share_a_layer():
+    points = np.array([[3, 1, 2], [3, 1, 2], [1, 1, 1], [3, 1, 2]], dtype=float)
+
+    assert pareto_layers(points).tolist() == [1, 1, 2, 1]
+
+
+def test_chain_of_dominated_points():
+    points = np.array([[1, 1, 1], [3, 3, 3], [2, 2, 2], [3, 0, 0]], dtype=float)
+
+    assert pareto_layers(points).tolist() == [3, 1, 2, 2]
+
+
+def test_empty_input():
+    assert pareto_layers(np.zeros((0, 3))).tolist() == []
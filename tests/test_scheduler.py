@@ -0,0 +1,188 @@
+# tests/test_scheduler.py
+import multiprocessing
+import threading
+import time
+
+import pytest
+
+from scheduler import (
+    BACKGROUND, BATCH, INTERACTIVE, PRIORITIES, ProviderLane, SharedAdmission
+)
+
+FULL_SHARES = {p: 1.0 for p in PRIORITIES}
+NO_RESERVES = {p: 0.0 for p in PRIORITIES}
+
+# Child processes inherit the lanes' state through fork
+fork = multiprocessing.get_context("fork")
+
+
+def make_lane(concurrency, shared=None):
+    return ProviderLane(
+        "openai", concurrency=concurrency, shares=FULL_SHARES, reserves=NO_RESERVES, shared=shared
+    )
+
+
+def queue_calls(lane, calls):
+    """Starts one waiting thread per (priority, flow) and returns the admission order"""
+    order = []
+    threads = []
+    for priority, flow in calls:
+        def call(priority=priority, flow=flow):
+            lane.acquire(priority, flow)
+            order.append((priority, flow))
+            lane.release()
+        thread = threading.Thread(target=call, daemon=True)
+        thread.start()
+        threads.append(thread)
+        # Wait until the call is queued so the arrival order is fixed
+        while lane.stats()["waiting"][priority] < sum(1 for p, _ in calls[:len(threads)] if p == priority):
+            time.sleep(0.001)
+    return order, threads
+
+
+def test_waiting_calls_start_by_priority_class():
+    lane = make_lane(1)
+    assert lane.acquire(INTERACTIVE, "holder")
+    order, threads = queue_calls(lane, [(BACKGROUND, "a"), (BATCH, "b"), (INTERACTIVE, "c")])
+
+    lane.release()
+    for thread in threads:
+        thread.join(5)
+
+    assert [p for p, _ in order] == [INTERACTIVE, BATCH, BACKGROUND]
+
+
+def test_flows_of_a_class_take_turns():
+    lane = make_lane(1)
+    assert lane.acquire(BATCH, "holder")
+    order, threads = queue_calls(lane, [(BATCH, "a"), (BATCH, "a"), (BATCH, "a"), (BATCH, "b")])
+
+    lane.release()
+    for thread in threads:
+        thread.join(5)
+
+    assert [flow for _, flow in order] == ["a", "b", "a", "a"]
+
+
+def test_lower_classes_leave_slots_free():
+    lane = ProviderLane("openai", concurrency=4, shares={INTERACTIVE: 1.0, BATCH: 0.5, BACKGROUND: 0.25},
+                        reserves=NO_RESERVES)
+
+    assert lane.acquire(BATCH, None, block=False)
+    assert lane.acquire(BATCH, None, block=False)
+    assert not lane.acquire(BATCH, None, block=False)
+    assert not lane.acquire(BACKGROUND, None, block=False)
+    assert lane.acquire(INTERACTIVE, None, block=False)
+
+
+def hold_slots(db_path, count, held, done):
+    lane = make_lane(2, SharedAdmission(db_path))
+    for _ in range(count):
+        lane.acquire(BATCH, None)
+    held.set()
+    done.wait(10)
+    for _ in range(count):
+        lane.release()
+
+
+def test_slots_are_counted_across_processes(tmp_path):
+    db_path = str(tmp_path / "scheduler.sqlite3")
+    shared = SharedAdmission(db_path)
+    held, done = fork.Event(), fork.Event()
+    child = fork.Process(target=hold_slots, args=(db_path, 2, held, done))
+    child.start()
+    try:
+        assert held.wait(10)
+        lane = make_lane(2, shared)
+
+        assert shared.in_flight("openai") == 2
+        assert not lane.acquire(INTERACTIVE, None, block=False)
+
+        done.set()
+        child.join(10)
+        assert shared.in_flight("openai") == 0
+        assert lane.acquire(INTERACTIVE, None)
+        assert shared.in_flight("openai") == 1
+        lane.release()
+        assert shared.in_flight("openai") == 0
+    finally:
+        done.set()
+        child.join(10)
+
+
+def die_holding_a_slot(db_path, held):
+    lane = make_lane(1, SharedAdmission(db_path, slot_timeout=0.3))
+    lane.acquire(BATCH, None)
+    held.set()
+
+
+def test_slots_of_a_dead_process_expire(tmp_path):
+    db_path = str(tmp_path / "scheduler.sqlite3")
+    held = fork.Event()
+    child = fork.Process(target=die_holding_a_slot, args=(db_path, held))
+    child.start()
+    child.join(10)
+    assert held.is_set()
+
+    lane = make_lane(1, SharedAdmission(db_path, slot_timeout=0.3))
+    assert not lane.acquire(INTERACTIVE, None, block=False)
+    time.sleep(0.4)
+    assert lane.acquire(INTERACTIVE, None)
+
+
+def wait_as_interactive(db_path, recorded, done):
+    shared = SharedAdmission(db_path)
+    shared.set_waiting("openai", frozenset({INTERACTIVE}))
+    recorded.set()
+    done.wait(10)
+    shared.set_waiting("openai", frozenset())
+
+
+def test_batch_calls_wait_for_interactive_calls_of_other_processes(tmp_path):
+    db_path = str(tmp_path / "scheduler.sqlite3")
+    recorded, done = fork.Event(), fork.Event()
+    child = fork.Process(target=wait_as_interactive, args=(db_path, recorded, done))
+    child.start()
+    try:
+        assert recorded.wait(10)
+        lane = make_lane(2, SharedAdmission(db_path))
+
+        # A slot is free, but an interactive call waits in the other process
+        assert not lane.acquire(BATCH, None, block=False)
+        assert lane.acquire(INTERACTIVE, None)
+        lane.release()
+
+        done.set()
+        child.join(10)
+        assert lane.acquire(BATCH, None)
+    finally:
+        done.set()
+        child.join(10)
+
+
+@pytest.mark.parametrize("concurrency", [1, 3])
+def test_threads_never_exceed_the_shared_limit(tmp_path, concurrency):
+    shared = SharedAdmission(str(tmp_path / "scheduler.sqlite3"))
+    lanes = [make_lane(concurrency, shared) for _ in range(2)]
+    lock = threading.Lock()
+    running = [0]
+    peak = [0]
+
+    def call(lane):
+        lane.acquire(BATCH, None)
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.01)
+        with lock:
+            running[0] -= 1
+        lane.release()
+
+    threads = [threading.Thread(target=call, args=(lanes[i % 2],)) for i in range(12)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(30)
+
+    assert peak[0] <= concurrency
+    assert shared.in_flight("openai") == 0
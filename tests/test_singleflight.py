@@ -0,0 +1,119 @@
+# tests/test_singleflight.py
+import multiprocessing
+import threading
+import time
+
+import pytest
+
+from singleflight import FileSingleFlight, SingleFlight
+
+# Child processes inherit the test's state through fork
+fork = multiprocessing.get_context("fork")
+
+
+def run_concurrently(flight, key, func, callers):
+    results = []
+    errors = []
+
+    def caller():
+        try:
+            results.append(flight.do(key, func))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=caller) for _ in range(callers)]
+    for thread in threads:
+        thread.start()
+        # Let the leader start before the others arrive
+        time.sleep(0.02)
+    for thread in threads:
+        thread.join(10)
+    return results, errors
+
+
+def test_concurrent_calls_run_once():
+    calls = []
+
+    def analyze():
+        calls.append(1)
+        time.sleep(0.2)
+        return {"use_cases": ["chatbot"]}
+
+    results, errors = run_concurrently(SingleFlight(), "tesla", analyze, 4)
+
+    assert not errors
+    assert len(calls) == 1
+    assert sorted(shared for _, shared in results) == [False, True, True, True]
+    assert all(value == {"use_cases": ["chatbot"]} for value, _ in results)
+    # Followers get copies, so one caller's changes do not reach the others
+    assert len({id(value) for value, _ in results}) == 4
+
+
+def test_followers_get_the_leaders_exception():
+    def fail():
+        time.sleep(0.2)
+        raise RuntimeError("search failed")
+
+    results, errors = run_concurrently(SingleFlight(), "tesla", fail, 3)
+
+    assert not results
+    assert len(errors) == 3
+    assert all(str(e) == "search failed" for e in errors)
+
+
+def test_finished_calls_are_not_cached():
+    flight = SingleFlight()
+
+    assert flight.do("tesla", lambda: 1) == (1, False)
+    assert flight.do("tesla", lambda: 2) == (2, False)
+
+
+def lead_in_child(directory, started, value, fail=False):
+    def func():
+        started.set()
+        time.sleep(0.3)
+        if fail:
+            raise RuntimeError("search failed")
+        return value
+    try:
+        FileSingleFlight(directory).do("tesla", func)
+    except RuntimeError:
+        pass
+
+
+@pytest.fixture
+def directory(tmp_path):
+    return str(tmp_path / "flights")
+
+
+def test_other_processes_attach_to_the_call_in_flight(directory):
+    started = fork.Event()
+    child = fork.Process(target=lead_in_child, args=(directory, started, ["from child"]))
+    child.start()
+    try:
+        assert started.wait(10)
+        result = FileSingleFlight(directory).do("tesla", lambda: ["from parent"])
+    finally:
+        child.join(10)
+
+    assert result == (["from child"], True)
+
+
+def test_a_failed_leader_leaves_the_call_to_the_waiters(directory):
+    started = fork.Event()
+    child = fork.Process(target=lead_in_child, args=(directory, started, None, True))
+    child.start()
+    try:
+        assert started.wait(10)
+        result = FileSingleFlight(directory).do("tesla", lambda: ["from parent"])
+    finally:
+        child.join(10)
+
+    assert result == (["from parent"], False)
+
+
+def test_results_of_earlier_calls_are_not_reused(directory):
+    flight = FileSingleFlight(directory)
+
+    assert flight.do("tesla", lambda: [1]) == ([1], False)
+    assert flight.do("tesla", lambda: [2]) == ([2], False)
@@ -0,0 +1,317 @@
+# tracing.py
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from multiprocessing.util import Finalize
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from config import Config
+
+# Span that new spans attach to; copied into pipeline threads with the context
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+# Latency buckets in seconds, from cache hits up to slow LLM calls
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+# Numeric span attributes that are also summed into Prometheus counters
+COUNTED_ATTRIBUTES = ("bytes", "prompt_tokens", "completion_tokens", "cache_hits", "results", "retries", "hedges", "deduplicated")
+
+# Span attributes that become metric labels
+LABEL_ATTRIBUTES = ("stage", "provider")
+
+
+class Span:
+    """A timed operation with attributes, part of a trace"""
+
+    def __init__(self, name, trace_id, parent_id, attributes):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.attributes = dict(attributes)
+        self.status = "ok"
+        self.error = None
+        self.start_time = time.time()
+        self.duration = None
+        self._started = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def set(self, key, value):
+        """Sets an attribute"""
+        with self._lock:
+            self.attributes[key] = value
+
+    def incr(self, key, amount=1):
+        """Adds to a numeric attribute, for counts from concurrent workers"""
+        with self._lock:
+            self.attributes[key] = self.attributes.get(key, 0) + amount
+
+    def finish(self):
+        self.duration = time.perf_counter() - self._started
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_time": self.start_time,
+            "duration": self.duration,
+            "status": self.status,
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+
+class _NoopSpan:
+    """Stand-in returned by current_span() outside of any trace"""
+
+    def set(self, key, value):
+        pass
+
+    def incr(self, key, amount=1):
+        pass
+
+
+def process_textfile(path):
+    """
+    Per-process variant of a metrics textfile path, e.g. metrics.1234.prom
+
+    The app, the worker pools and batch jobs all export metrics; each
+    process writes its own file, and node_exporter's textfile collector
+    reads every *.prom file in the directory.
+    """
+    base, extension = os.path.splitext(path)
+    return f"{base}.{os.getpid()}{extension or '.prom'}"
+
+
+class Metrics:
+    """
+    Span duration histograms and attribute counters in Prometheus text format
+
+    Every series carries a process label with the PID, so the files of
+    several processes can be collected side by side and summed in queries.
+    """
+
+    def __init__(self, prefix="usecase"):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counters = {}
+
+    def observe_span(self, span):
+        labels = [("span", span.name)]
+        labels += [(key, str(span.attributes[key])) for key in LABEL_ATTRIBUTES if key in span.attributes]
+        histogram_key = tuple(labels + [("status", span.status)])
+
+        with self._lock:
+            histogram = self._histograms.setdefault(
+                histogram_key,
+                {"buckets": [0] * len(DURATION_BUCKETS), "count": 0, "sum": 0.0}
+            )
+            histogram["count"] += 1
+            histogram["sum"] += span.duration
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if span.duration <= bound:
+                    histogram["buckets"][i] += 1
+
+            for attribute in COUNTED_ATTRIBUTES:
+                value = span.attributes.get(attribute)
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                counter_key = (attribute, tuple(labels))
+                self._counters[counter_key] = self._counters.get(counter_key, 0) + value
+
+    @staticmethod
+    def _format_labels(labels):
+        escaped = []
+        for key, value in labels:
+            value = value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+            escaped.append(f'{key}="{value}"')
+        return "{" + ",".join(escaped) + "}"
+
+    def render(self):
+        """Renders every metric in the Prometheus text exposition format"""
+        name = f"{self.prefix}_span_duration_seconds"
+        lines = [
+            f"# HELP {name} Duration of traced pipeline stages and outbound calls.",
+            f"# TYPE {name} histogram",
+        ]
+        process = [("process", str(os.getpid()))]
+        with self._lock:
+            for labels, histogram in sorted(self._histograms.items()):
+                labels = process + list(labels)
+                for bound, count in zip(DURATION_BUCKETS, histogram["buckets"]):
+                    bucket_labels = self._format_labels(list(labels) + [("le", str(bound))])
+                    lines.append(f"{name}_bucket{bucket_labels} {count}")
+                inf_labels = self._format_labels(list(labels) + [("le", "+Inf")])
+                lines.append(f"{name}_bucket{inf_labels} {histogram['count']}")
+                lines.append(f"{name}_sum{self._format_labels(labels)} {histogram['sum']}")
+                lines.append(f"{name}_count{self._format_labels(labels)} {histogram['count']}")
+
+            for attribute in COUNTED_ATTRIBUTES:
+                counters = sorted(
+                    (labels, value) for (key, labels), value in self._counters.items() if key == attribute
+                )
+                if not counters:
+                    continue
+                counter_name = f"{self.prefix}_{attribute}_total"
+                lines.append(f"# HELP {counter_name} Sum of the '{attribute}' span attribute.")
+                lines.append(f"# TYPE {counter_name} counter")
+                for labels, value in counters:
+                    labels = process + list(labels)
+                    lines.append(f"{counter_name}{self._format_labels(labels)} {value}")
+
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self._histograms = {}
+            self._counters = {}
+
+    def write_textfile(self, path):
+        """Atomically writes the metrics for the node_exporter textfile collector"""
+        try:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # Every thread that finishes a trace rewrites the file
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(self.render())
+            os.replace(tmp_path, path)
+        except IOError as e:
+            print(f"Error writing metrics to {path}: {e}")
+
+
+class Tracer:
+    """Collects spans per trace and exports finished traces and metrics"""
+
+    def __init__(self):
+        self.metrics = Metrics()
+        self._lock = threading.Lock()
+        self._traces = {}
+        self._textfile = None
+
+    @contextmanager
+    def span(self, name, **attributes):
+        """
+        Times the enclosed block as a span
+
+        A span opened outside any other span starts a new trace; the trace is
+        exported when that root span ends.
+
+        Args:
+            name (str): Span name, e.g. "stage" or "http.scrape"
+            **attributes: Initial attributes such as stage= or provider=
+
+        Yields:
+            Span: The span, to attach more attributes
+        """
+        parent = _current_span.get()
+        trace_id = parent.trace_id if parent else uuid.uuid4().hex
+        span = Span(name, trace_id, parent.span_id if parent else None, attributes)
+        with self._lock:
+            self._traces.setdefault(trace_id, []).append(span)
+
+        token = _current_span.set(span)
+        try:
+            yield span
+        except Exception as e:
+            span.status = "error"
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            _current_span.reset(token)
+            span.finish()
+            self.metrics.observe_span(span)
+            if parent is None:
+                self._finish_trace(trace_id)
+
+    def current_span(self):
+        """Returns the active span, or a no-op span outside of any trace"""
+        return _current_span.get() or _NoopSpan()
+
+    def _finish_trace(self, trace_id):
+        with self._lock:
+            spans = self._traces.pop(trace_id, [])
+
+        if Config.TRACE_DIR:
+            self._export_trace(trace_id, spans)
+        if Config.METRICS_TEXTFILE:
+            path = process_textfile(Config.METRICS_TEXTFILE)
+            if self._textfile != path:
+                self._textfile = path
+                # Unlike atexit, also runs in process pool workers, which leave through os._exit
+                Finalize(None, self._remove_textfile, args=(path,), exitpriority=0)
+            self.metrics.write_textfile(path)
+
+    @staticmethod
+    def _remove_textfile(path):
+        # Series of a process that has exited would otherwise be collected forever
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _after_fork(self):
+        # A forked worker starts with the parent's counters; it reports only its own
+        self.metrics.reset()
+        with self._lock:
+            self._traces = {}
+        self._textfile = None
+
+    def _export_trace(self, trace_id, spans):
+        started = time.localtime(spans[0].start_time) if spans else time.localtime()
+        path = os.path.join(
+            Config.TRACE_DIR,
+            f"{time.strftime('%Y%m%d_%H%M%S', started)}_{trace_id[:12]}.json"
+        )
+        try:
+            os.makedirs(Config.TRACE_DIR, exist_ok=True)
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump({"trace_id": trace_id, "spans": [s.to_dict() for s in spans]}, f, indent=2, default=str)
+        except IOError as e:
+            print(f"Error saving trace to {path}: {e}")
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = tracer.metrics.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port=None, host="0.0.0.0"):
+    """
+    Serves the metrics at http://<host>:<port>/metrics from a daemon thread
+
+    Args:
+        port (int): Port to listen on, defaults to Config.METRICS_PORT
+
+    Returns:
+        ThreadingHTTPServer: The running server
+    """
+    server = ThreadingHTTPServer((host, port or Config.METRICS_PORT), _MetricsHandler)
+    thread = threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True)
+    thread.start()
+    print(f"Serving metrics on http://{host}:{server.server_port}/metrics")
+    return server
+
+
+# Process-wide tracer used by the orchestrator and the agents
+tracer = Tracer()
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=tracer._after_fork)
@@ -1,32 +1,163 @@
 # agents/usecase_agent.py
+import contextvars
+import time
+from concurrent.futures import ThreadPoolExecutor
 import openai
+from cache import cache_for
+from checkpoints import input_hash
+from call_policy import policy_for
 from config import Config
+from documents import build_context, document_digest
+from records import UseCase
+from scheduler import scheduler
+from tracing import tracer
 
 class UseCaseAgent:
     """Agent responsible for generating AI/GenAI use cases"""
     
     def __init__(self):
         self.config = Config()
-        self.client = openai.OpenAI(api_key=self.config.OPENAI_API_KEY)
+        # Retries are left to the shared call policy
+        self.client = openai.OpenAI(api_key=self.config.OPENAI_API_KEY, max_retries=0)
     
-    def generate_use_cases(self, company_name, research_findings):
+    def generate_use_cases(self, company_name, research_findings, budget=None):
         """
         Analyzes research findings and proposes relevant AI/GenAI use cases
         
         Args:
             company_name (str): The name of the company
             research_findings (list): A list of dictionaries containing research data
+            budget (LatencyBudget): Optional time budget for the run
             
         Returns:
-            list of dict: Proposed use cases with structured information
+            list of UseCase: Proposed use cases with structured information
         """
-        company_context = "\n".join([
-            d.get('text', '') for d in research_findings if d.get('text')
-        ])
+        return list(self.stream_use_cases(company_name, research_findings, budget=budget))
+
+    def summarize_document(self, doc, budget=None):
+        """
+        Condenses one research document into a short fact sheet with the summary model
+        
+        Fact sheets are cached by the document's content hash, so a page that
+        has not changed is never summarized twice.
+        
+        Args:
+            doc (dict): Research document with 'url', 'title' and 'text'
+            budget (LatencyBudget): Optional time budget for the run
+            
+        Returns:
+            dict: The document with its fact sheet as 'text'
+        """
+        key = f"{self.config.SUMMARY_MODEL}:{self.config.SUMMARY_MAX_DOC_CHARS}:{document_digest(doc)}"
+        text, _ = build_context([doc], max_bytes=self.config.SUMMARY_MAX_DOC_CHARS)
+        if not text:
+            return {"url": doc.get('url'), "title": doc.get('title'), "text": ""}
+
+        def summarize():
+            prompt = f"""
+Condense the following web page into a fact sheet of at most 8 short bullet points. Keep only facts stated in the text that matter for finding AI/GenAI opportunities: products and services, customers and markets, operations, strategy, technology and the data the organization holds or generates.
+
+Page title: {doc.get('title')}
+
+{text}
+"""
+            timeout = self.config.SUMMARY_TIMEOUT
+            if budget and budget.limited:
+                timeout = budget.timeout("use_cases", timeout)
+            with tracer.span("llm.summary", provider="openai", model=self.config.SUMMARY_MODEL) as span:
+                span.set("prompt_chars", len(prompt))
+                response = policy_for("openai").call(
+                    lambda: self.client.chat.completions.create(
+                        model=self.config.SUMMARY_MODEL,
+                        messages=[{"role": "user", "content": prompt}],
+                        temperature=0,
+                        timeout=timeout
+                    ),
+                    budget=budget,
+                    stage="use_cases"
+                )
+                usage = getattr(response, "usage", None)
+                if usage:
+                    span.set("prompt_tokens", usage.prompt_tokens)
+                    span.set("completion_tokens", usage.completion_tokens)
+                return (response.choices[0].message.content or "").strip() or None
+
+        try:
+            fact_sheet, hit = cache_for("summaries").get_or_compute(key, summarize)
+            if hit:
+                tracer.current_span().incr("cache_hits")
+        except Exception as e:
+            print(f"Error summarizing {doc.get('url')}: {e}")
+            fact_sheet = None
+
+        if not fact_sheet:
+            # Fall back to the start of the page rather than losing it
+            fact_sheet = text[:self.config.BUDGET_MIN_CONTEXT_CHARS]
+        return {"url": doc.get('url'), "title": doc.get('title'), "text": fact_sheet}
+
+    def summarize_documents(self, research_findings, budget=None):
+        """
+        Summarizes all research documents concurrently (the map step)
+        
+        Args:
+            research_findings (list): A list of dictionaries containing research data
+            budget (LatencyBudget): Optional time budget for the run
+            
+        Returns:
+            list of dict: Fact sheets in the order of the documents
+        """
+        docs = list(research_findings)
+        print(f"Summarizing {len(docs)} documents with {self.config.SUMMARY_MODEL}...")
+        with ThreadPoolExecutor(max_workers=max(1, self.config.SUMMARY_WORKERS)) as executor:
+            # Each worker runs in a copy of this context so its spans nest here
+            futures = [
+                executor.submit(contextvars.copy_context().run, self.summarize_document, doc, budget)
+                for doc in docs
+            ]
+            return [f.result() for f in futures]
+
+    def build_prompt(self, company_name, research_findings, budget=None):
+        """
+        Builds the use case generation prompt from the research findings
+        
+        Also used by the bulk mode (see llm_batch.py), so a completion
+        generated offline is found under the same cache key as a live one.
+        
+        Args:
+            company_name (str): The name of the company
+            research_findings (list): A list of dictionaries containing research data
+            budget (LatencyBudget): Optional time budget; when the use case share
+                is short, the research context is truncated to fit
+            
+        Returns:
+            tuple: (prompt or None if there is no context, request options)
+        """
+        if self.config.SUMMARIZE_DOCUMENTS:
+            research_findings = self.summarize_documents(research_findings, budget)
+
+        request_options = {}
+        max_chars = None
+        if budget and budget.limited:
+            # Smaller prompts come back faster; size the context to the time left
+            remaining = budget.stage_remaining("use_cases")
+            max_chars = max(
+                self.config.BUDGET_MIN_CONTEXT_CHARS,
+                int(remaining * self.config.BUDGET_CONTEXT_CHARS_PER_SECOND)
+            )
+            request_options["timeout"] = max(self.config.BUDGET_MIN_LLM_TIMEOUT, budget.remaining())
+
+        # Texts are copied straight from the document store into the context
+        company_context, context_bytes = build_context(research_findings, max_bytes=max_chars)
 
         if not company_context:
             print("Warning: No research context available to generate use cases.")
-            return []
+            return None, request_options
+
+        if max_chars is not None and context_bytes > max_chars:
+            budget.degrade(
+                "use_cases",
+                f"research context capped at {max_chars} of {context_bytes} bytes"
+            )
 
         prompt = f"""
 You are an AI strategy consultant. Given these facts about {company_name} (context below), propose exactly 5 distinct GenAI/AI use cases for the company focusing on operations, customer experience, and monetization.
@@ -43,47 +174,156 @@ Context:
 
 Ensure each use case is clearly separated by a horizontal rule "---" and follows the exact 'FIELD_NAME: [Value]' format. Do not include any introductory or concluding text outside of the use case blocks.
 """
+        return prompt, request_options
 
-        try:
-            resp = self.client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.7
-            )
-            llm_output = resp.choices[0].message.content
-
-            use_cases = []
-            use_case_blocks = llm_output.strip().split('---')
-
-            for block in use_case_blocks:
-                block = block.strip()
-                if not block:
-                    continue
-
-                current_use_case = {}
-                lines = block.split('\n')
-                for line in lines:
-                    line = line.strip()
-                    if line.startswith("TITLE:"):
-                        current_use_case["title"] = line.replace("TITLE:", "").strip()
-                    elif line.startswith("DESCRIPTION:"):
-                        current_use_case["description"] = line.replace("DESCRIPTION:", "").strip()
-                    elif line.startswith("DATA SOURCES:"):
-                        current_use_case["data sources"] = line.replace("DATA SOURCES:", "").strip()
-                    elif line.startswith("BUSINESS IMPACT:"):
-                        current_use_case["impact"] = line.replace("BUSINESS IMPACT:", "").strip()
-                    elif line.startswith("COMPLEXITY:"):
-                        current_use_case["complexity"] = line.replace("COMPLEXITY:", "").strip()
-
-                if current_use_case and current_use_case.get("title"):
-                    use_cases.append(current_use_case)
-
-            if not use_cases or len(use_cases) < 3:
-                print("Warning: Parsing failed or fewer than 3 valid use cases found.")
-                print("LLM Output:\n", llm_output)
-
-            return use_cases
+    def completion_key(self, prompt):
+        """Key of a prompt's completion in the "completions" cache"""
+        return input_hash(self.config.USECASE_MODEL, prompt)
 
-        except Exception as e:
-            print(f"Error generating use cases: {e}")
-            return []
\ No newline at end of file
+    def stream_use_cases(self, company_name, research_findings, raise_errors=False, budget=None):
+        """
+        Streams the LLM response and yields each use case as soon as its block is complete
+        
+        Args:
+            company_name (str): The name of the company
+            research_findings (list): A list of dictionaries containing research data
+            raise_errors (bool): Re-raise LLM errors instead of ending the stream quietly
+            budget (LatencyBudget): Optional time budget; when the use case share
+                is short, the research context is truncated to fit
+            
+        With Config.SUMMARIZE_DOCUMENTS, the documents are first condensed into
+        fact sheets and the fact sheets are merged into the prompt instead.
+            
+        Yields:
+            UseCase: Proposed use case with structured information
+        """
+        prompt, request_options = self.build_prompt(company_name, research_findings, budget)
+        if prompt is None:
+            return
+
+        # Identical prompts (same model and context) reuse the stored
+        # completion; while one worker streams it, the others wait for it
+        completions = cache_for("completions")
+        cache_key = self.completion_key(prompt)
+        with completions.lease(cache_key) as cached_output:
+            if cached_output is not None:
+                print("Using cached use case completion.")
+                tracer.current_span().incr("cache_hits")
+                yield from parse_use_cases(cached_output)
+                return
+
+            llm_output = ""
+            buffer = ""
+            found = 0
+
+            try:
+                with tracer.span("llm.completion", provider="openai", model=self.config.USECASE_MODEL) as span:
+                    span.set("prompt_chars", len(prompt))
+                    started = time.perf_counter()
+                    # The request runs until the stream is read to the end,
+                    # so it keeps its scheduler slot until then
+                    with scheduler.slot("openai"):
+                        # Only opening the stream is retried; use cases already
+                        # yielded from a broken stream cannot be taken back
+                        stream = policy_for("openai").call(
+                            lambda: self.client.chat.completions.create(
+                                model=self.config.USECASE_MODEL,
+                                messages=[{"role": "user", "content": prompt}],
+                                temperature=0.7,
+                                stream=True,
+                                **request_options
+                            ),
+                            budget=budget,
+                            stage="use_cases",
+                            held=True
+                        )
+
+                        for chunk in stream:
+                            usage = getattr(chunk, "usage", None)
+                            if usage:
+                                span.set("prompt_tokens", usage.prompt_tokens)
+                                span.set("completion_tokens", usage.completion_tokens)
+                            if not chunk.choices:
+                                continue
+                            delta = chunk.choices[0].delta.content or ""
+                            llm_output += delta
+                            buffer += delta
+                            if "first_token_s" not in span.attributes:
+                                span.set("first_token_s", time.perf_counter() - started)
+
+                            # Every block before the last separator is complete
+                            *complete_blocks, buffer = buffer.split('---')
+                            for block in complete_blocks:
+                                use_case = parse_use_case_block(block)
+                                if use_case:
+                                    found += 1
+                                    yield use_case
+
+                        use_case = parse_use_case_block(buffer)
+                        if use_case:
+                            found += 1
+                            yield use_case
+                    span.set("completion_chars", len(llm_output))
+
+            except Exception as e:
+                print(f"Error generating use cases: {e}")
+                if raise_errors:
+                    raise
+                return
+
+            if found:
+                completions.set(cache_key, llm_output)
+
+        if found < 3:
+            print("Warning: Parsing failed or fewer than 3 valid use cases found.")
+            print("LLM Output:\n", llm_output)
+
+
+def parse_use_case_block(block):
+    """
+    Parses a single 'FIELD_NAME: [Value]' block of the LLM output
+    
+    Impact and complexity are read into Levels here, once, so later stages
+    never parse the text again.
+    
+    Args:
+        block (str): Text of one use case block
+        
+    Returns:
+        UseCase: The parsed use case, or None if the block has no title
+    """
+    current_use_case = {}
+    for line in block.strip().split('\n'):
+        line = line.strip()
+        if line.startswith("TITLE:"):
+            current_use_case["title"] = line.replace("TITLE:", "").strip()
+        elif line.startswith("DESCRIPTION:"):
+            current_use_case["description"] = line.replace("DESCRIPTION:", "").strip()
+        elif line.startswith("DATA SOURCES:"):
+            current_use_case["data sources"] = line.replace("DATA SOURCES:", "").strip()
+        elif line.startswith("BUSINESS IMPACT:"):
+            current_use_case["impact"] = line.replace("BUSINESS IMPACT:", "").strip()
+        elif line.startswith("COMPLEXITY:"):
+            current_use_case["complexity"] = line.replace("COMPLEXITY:", "").strip()
+
+    if current_use_case.get("title"):
+        return UseCase.from_dict(current_use_case)
+    return None
+
+
+def parse_use_cases(llm_output):
+    """
+    Parses a complete LLM response into use case records
+    
+    Args:
+        llm_output (str): Raw LLM output with blocks separated by '---'
+        
+    Returns:
+        list of UseCase: Parsed use cases
+    """
+    use_cases = []
+    for block in llm_output.strip().split('---'):
+        use_case = parse_use_case_block(block)
+        if use_case:
+            use_cases.append(use_case)
+    return use_cases
@@ -0,0 +1,239 @@
+# watchlist.py
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+import time
+import zlib
+import numpy as np
+from batch import read_companies
+from canonical import entities
+from config import Config
+from documents import document_digest
+from scheduler import BACKGROUND, priority, set_default_priority
+
+# Salts of the MinHash permutations, fixed so signatures stay comparable across runs
+_MINHASH_PRIME = (1 << 61) - 1
+_rng = np.random.RandomState(20240501)
+_MINHASH_A = _rng.randint(1, 1 << 31, size=128).astype(np.uint64)
+_MINHASH_B = _rng.randint(0, 1 << 31, size=128).astype(np.uint64)
+
+# Words per shingle when comparing research texts
+SHINGLE_SIZE = 5
+
+def content_signature(research_docs):
+    """
+    MinHash signature of the word shingles of all research texts
+
+    Two signatures agree in a fraction of positions that estimates the
+    Jaccard similarity of the texts, so small edits such as a changed date
+    or a rotated headline score close to 1.
+
+    Returns:
+        list of int: 128 minimum hashes
+    """
+    shingles = set()
+    for doc in research_docs:
+        words = re.findall(r"\w+", (doc.get('text') or "").lower())
+        for i in range(max(1, len(words) - SHINGLE_SIZE + 1)):
+            shingles.add(zlib.crc32(" ".join(words[i:i + SHINGLE_SIZE]).encode('utf-8')))
+    if not shingles:
+        return [0] * len(_MINHASH_A)
+
+    values = np.fromiter(shingles, dtype=np.uint64, count=len(shingles))
+    # (a * x + b) mod p for every permutation and shingle; products stay
+    # below 2^63 because both factors are below 2^32
+    hashed = (np.outer(_MINHASH_A, values) + _MINHASH_B[:, None]) % _MINHASH_PRIME
+    return hashed.min(axis=1).tolist()
+
+def signature_similarity(a, b):
+    """Estimated Jaccard similarity of two content signatures"""
+    if not a or not b or len(a) != len(b):
+        return 0.0
+    return sum(1 for x, y in zip(a, b) if x == y) / len(a)
+
+class WatchList:
+    """
+    Keeps the reports of a fixed list of companies fresh
+
+    Every interval each company is re-scraped, and the research is compared
+    to the snapshot from the last refresh. Only if the texts changed more
+    than the threshold allows are use case generation and the later stages
+    re-run; otherwise the new scrape is discarded and the skipped work is
+    logged. State is kept in a JSON file so restarts continue the schedule.
+    """
+
+    def __init__(self, companies, orchestrator=None, interval=None, threshold=None,
+                 state_path=None, log_path=None):
+        """
+        Args:
+            companies (list): Company or industry names to watch
+            orchestrator (Orchestrator): Defaults to a new one
+            interval (float): Seconds between checks of a company
+            threshold (float): Research similarity below which a company is refreshed
+            state_path (str): JSON file with the last snapshot of every company
+            log_path (str): JSONL file of checks and the work they skipped
+        """
+        if orchestrator is None:
+            from orchestrator import Orchestrator
+            orchestrator = Orchestrator()
+        self.orchestrator = orchestrator
+        self.companies = list(dict.fromkeys(entities.resolve(c).name for c in companies))
+        self.interval = interval if interval is not None else Config.WATCH_INTERVAL
+        self.threshold = threshold if threshold is not None else Config.WATCH_CHANGE_THRESHOLD
+        self.state_path = state_path or Config.WATCH_STATE_PATH
+        self.log_path = log_path or Config.WATCH_LOG_PATH
+        self.state = self._load_state()
+        self._stop = threading.Event()
+
+    def _load_state(self):
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (IOError, ValueError):
+            return {}
+
+    def _save_state(self):
+        try:
+            directory = os.path.dirname(self.state_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.state_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.state, f, indent=2)
+            os.replace(tmp_path, self.state_path)
+        except IOError as e:
+            print(f"Error saving watch list state: {e}")
+
+    def _log(self, entry):
+        print(f"Watch list: {entry['company']} - {entry['action']}"
+              + (f" (similarity {entry['similarity']:.2f})" if entry.get('similarity') is not None else ""))
+        try:
+            directory = os.path.dirname(self.log_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.log_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry) + "\n")
+        except IOError as e:
+            print(f"Error writing watch list log: {e}")
+
+    def due(self, now=None):
+        """Companies whose last check is at least one interval ago"""
+        now = now or time.time()
+        return [
+            c for c in self.companies
+            if now - self.state.get(c, {}).get("checked_at", 0) >= self.interval
+        ]
+
+    def check(self, company):
+        """
+        Re-scrapes one company and refreshes its report if the research changed
+
+        Returns:
+            dict: The log entry of the check
+        """
+        previous = self.state.get(company)
+        if previous and "digests" not in previous:
+            previous = None  # Checked before, but never analyzed
+        research_docs = self.orchestrator.refresh_research(company)
+        now = time.time()
+        entry = {"company": company, "checked_at": now, "similarity": None}
+
+        if not research_docs:
+            entry.update(action="research failed", skipped=["use_cases", "datasets", "prioritization", "report"])
+            self.state.setdefault(company, {})["checked_at"] = now
+            self._log(entry)
+            return entry
+
+        digests = sorted(document_digest(d) for d in research_docs)
+        signature = content_signature(research_docs)
+
+        if previous and previous.get("digests") == digests:
+            similarity = 1.0
+        elif previous:
+            similarity = signature_similarity(previous.get("signature"), signature)
+        else:
+            similarity = None
+        entry["similarity"] = similarity
+
+        if similarity is not None and similarity >= self.threshold:
+            # Keep the old snapshot, so slow drift still adds up to a refresh
+            previous["checked_at"] = now
+            entry.update(action="unchanged, skipped", skipped=["use_cases", "datasets", "prioritization", "report"])
+            self._log(entry)
+            return entry
+
+        if self.orchestrator.config.ENABLE_CHECKPOINTS:
+            self.orchestrator.store_research(company, research_docs)
+        use_cases = self.orchestrator.run_analysis(company, resume=True)
+        self.state[company] = {
+            "checked_at": now,
+            "refreshed_at": now,
+            "digests": digests,
+            "signature": signature,
+            "use_cases": len(use_cases),
+        }
+        entry.update(action="refreshed" if previous else "first analysis", use_cases=len(use_cases))
+        self._log(entry)
+        return entry
+
+    def run_once(self):
+        """Checks every company that is due"""
+        results = []
+        for company in self.due():
+            if self._stop.is_set():
+                break
+            try:
+                # Refreshes must not hold up interactive analyses
+                with priority(BACKGROUND):
+                    results.append(self.check(company))
+            except Exception as e:
+                print(f"Watch list check failed for {company}: {e}")
+            self._save_state()
+        return results
+
+    def run_forever(self):
+        """Checks companies as they come due until stop() is called"""
+        print(f"Watching {len(self.companies)} companies every {self.interval:.0f}s")
+        while not self._stop.is_set():
+            self.run_once()
+            next_due = min(
+                (self.state.get(c, {}).get("checked_at", 0) + self.interval for c in self.companies),
+                default=time.time() + self.interval
+            )
+            self._stop.wait(max(1.0, next_due - time.time()))
+
+    def stop(self):
+        self._stop.set()
+
+def main(argv=None):
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description="Keep the reports of a list of companies fresh")
+    parser.add_argument("input", help="CSV file with a header row, or a text file with one name per line")
+    parser.add_argument("--column", help="CSV column with the company names (default: first column)")
+    parser.add_argument("--interval", type=float, default=Config.WATCH_INTERVAL, help="Seconds between checks")
+    parser.add_argument("--threshold", type=float, default=Config.WATCH_CHANGE_THRESHOLD,
+                        help="Research similarity (0-1) below which the report is regenerated")
+    parser.add_argument("--once", action="store_true", help="Check the companies that are due and exit")
+    args = parser.parse_args(argv)
+
+    Config.validate_keys()
+    set_default_priority(BACKGROUND)
+    watch_list = WatchList(
+        read_companies(args.input, args.column),
+        interval=args.interval,
+        threshold=args.threshold
+    )
+    try:
+        if args.once:
+            watch_list.run_once()
+        else:
+            watch_list.run_forever()
+    except KeyboardInterrupt:
+        print("Stopping watch list...")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,102 @@
+# worker.py
+import argparse
+import multiprocessing
+import os
+import socket
+import sys
+import threading
+import time
+from config import Config
+from job_queue import JobQueue
+from records import to_dicts
+
+def _heartbeat_loop(queue, job_id, stop):
+    while not stop.wait(Config.JOB_HEARTBEAT_INTERVAL):
+        queue.heartbeat(job_id)
+
+def run_job(queue, orchestrator, job):
+    """Runs one claimed job and records its result or error"""
+    stop = threading.Event()
+    heartbeat = threading.Thread(
+        target=_heartbeat_loop,
+        args=(queue, job["id"], stop),
+        name=f"heartbeat-{job['id'][:8]}",
+        daemon=True
+    )
+    heartbeat.start()
+    try:
+        print(f"Running job {job['id']} for: {job['company']}")
+        use_cases = orchestrator.run_analysis(
+            job["company"],
+            on_event=lambda event: queue.add_event(job["id"], event)
+        )
+        queue.complete(job["id"], to_dicts(use_cases))
+        print(f"Job {job['id']} done with {len(use_cases)} use cases")
+    except Exception as e:
+        print(f"Job {job['id']} failed: {e}")
+        queue.fail(job["id"], f"{type(e).__name__}: {e}")
+    finally:
+        stop.set()
+        heartbeat.join()
+
+def work_loop(worker_id, db_path=None, max_jobs=None):
+    """
+    Claims and runs jobs until max_jobs have been processed (forever if None)
+
+    The Orchestrator is built once per worker, so API clients are reused
+    across jobs.
+    """
+    from orchestrator import Orchestrator
+
+    queue = JobQueue(db_path)
+    orchestrator = Orchestrator()
+    processed = 0
+    last_sweep = 0.0
+
+    print(f"Worker {worker_id} started")
+    while max_jobs is None or processed < max_jobs:
+        # Recover jobs of workers that died mid-run
+        if time.time() - last_sweep > Config.JOB_HEARTBEAT_INTERVAL:
+            recovered = queue.requeue_stale()
+            if recovered:
+                print(f"Worker {worker_id} recovered {recovered} stale jobs")
+            last_sweep = time.time()
+
+        job = queue.claim(worker_id)
+        if job is None:
+            time.sleep(Config.JOB_POLL_INTERVAL)
+            continue
+
+        run_job(queue, orchestrator, job)
+        processed += 1
+
+def main(argv=None):
+    """Command line entry point that starts a pool of worker processes"""
+    parser = argparse.ArgumentParser(description="Run analysis jobs from the shared job queue")
+    parser.add_argument("--processes", type=int, default=Config.JOB_WORKERS, help="Number of worker processes")
+    parser.add_argument("--db", default=Config.JOB_DB_PATH, help="Path of the SQLite job database")
+    args = parser.parse_args(argv)
+
+    Config.validate_keys()
+
+    host = socket.gethostname()
+    workers = []
+    for i in range(args.processes):
+        worker_id = f"{host}:{os.getpid()}:{i}"
+        process = multiprocessing.Process(target=work_loop, args=(worker_id, args.db), name=worker_id)
+        process.start()
+        workers.append(process)
+
+    try:
+        for process in workers:
+            process.join()
+    except KeyboardInterrupt:
+        print("Stopping workers...")
+        for process in workers:
+            process.terminate()
+        for process in workers:
+            process.join()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
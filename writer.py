@@ -14,21 +14,40 @@ class Writer:
         if not os.path.exists(self.config.OUTPUT_DIR):
             os.makedirs(self.config.OUTPUT_DIR)
     
-    def save_markdown_report(self, use_cases, filename):
+    def render_markdown_report(self, use_cases, degradations=None):
         """
-        Formats and saves the prioritized use cases as a markdown report
+        Formats the prioritized use cases as a markdown report
         
         Args:
             use_cases (list): List of prioritized use cases
-            filename (str): Name of the file to save
+            degradations (list): Work cut to meet the time budget, flagged at the top
+            
+        Returns:
+            str: The markdown report
         """
         markdown_output = "# Prioritized AI/GenAI Use Case Proposal\n\n"
 
+        if degradations:
+            markdown_output += "> **Degraded report:** generated under a time budget, some work was skipped:\n"
+            for d in degradations:
+                markdown_output += f"> - {d['stage']}: {d['reason']}\n"
+            markdown_output += "\n"
+
+        if any(uc.get('pareto_layer') for uc in use_cases):
+            markdown_output += (
+                "_Ranked by Pareto layer: no use case in layer 1 is beaten on impact, complexity "
+                "and data availability at once by another one; each further layer is only beaten "
+                "by use cases in the layers before it._\n\n"
+            )
+
         for i, uc in enumerate(use_cases):
             markdown_output += f"## {i+1}. {uc.get('title', 'Untitled Use Case')}\n\n"
             markdown_output += f"**Description:** {uc.get('description', 'N/A')}\n\n"
             markdown_output += f"**Required Data Sources:** {uc.get('data sources', 'N/A')}\n\n"
-            markdown_output += f"**Expected Business Impact:** {uc.get('impact', 'N/A')} | **Estimated Complexity:** {uc.get('complexity', 'N/A')}\n\n"
+            markdown_output += f"**Expected Business Impact:** {uc.get('impact', 'N/A')} | **Estimated Complexity:** {uc.get('complexity', 'N/A')}"
+            if uc.get('pareto_layer'):
+                markdown_output += f" | **Pareto Layer:** {uc['pareto_layer']}"
+            markdown_output += "\n\n"
 
             if uc.get('datasets'):
                 markdown_output += "**Relevant Resources:**\n"
@@ -41,6 +60,19 @@ class Writer:
 
             markdown_output += "---\n\n"
 
+        return markdown_output
+
+    def save_markdown_report(self, use_cases, filename, degradations=None):
+        """
+        Formats and saves the prioritized use cases as a markdown report
+        
+        Args:
+            use_cases (list): List of prioritized use cases
+            filename (str): Name of the file to save
+            degradations (list): Work cut to meet the time budget, flagged at the top
+        """
+        markdown_output = self.render_markdown_report(use_cases, degradations)
+
         try:
             filepath = os.path.join(self.config.OUTPUT_DIR, filename)
             with open(filepath, 'w', encoding='utf-8') as f: